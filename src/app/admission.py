@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging import getLogger
+from math import ceil
+
+from src import settings
+from src.utils.metrics import metrics
+
+logger = getLogger(__name__)
+
+"""
+Cost-based admission control for the chart routes.
+
+Each request's compute time is estimated from its parameters before it runs; a /solunar request for thousands of
+returns costs thousands of times more than a /radix request. Requests estimated under
+settings.ADMISSION_CHEAP_COST_SECONDS go to the cheap lane and the rest to the expensive lane. Each lane has its own
+slots for running requests and its own queue, so expensive requests can only ever occupy the expensive lane's slots
+and cheap requests never wait behind them. When the estimated work queued in a lane would exceed its limit, the
+request is shed with Overloaded, which the routes answer with 429 and a Retry-After header.
+"""
+
+CHEAP = 'cheap'
+EXPENSIVE = 'expensive'
+
+
+class Overloaded(Exception):
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f'Server busy with {lane} requests; retry after {retry_after} seconds')
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+def estimate_cost(route: str, payload: dict) -> float:
+    """Estimated compute seconds for a request to a chart route. Per-return costs were measured without crossing
+    or station indexes, so these are upper bounds. The return harmonic made no measurable difference per return for
+    the Sun and Moon; returns of the other bodies are found by scanning the ephemeris, so the closer together the
+    returns, the cheaper each one. Raises ValueError for a /solunar request for more returns than a request may
+    calculate, which belongs in a background job."""
+
+    if route == 'solunar':
+        return_params = payload['return_params']
+        quantity = int(return_params['return_quantity'])
+        if quantity > settings.SOLUNAR_MAX_RETURN_QUANTITY:
+            raise ValueError(f'return_quantity must be at most {settings.SOLUNAR_MAX_RETURN_QUANTITY}; '
+                             f'submit longer return lists to /jobs/solunar')
+
+        body = settings.STRING_TO_INT_PLANET_MAP[return_params['return_planet']]
+        return_seconds = settings.ADMISSION_RETURN_SECONDS[body]
+        if body >= len(settings.ORBITAL_PERIODS_HOURS):
+            return_seconds = max(return_seconds / int(return_params['return_harmonic']),
+                                 settings.ADMISSION_MIN_RETURN_SECONDS)
+        return settings.ADMISSION_CHART_SECONDS + quantity * return_seconds
+    if route == 'relocate':
+        return 2 * settings.ADMISSION_CHART_SECONDS
+    return settings.ADMISSION_CHART_SECONDS
+
+
+class _Lane:
+    def __init__(self, name: str, slots: int, max_queued_seconds: float):
+        self.name = name
+        self.slots = slots
+        self.max_queued_seconds = max_queued_seconds
+        self.running = 0
+        self.waiting = deque()
+        self.queued_seconds = 0.0
+
+
+class _Ticket:
+    def __init__(self, lane: _Lane, cost: float, wake):
+        self.lane = lane
+        self.cost = cost
+        self.wake = wake
+        self.started = False
+        self.queued = time.perf_counter()
+
+
+class AdmissionController:
+    """Usable from threads through admit(), or from coroutines on one event loop through admit_async()."""
+
+    def __init__(self, cheap_slots: int = settings.ADMISSION_CHEAP_SLOTS,
+                 expensive_slots: int = settings.ADMISSION_EXPENSIVE_SLOTS,
+                 cheap_cost_seconds: float = settings.ADMISSION_CHEAP_COST_SECONDS,
+                 enabled: bool = settings.ADMISSION_ENABLED):
+        self.cheap_cost_seconds = cheap_cost_seconds
+        self.enabled = enabled
+        self.lanes = {
+            CHEAP: _Lane(CHEAP, cheap_slots, settings.ADMISSION_CHEAP_MAX_QUEUED_SECONDS),
+            EXPENSIVE: _Lane(EXPENSIVE, expensive_slots, settings.ADMISSION_EXPENSIVE_MAX_QUEUED_SECONDS),
+        }
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self, cost: float):
+        """Block until the request may run, or raise Overloaded if its lane's queue is full."""
+
+        if not self.enabled:
+            yield
+            return
+
+        started = threading.Event()
+        ticket = self._enqueue(cost, started.set)
+        started.wait()
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    async def admit_async(self, cost: float, function, *args):
+        """Await function(*args) once the request may run, or raise Overloaded if its lane's queue is full."""
+
+        if not self.enabled:
+            return await function(*args)
+
+        loop = asyncio.get_event_loop()
+        started = loop.create_future()
+        ticket = self._enqueue(cost, lambda: loop.call_soon_threadsafe(_set_started, started))
+        try:
+            await started
+        except asyncio.CancelledError:
+            if not self._abandon(ticket):
+                self._release(ticket)
+            raise
+
+        try:
+            return await function(*args)
+        finally:
+            self._release(ticket)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {name: {'running': lane.running, 'waiting': len(lane.waiting),
+                           'queued_seconds': lane.queued_seconds} for name, lane in self.lanes.items()}
+
+    def _enqueue(self, cost: float, wake) -> _Ticket:
+        with self._lock:
+            lane = self.lanes[CHEAP if cost <= self.cheap_cost_seconds else EXPENSIVE]
+            ticket = _Ticket(lane, cost, wake)
+
+            if lane.running < lane.slots and not lane.waiting:
+                self._start(ticket)
+                return ticket
+
+            # A request too expensive for the queue on its own is still let in when nothing else is waiting
+            if lane.waiting and lane.queued_seconds + cost > lane.max_queued_seconds:
+                retry_after = max(1, ceil(lane.queued_seconds / lane.slots))
+                metrics.increment('admission_requests', (('lane', lane.name), ('outcome', 'rejected')))
+                raise Overloaded(lane.name, retry_after)
+
+            lane.waiting.append(ticket)
+            lane.queued_seconds += cost
+            return ticket
+
+    def _start(self, ticket: _Ticket) -> None:
+        ticket.started = True
+        ticket.lane.running += 1
+        metrics.increment('admission_requests', (('lane', ticket.lane.name), ('outcome', 'admitted')))
+        metrics.observe('admission_wait_seconds', time.perf_counter() - ticket.queued, (('lane', ticket.lane.name),))
+        ticket.wake()
+
+    def _release(self, ticket: _Ticket) -> None:
+        with self._lock:
+            lane = ticket.lane
+            lane.running -= 1
+            while lane.waiting and lane.running < lane.slots:
+                waiting = lane.waiting.popleft()
+                lane.queued_seconds -= waiting.cost
+                self._start(waiting)
+            if not lane.waiting:
+                lane.queued_seconds = 0.0  # Rather than let rounding errors accumulate
+
+    def _abandon(self, ticket: _Ticket) -> bool:
+        """Take a ticket that's no longer wanted out of its queue; returns False if it had already started."""
+
+        with self._lock:
+            if ticket.started:
+                return False
+            ticket.lane.waiting.remove(ticket)
+            ticket.lane.queued_seconds -= ticket.cost
+            return True
+
+
+def _set_started(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
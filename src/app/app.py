@@ -1,16 +1,31 @@
-from flask import Flask
+import atexit
+import gc
+import os
+import threading
+import time
+import pendulum
+from flask import Flask, Response, g, request
 from flask_cors import CORS, cross_origin
 from flask_restx import Resource, Api
 import logging
-import pendulum
 import json
-import requests
-from timezonefinder import TimezoneFinder
 
+from etc.timezones import TIMEZONES
 from src.dll_tools.chartmanager import ChartManager
-from src.models.chartdata import ChartData
+from src.dll_tools.crossing_index import CrossingIndex
+from src.dll_tools.sample_store import SampleStore
+from src.dll_tools.station_index import StationIndex
+from src.dll_tools.ingress_index import IngressIndex
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
 from src import settings
+from src.app import compute, http_cache
+from src.app.admission import AdmissionController, Overloaded, estimate_cost
+from src.app.geocoding import geocode, get_cache_size, tz_resolver
+from src.app.jobs import JobQueue
+from src.app.transit_stream import TransitStreamHub
 from src.app.schemas import radix_query_schema, return_chart_query_schema, relocation_query_schema
+from src.utils.metrics import metrics
+from src.utils.snapshot import snapshots
 
 app = Flask(__name__)
 CORS(app)
@@ -21,23 +36,139 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     datefmt='%m-%d %H:%M')
 
-manager = ChartManager()
-tf = TimezoneFinder()
+# Per-process state, created by init_worker()
+manager = None
+transit_streams = None
+jobs = None
+admission = None
+
+_preloaded = {}
+_init_lock = threading.Lock()
+
+
+# ===================== Initialization ==================== #
+
+def preload() -> None:
+    """Phase one, in a pre-forking server's master process before any worker is forked (see gunicorn_conf.py).
+
+    Loads the read-only data every worker needs, so that workers share its pages copy-on-write instead of each loading
+    a copy: timezone boundaries and zone definitions, crossing, station and ingress indexes, sample stores, and the
+    ephemeris fingerprint. Everything allocated so far is then moved out of the garbage collector's sight, since
+    collections write to every tracked object and would copy the shared pages into each worker anyway.
+    """
+
+    tz_resolver.preload()
+    for name in TIMEZONES:
+        pendulum.timezone(name)
+    get_ephemeris_fingerprint()
+    _preloaded['crossing_indexes'] = CrossingIndex.load_all()
+    _preloaded['sample_stores'] = SampleStore.load_all()
+    _preloaded['station_indexes'] = StationIndex.load_all()
+    _preloaded['ingress_indexes'] = IngressIndex.load_all()
+
+    gc.collect()
+    gc.freeze()
+    logger.info(f'Preloaded shared data; {gc.get_freeze_count()} objects frozen.')
+
+
+def init_worker() -> None:
+    """Phase two, in each worker process: open its own Swiss Ephemeris handle and start its background threads, none
+    of which survive a fork. Runs on the first request if the server didn't call it after forking."""
+
+    global manager, transit_streams, jobs, admission
+    with _init_lock:
+        if manager is not None:
+            return
+        chart_manager = ChartManager(**_preloaded)
+        transit_streams = TransitStreamHub(chart_manager)
+        jobs = JobQueue(chart_manager)
+        admission = AdmissionController()
+        manager = chart_manager
+
+    # Each worker writes its caches on graceful shutdown; the last one to exit leaves the snapshot
+    atexit.register(snapshots.save)
+
+    metrics.register_collector(lambda: {
+        ('timezone_cache_cells', ()): tz_resolver.get_stats()['cells'],
+        ('timezone_cache_exact_entries', ()): tz_resolver.get_stats()['exact'],
+        ('geocode_cache_entries', ()): get_cache_size(),
+        ('crossing_index_bodies', ()): len(manager.crossing_indexes),
+        ('transit_streams', ()): transit_streams.get_stats()['streams'],
+        ('transit_stream_subscribers', ()): transit_streams.get_stats()['subscribers'],
+        ('jobs_queued', ()): jobs.get_stats()['queued'],
+        ('jobs_running', ()): jobs.get_stats()['running'],
+        ('admission_waiting', (('lane', 'cheap'),)): admission.get_stats()['cheap']['waiting'],
+        ('admission_waiting', (('lane', 'expensive'),)): admission.get_stats()['expensive']['waiting'],
+    })
+
+
+@app.before_request
+def ensure_worker_initialized():
+    if manager is None:
+        init_worker()
+
+
+# ===================== Instrumentation =================== #
+
+@app.before_request
+def start_request_metrics():
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+        metrics.start_request()
+
+
+@app.after_request
+def record_request_metrics(response):
+    if metrics.enabled and 'request_started' in g:
+        labels = (('endpoint', request.endpoint or ''), ('status', str(response.status_code)))
+        metrics.observe('request_seconds', time.perf_counter() - g.request_started, labels)
+        if settings.SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = metrics.get_server_timing()
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 # ========================= Routes ======================== #
 
+# GET forms of the cacheable routes, which take the POST body as their payload parameter
+_query_payload_params = {
+    'payload': 'The JSON payload a POST would send; sort its keys and leave out whitespace to share cache entries',
+    'fields': 'Comma-separated chart field groups to include',
+}
+
+
 @cross_origin()
 @api.route('/radix')
 class Radix(Resource):
     @api.expect(radix_query_schema)
     def post(self):
-        try:
-            radix_chart = get_radix_chart_from_json(api.payload)
-            return json.dumps(radix_chart.jsonify_chart())
-        except Exception as ex:
-            logger.exception("Error while calculating radix:")
-            return json.dumps({"err": str(ex)})
+        return _radix_response()
+
+    @api.doc(params=_query_payload_params)
+    def get(self):
+        return _radix_response()
+
+
+def _radix_response():
+    try:
+        payload = _get_payload()
+        fields = compute.parse_fields(request.args.get('fields'))
+        etag = http_cache.get_etag('radix', payload, fields)
+        if http_cache.is_not_modified('radix', request.headers.get('If-None-Match'), etag):
+            return _not_modified_response(etag)
+        geo_results = geocode(payload['location'])
+        with admission.admit(estimate_cost('radix', payload)):
+            radix_json = compute.calculate_radix(manager, payload, geo_results, fields)
+        return json.dumps(radix_json), 200, http_cache.get_cache_headers(etag, request.method)
+    except Overloaded as ex:
+        return _overloaded_response(ex)
+    except Exception as ex:
+        logger.exception("Error while calculating radix:")
+        return json.dumps({"err": str(ex)})
 
 
 @cross_origin()
@@ -46,16 +177,15 @@ class SolunarReturns(Resource):
     @api.expect(return_chart_query_schema)
     def post(self):
         try:
-            radix_chart = get_radix_chart_from_json(api.payload['radix'])
-            return_params = get_solunar_return_params_from_json(api.payload['return_params'])
-
-            return_pairs = manager.generate_radix_return_pairs(radix=radix_chart, **return_params)
-
-            result_json = []
-            for pair in return_pairs:
-                result_json.append({"radix": pair[0].jsonify_chart(), "solunar": pair[1].jsonify_chart()})
-
+            fields = compute.parse_fields(request.args.get('fields'))
+            radix_geo_results = geocode(api.payload['radix']['location'])
+            return_geo_results = geocode(api.payload['return_params']['return_location'])
+            with admission.admit(estimate_cost('solunar', api.payload)):
+                result_json = compute.calculate_solunar(manager, api.payload, radix_geo_results, return_geo_results,
+                                                        fields)
             return json.dumps(result_json)
+        except Overloaded as ex:
+            return _overloaded_response(ex)
         except Exception as ex:
             logger.exception("Error while calculating solunar:")
             return json.dumps({"err": str(ex)})
@@ -66,103 +196,126 @@ class SolunarReturns(Resource):
 class Relocate(Resource):
     @api.expect(relocation_query_schema)
     def post(self):
-        try:
-            geo_results = geocode(api.payload['location'])
-
-            radix_dt = pendulum.parse(api.payload['radix']['local_datetime'])
-
-            tz = geo_results['tz']
-            radix_dt_in_tz = radix_dt.in_tz(tz)
-            chartdata = manager.create_chartdata(
-                radix_dt_in_tz,
-                geo_results['longitude'],
-                geo_results['latitude'],
-                place_name=geo_results['place_name']
-            )
-            radix = chartdata
-
-            solunar = api.payload.get('solunar', None)
-            if solunar:
-                return_dt = pendulum.parse(api.payload['solunar']['local_datetime'])
-                return_dt_in_tz = return_dt.in_tz(tz)
-                solunar = manager.create_chartdata(
-                    return_dt_in_tz,
-                    geo_results['longitude'],
-                    geo_results['latitude'],
-                    geo_results['place_name']
-                )
-                manager.precess(radix=radix, transit_chart=solunar)
-
-            if solunar:
-                return json.dumps({"radix": radix.jsonify_chart(), "solunar": solunar.jsonify_chart()})
-            else:
-                return json.dumps(radix.jsonify_chart())
+        return _relocate_response()
 
-        except Exception as ex:
-            logger.exception("Error while relocating:")
-            return json.dumps({"err": str(ex)})
+    @api.doc(params=_query_payload_params)
+    def get(self):
+        return _relocate_response()
 
 
-# =================== Utility functions =================== #
+def _relocate_response():
+    try:
+        payload = _get_payload()
+        fields = compute.parse_fields(request.args.get('fields'))
+        etag = http_cache.get_etag('relocate', payload, fields)
+        if http_cache.is_not_modified('relocate', request.headers.get('If-None-Match'), etag):
+            return _not_modified_response(etag)
+        geo_results = geocode(payload['location'])
+        with admission.admit(estimate_cost('relocate', payload)):
+            relocation_json = compute.calculate_relocation(manager, payload, geo_results, fields)
+        return json.dumps(relocation_json), 200, http_cache.get_cache_headers(etag, request.method)
+    except Overloaded as ex:
+        return _overloaded_response(ex)
+    except Exception as ex:
+        logger.exception("Error while relocating:")
+        return json.dumps({"err": str(ex)})
 
-def get_solunar_return_params_from_json(return_params: dict) -> dict:
-    geo_results = geocode(return_params['return_location'])
 
-    start_date_raw = return_params['return_start_date']
-    start_date = pendulum.parse(start_date_raw)
-    start_date_in_tz = start_date.in_timezone(geo_results['tz'])
+def _get_payload() -> dict:
+    if request.method == 'GET':
+        return http_cache.parse_query_payload(request.args.get('payload'))
+    return api.payload
 
-    body_name = return_params['return_planet']
-    planet = settings.STRING_TO_INT_PLANET_MAP[body_name]
-    longitude = float(geo_results['longitude'])
-    latitude = float(geo_results['latitude'])
-    harmonic = int(return_params['return_harmonic'])
-    qty_of_returns = int(return_params['return_quantity'])
 
-    return {
-        "date": start_date_in_tz,
-        "body": planet,
-        "geo_longitude": longitude,
-        "geo_latitude": latitude,
-        "harmonic": harmonic,
-        "return_quantity": qty_of_returns,
-        "place_name": geo_results['place_name'],
-    }
+def _overloaded_response(ex: Overloaded):
+    return json.dumps({"err": str(ex)}), 429, {'Retry-After': str(ex.retry_after)}
 
 
-def get_radix_chart_from_json(payload: dict) -> ChartData:
-    geo_results = geocode(payload['location'])
+def _not_modified_response(etag: str) -> Response:
+    # A Response rather than a tuple, so that flask-restx doesn't give the 304 a JSON body
+    return Response(status=304, headers=http_cache.get_cache_headers(etag, request.method))
 
-    local_dt = pendulum.parse(payload['local_datetime'], tz=geo_results['tz'])
 
-    radix_chart = manager.create_chartdata(local_datetime=local_dt,
-                                           geo_longitude=geo_results['longitude'],
-                                           geo_latitude=geo_results['latitude'],
-                                           place_name=geo_results['place_name'])
-    return radix_chart
+@app.route('/transits/stream')
+def transit_stream():
+    """Server-Sent Events with the current transit chart for ?location=..., optionally limited with ?fields=..."""
 
+    try:
+        fields = compute.parse_fields(request.args.get('fields'))
+        geo_results = geocode(request.args['location'])
+    except Exception as ex:
+        logger.exception("Error while starting transit stream:")
+        return Response(json.dumps({"err": str(ex)}), status=400, mimetype='application/json')
 
-def geocode(location: str) -> dict:
-    res = requests.get(settings.MAPQUEST_ENDPOINT, params={
-        'key': settings.MAPQUEST_KEY,
-        'location': location,
+    events = transit_streams.subscribe(geo_results['longitude'], geo_results['latitude'], geo_results['tz'], fields)
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
     })
-    res.raise_for_status()
 
-    results = res.json()['results'][0]['locations'][0]
-    longitude = float(results['latLng']['lng'])
-    latitude = float(results['latLng']['lat'])
-    tz = tf.timezone_at(lng=longitude, lat=latitude)
-    place_name = f"{results['adminArea5']}, {results['adminArea3']}, {results['adminArea1']}"
-    return {
-        'longitude': longitude,
-        'latitude': latitude,
-        'tz': tz,
-        'place_name': place_name,
-    }
+
+# ====================== Background jobs ================== #
+
+@app.route('/jobs/solunar', methods=['POST'])
+def submit_solunar_job():
+    """Queue a /solunar request, with the same payload, as a background job. Responds with the job's status."""
+
+    payload = request.get_json(force=True, silent=True) or {}
+    try:
+        fields = compute.parse_fields(request.args.get('fields'))
+        radix_geo_results = geocode(payload['radix']['location'])
+        return_geo_results = geocode(payload['return_params']['return_location'])
+        job = jobs.submit_solunar(payload, radix_geo_results, return_geo_results, fields)
+    except Exception as ex:
+        logger.exception("Error while submitting solunar job:")
+        return _json_response({"err": str(ex)}, 400)
+    return _json_response(job, 202, {'Location': f'/jobs/{job["job_id"]}'})
+
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """A job's status, with its results from ?offset=... (at most ?limit=... of them); DELETE cancels the job."""
+
+    job = jobs.cancel(job_id) if request.method == 'DELETE' else jobs.get(job_id)
+    if job is None:
+        return _json_response({"err": f'No such job: {job_id}'}, 404)
+
+    if request.method == 'GET':
+        try:
+            offset = int(request.args.get('offset', 0))
+            limit = int(request.args.get('limit', settings.JOB_RESULTS_PAGE_SIZE))
+        except ValueError as ex:
+            return _json_response({"err": str(ex)}, 400)
+        job['offset'] = offset
+        job['results'] = jobs.get_results(job_id, offset, limit)
+    return _json_response(job)
+
+
+@app.route('/jobs/<job_id>/stream')
+def job_stream(job_id):
+    """Server-Sent Events with a job's results as they're calculated, resuming after Last-Event-ID if given."""
+
+    if jobs.get(job_id) is None:
+        return _json_response({"err": f'No such job: {job_id}'}, 404)
+
+    try:
+        offset = int(request.headers.get('Last-Event-ID') or request.args.get('offset', 0))
+    except ValueError as ex:
+        return _json_response({"err": str(ex)}, 400)
+    return Response(jobs.events(job_id, offset), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def _json_response(body: dict, status: int = 200, headers: dict = None) -> Response:
+    return Response(json.dumps(body), status=status, mimetype='application/json', headers=headers)
 
 
 if __name__ == '__main__':
+    # The debug reloader runs this module twice: once to watch for changes, and again in the child that serves
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_worker()
     while True:
         try:
             app.run(debug=True, port=5000)
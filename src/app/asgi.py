@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from src import settings
+from src.app import compute, http_cache
+from src.app.admission import AdmissionController, Overloaded, estimate_cost
+from src.app.geocoding import geocode
+from src.utils.metrics import metrics
+from src.utils.singleflight import AsyncSingleFlight
+from src.utils.snapshot import snapshots
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    datefmt='%m-%d %H:%M')
+
+"""
+ASGI serving mode for the chart routes.
+
+Geocoding and other I/O are awaited on the event loop (the blocking geocoder runs on a small thread pool), while the
+CPU-bound ChartManager work is dispatched to a bounded pool of worker processes. Serves the same routes and payloads
+as the Flask app. Run with `python -m src.app.asgi`, or point any ASGI server at `src.app.asgi:app`.
+"""
+
+
+class AsyncChartServer:
+    def __init__(self, worker_processes: int = settings.ASYNC_WORKER_PROCESSES,
+                 max_pending: int = settings.ASYNC_MAX_PENDING_COMPUTE,
+                 io_threads: int = settings.ASYNC_IO_THREADS,
+                 shutdown_timeout: float = settings.ASYNC_SHUTDOWN_TIMEOUT):
+        self.worker_processes = worker_processes
+        self.max_pending = max_pending
+        self.io_threads = io_threads
+        self.shutdown_timeout = shutdown_timeout
+
+        self.routes = {
+            ('POST', '/radix'): self._radix,
+            ('POST', '/solunar'): self._solunar,
+            ('POST', '/relocate'): self._relocate,
+            ('GET', '/radix'): self._radix,
+            ('GET', '/relocate'): self._relocate,
+        }
+
+        self._request_flights = AsyncSingleFlight('request')
+        # Lanes split the worker processes, so cheap requests never queue in the pool behind expensive ones
+        expensive_slots = max(1, worker_processes // 2)
+        self._admission = AdmissionController(cheap_slots=max(1, worker_processes - expensive_slots),
+                                              expensive_slots=expensive_slots)
+        self._pool = None
+        self._io_executor = None
+        self._compute_slots = None
+        self._accepting = False
+        self._in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._handle_http(scope, receive, send)
+
+    # =============================================================================================================== #
+    # ==============================================   Lifespan   =================================================== #
+    # =============================================================================================================== #
+
+    async def startup(self) -> None:
+        # Spawned rather than forked, so workers don't inherit the event loop or its threads
+        self._pool = ProcessPoolExecutor(max_workers=self.worker_processes,
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=compute.init_worker)
+        self._io_executor = ThreadPoolExecutor(max_workers=self.io_threads)
+        self._compute_slots = asyncio.Semaphore(self.max_pending)
+
+        # Start every worker now, so the first requests don't pay for loading the ephemeris and startup tests
+        loop = asyncio.get_event_loop()
+        started = await asyncio.gather(*[loop.run_in_executor(self._pool, compute.run_in_worker, 'ping')
+                                         for _ in range(self.worker_processes)])
+        for _, worker_metrics in started:
+            metrics.merge(worker_metrics)
+        self._accepting = True
+        logger.info(f'Started {self.worker_processes} chart worker processes.')
+
+    async def shutdown(self) -> None:
+        """Stop accepting requests, let in-flight ones finish, stop the worker pools, then snapshot the caches."""
+
+        self._accepting = False
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self._in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._in_flight:
+            logger.warning(f'Shutting down with {self._in_flight} requests still in flight.')
+
+        self._pool.shutdown(wait=True)
+        self._io_executor.shutdown(wait=True)
+        logger.info('Chart worker processes stopped.')
+        snapshots.save()
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as ex:
+                    logger.exception('Error during startup:')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(ex)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # =============================================================================================================== #
+    # ===============================================   Routes   ==================================================== #
+    # =============================================================================================================== #
+
+    async def _radix(self, payload: dict, fields: tuple):
+        geo_results = await self._geocode(payload['location'])
+        return await self._compute('radix', payload, geo_results, fields)
+
+    async def _solunar(self, payload: dict, fields: tuple):
+        radix_geo_results, return_geo_results = await asyncio.gather(
+            self._geocode(payload['radix']['location']),
+            self._geocode(payload['return_params']['return_location']),
+        )
+        return await self._compute('solunar', payload, radix_geo_results, return_geo_results, fields)
+
+    async def _relocate(self, payload: dict, fields: tuple):
+        geo_results = await self._geocode(payload['location'])
+        return await self._compute('relocate', payload, geo_results, fields)
+
+    async def _geocode(self, location: str) -> dict:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._io_executor, geocode, location)
+
+    async def _compute(self, function_name: str, *args):
+        """Run a compute function in the worker pool once admitted; identical concurrent requests share one run."""
+
+        key = (function_name, json.dumps(args, sort_keys=True, default=str))
+        return await self._request_flights.do(key, self._admit, function_name, *args)
+
+    async def _admit(self, function_name: str, payload: dict, *args):
+        cost = estimate_cost(function_name, payload)
+        return await self._admission.admit_async(cost, self._run_in_pool, function_name, payload, *args)
+
+    async def _run_in_pool(self, function_name: str, *args):
+        loop = asyncio.get_event_loop()
+        async with self._compute_slots:
+            with metrics.phase('compute'):
+                result_json, worker_metrics = await loop.run_in_executor(self._pool, compute.run_in_worker,
+                                                                         function_name, *args)
+        # What the worker recorded (ephemeris calls, solver iterations, cache lookups, its own phases) counts here
+        metrics.merge(worker_metrics)
+        return result_json
+
+    # =============================================================================================================== #
+    # ================================================   HTTP   ===================================================== #
+    # =============================================================================================================== #
+
+    async def _handle_http(self, scope, receive, send) -> None:
+        method, path = scope['method'], scope['path']
+
+        if method == 'OPTIONS':
+            await self._respond(send, 204, b'', extra_headers=[
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'content-type'),
+            ])
+            return
+        if method == 'GET' and path == '/metrics':
+            await self._respond(send, 200, metrics.render_prometheus().encode('utf-8'),
+                                content_type=b'text/plain; version=0.0.4')
+            return
+
+        handler = self.routes.get((method, path))
+        if handler is None:
+            await self._respond(send, 404, b'{"message": "Not found"}')
+            return
+        if not self._accepting:
+            await self._respond(send, 503, b'{"message": "Shutting down"}')
+            return
+
+        self._in_flight += 1
+        started = time.perf_counter()
+        if metrics.enabled:
+            metrics.start_request()
+        try:
+            body = await self._read_body(receive)
+            cache_headers = []
+            try:
+                query = parse_qs(scope.get('query_string', b'').decode())
+                fields = compute.parse_fields(query.get('fields', [''])[0])
+                if method == 'GET':
+                    payload = http_cache.parse_query_payload(query.get('payload', [''])[0])
+                else:
+                    payload = json.loads(body or b'{}')
+                route = path.strip('/')
+                if route in http_cache.CACHEABLE_ROUTES:
+                    etag = http_cache.get_etag(route, payload, fields)
+                    cache_headers = [(name.lower().encode('ascii'), value.encode('ascii'))
+                                     for name, value in http_cache.get_cache_headers(etag, method).items()]
+                    if http_cache.is_not_modified(route, self._get_header(scope, b'if-none-match'), etag):
+                        await self._respond(send, 304, b'', extra_headers=cache_headers)
+                        return
+                result_json = await handler(payload, fields)
+            except Overloaded as ex:
+                await self._respond(send, 429, json.dumps(json.dumps({"err": str(ex)})).encode('utf-8'),
+                                    extra_headers=[(b'retry-after', str(ex.retry_after).encode('ascii'))])
+                return
+            except Exception as ex:
+                logger.exception(f'Error while handling {path}:')
+                result_json = json.dumps({"err": str(ex)})
+                cache_headers = []
+
+            # The Flask routes return pre-serialized JSON, which flask-restx encodes a second time; match that
+            await self._respond(send, 200, json.dumps(result_json).encode('utf-8'), extra_headers=cache_headers)
+        finally:
+            self._in_flight -= 1
+            metrics.observe('request_seconds', time.perf_counter() - started, (('endpoint', path.strip('/')),))
+
+    @staticmethod
+    def _get_header(scope, name: bytes):
+        for header_name, value in scope.get('headers', ()):
+            if header_name == name:
+                return value.decode('latin-1')
+        return None
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body', False):
+                return body
+
+    @staticmethod
+    async def _respond(send, status: int, body: bytes, content_type: bytes = b'application/json',
+                       extra_headers: list = None) -> None:
+        headers = [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'access-control-allow-origin', b'*'),
+        ] + (extra_headers or [])
+        server_timing = metrics.get_server_timing() if metrics.enabled and settings.SERVER_TIMING_ENABLED else ''
+        if server_timing:
+            headers.append((b'server-timing', server_timing.encode('ascii')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = AsyncChartServer()
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        logger.error('The ASGI serving mode needs an ASGI server; install uvicorn, or run another server '
+                     'against src.app.asgi:app')
+        exit(1)
+
+    # uvicorn handles SIGINT/SIGTERM by draining connections and running the lifespan shutdown above
+    uvicorn.run(app, host='0.0.0.0', port=settings.ASYNC_PORT, lifespan='on')
@@ -0,0 +1,167 @@
+import copy
+import json
+import pendulum
+from logging import getLogger
+
+from src import settings
+from src.models.chartdata import ChartData, CHART_FIELDS
+from src.utils.metrics import metrics
+from src.utils.singleflight import SingleFlight
+
+logger = getLogger(__name__)
+
+"""
+Chart calculations behind the HTTP routes, taking already-geocoded locations and returning JSON-ready objects.
+
+The Flask app calls these with its own ChartManager. The ASGI app runs them in a process pool through
+run_in_worker(), where each worker process owns a ChartManager created by init_worker().
+"""
+
+_worker_manager = None
+chart_flights = SingleFlight('chart')
+
+
+def parse_fields(raw_fields: str = None) -> tuple:
+    """Parse a `fields=ecliptical,angles` selector; None or an empty selector means every field."""
+
+    if not raw_fields:
+        return None
+    fields = tuple(field.strip() for field in raw_fields.split(',') if field.strip())
+    unknown = [field for field in fields if field not in CHART_FIELDS]
+    if unknown:
+        raise ValueError(f'Unknown chart fields: {", ".join(unknown)}; expected any of {", ".join(CHART_FIELDS)}')
+    return fields
+
+
+def get_radix_chart(manager, payload: dict, geo_results: dict) -> ChartData:
+    """Create the radix chart for a payload. Concurrent requests for the same chart share one calculation, and each
+    gets its own copy, since the solunar calculations relocate and precess it in place."""
+
+    key = (payload['local_datetime'], geo_results['tz'], geo_results['longitude'], geo_results['latitude'],
+           geo_results['place_name'])
+    return chart_flights.do(key, _create_radix_chart, manager, payload, geo_results, copy_result=copy.deepcopy)
+
+
+def _create_radix_chart(manager, payload: dict, geo_results: dict) -> ChartData:
+    local_dt = pendulum.parse(payload['local_datetime'], tz=geo_results['tz'])
+
+    radix_chart = manager.create_chartdata(local_datetime=local_dt,
+                                           geo_longitude=geo_results['longitude'],
+                                           geo_latitude=geo_results['latitude'],
+                                           place_name=geo_results['place_name'])
+    return radix_chart
+
+
+def get_solunar_return_params(return_params: dict, geo_results: dict) -> dict:
+    start_date_raw = return_params['return_start_date']
+    start_date = pendulum.parse(start_date_raw)
+    start_date_in_tz = start_date.in_timezone(geo_results['tz'])
+
+    body_name = return_params['return_planet']
+    planet = settings.STRING_TO_INT_PLANET_MAP[body_name]
+    longitude = float(geo_results['longitude'])
+    latitude = float(geo_results['latitude'])
+    harmonic = int(return_params['return_harmonic'])
+    qty_of_returns = int(return_params['return_quantity'])
+    precision = return_params.get('return_precision') or 'seconds'
+    if precision not in settings.RETURN_PRECISIONS:
+        raise ValueError(f'return_precision must be one of {", ".join(settings.RETURN_PRECISIONS)}')
+
+    return {
+        "date": start_date_in_tz,
+        "body": planet,
+        "geo_longitude": longitude,
+        "geo_latitude": latitude,
+        "harmonic": harmonic,
+        "return_quantity": qty_of_returns,
+        "place_name": geo_results['place_name'],
+        "precision": precision,
+    }
+
+
+def calculate_radix(manager, payload: dict, geo_results: dict, fields: tuple = None) -> dict:
+    radix_chart = get_radix_chart(manager, payload, geo_results)
+    with metrics.phase('serialization'):
+        return radix_chart.jsonify_chart(fields)
+
+
+def calculate_solunar(manager, payload: dict, radix_geo_results: dict, return_geo_results: dict,
+                      fields: tuple = None) -> list:
+    radix_chart = get_radix_chart(manager, payload['radix'], radix_geo_results)
+    return_params = get_solunar_return_params(payload['return_params'], return_geo_results)
+
+    return_pairs = manager.generate_radix_return_pairs(radix=radix_chart, **return_params)
+    return jsonify_return_pairs(return_pairs, fields)
+
+
+def jsonify_return_pairs(return_pairs: list, fields: tuple = None) -> list:
+    with metrics.phase('serialization'):
+        result_json = []
+        for pair in return_pairs:
+            result_json.append({"radix": pair[0].jsonify_chart(fields), "solunar": pair[1].jsonify_chart(fields)})
+        return result_json
+
+
+def calculate_relocation(manager, payload: dict, geo_results: dict, fields: tuple = None) -> dict:
+    radix_dt = pendulum.parse(payload['radix']['local_datetime'])
+
+    tz = geo_results['tz']
+    radix_dt_in_tz = radix_dt.in_tz(tz)
+    radix = manager.create_chartdata(
+        radix_dt_in_tz,
+        geo_results['longitude'],
+        geo_results['latitude'],
+        place_name=geo_results['place_name']
+    )
+
+    solunar = payload.get('solunar', None)
+    if solunar:
+        return_dt = pendulum.parse(payload['solunar']['local_datetime'])
+        return_dt_in_tz = return_dt.in_tz(tz)
+        solunar = manager.create_chartdata(
+            return_dt_in_tz,
+            geo_results['longitude'],
+            geo_results['latitude'],
+            geo_results['place_name']
+        )
+        manager.precess(radix=radix, transit_chart=solunar)
+
+    with metrics.phase('serialization'):
+        if solunar:
+            return {"radix": radix.jsonify_chart(fields), "solunar": solunar.jsonify_chart(fields)}
+        else:
+            return radix.jsonify_chart(fields)
+
+
+# =================================================================================================================== #
+# =============================================   Worker processes   ================================================ #
+# =================================================================================================================== #
+
+def _ping(manager) -> bool:
+    return manager is not None
+
+
+WORKER_FUNCTIONS = {
+    'ping': _ping,
+    'radix': calculate_radix,
+    'solunar': calculate_solunar,
+    'relocate': calculate_relocation,
+}
+
+
+def init_worker() -> None:
+    """Process pool initializer; gives each worker process its own Swiss Ephemeris handle."""
+
+    global _worker_manager
+    from src.dll_tools.chartmanager import ChartManager
+    _worker_manager = ChartManager()
+
+
+def run_in_worker(function_name: str, *args) -> tuple:
+    """Entry point for process pool tasks. Arguments must be picklable; results come back serialized as JSON, so
+    that encoding a large result doesn't hold up the server's event loop, along with the metrics the task recorded
+    for the server to merge into its own (None when metrics are disabled)."""
+
+    metrics.start_request()
+    result_json = json.dumps(WORKER_FUNCTIONS[function_name](_worker_manager, *args))
+    return result_json, metrics.drain() if metrics.enabled else None
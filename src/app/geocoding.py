@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+import requests
+
+from src import settings
+from src.utils.metrics import metrics
+from src.utils.singleflight import SingleFlight
+from src.utils.snapshot import snapshots
+from src.utils.tz_resolver import TimezoneResolver
+
+"""
+Resolves location strings to coordinates, timezone and place name. Shared by the Flask and ASGI apps.
+
+Results are kept in a bounded LRU cache which, with the timezone grid, is included in cache snapshots (see
+src/utils/snapshot.py); both are restored from the last snapshot on the first lookup after startup.
+"""
+
+tz_resolver = TimezoneResolver()
+geocode_flights = SingleFlight('geocode')
+
+_cache = OrderedDict()  # Normalized location -> geocode result
+_cache_lock = threading.Lock()
+_restore_lock = threading.Lock()
+_restored = False
+_HIT_LABELS = (('cache', 'geocode'), ('result', 'hit'))
+_MISS_LABELS = (('cache', 'geocode'), ('result', 'miss'))
+
+
+def geocode(location: str) -> dict:
+    """Geocode a location; concurrent lookups of the same location share one request to Mapquest."""
+
+    if not _restored:
+        _restore_snapshot()
+
+    key = location.strip().lower()
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            metrics.increment('cache_lookups', _HIT_LABELS)
+            return dict(result)
+    metrics.increment('cache_lookups', _MISS_LABELS)
+
+    result = geocode_flights.do(key, _geocode, location, copy_result=dict)
+    with _cache_lock:
+        _cache[key] = dict(result)
+        while len(_cache) > settings.GEOCODE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def get_cache_size() -> int:
+    return len(_cache)
+
+
+def _geocode(location: str) -> dict:
+    with metrics.phase('geocode'):
+        res = requests.get(settings.MAPQUEST_ENDPOINT, params={
+            'key': settings.MAPQUEST_KEY,
+            'location': location,
+        })
+        res.raise_for_status()
+
+    results = res.json()['results'][0]['locations'][0]
+    longitude = float(results['latLng']['lng'])
+    latitude = float(results['latLng']['lat'])
+    with metrics.phase('timezone'):
+        tz = tz_resolver.timezone_at(lng=longitude, lat=latitude)
+    place_name = f"{results['adminArea5']}, {results['adminArea3']}, {results['adminArea1']}"
+    return {
+        'longitude': longitude,
+        'latitude': latitude,
+        'tz': tz,
+        'place_name': place_name,
+    }
+
+
+# ===================== Snapshots ==================== #
+
+def _get_snapshot() -> list:
+    with _cache_lock:
+        return [[key, result] for key, result in reversed(_cache.items())]
+
+
+def _restored_first(provider):
+    """So that a process which never geocoded carries the last snapshot over rather than overwriting it."""
+
+    def get_snapshot() -> list:
+        if not _restored:
+            _restore_snapshot()
+        return provider()
+    return get_snapshot
+
+
+def _restore_snapshot() -> None:
+    global _restored
+    with _restore_lock:
+        if _restored:
+            return
+        entries = snapshots.restore('geocode')[:settings.GEOCODE_CACHE_SIZE]
+        with _cache_lock:
+            # Behind anything cached since startup, in their original order
+            for key, result in entries:
+                if key not in _cache:
+                    _cache[key] = result
+                    _cache.move_to_end(key, last=False)
+            while len(_cache) > settings.GEOCODE_CACHE_SIZE:
+                _cache.popitem(last=False)
+        tz_resolver.restore(snapshots.restore('timezone'))
+        _restored = True
+
+
+snapshots.register('geocode', _restored_first(_get_snapshot))
+snapshots.register('timezone', _restored_first(tz_resolver.get_snapshot))
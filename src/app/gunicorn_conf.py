@@ -0,0 +1,29 @@
+import os
+
+"""
+Gunicorn settings for serving the Flask app from pre-forked worker processes:
+
+    gunicorn -c python:src.app.gunicorn_conf src.app.app:app
+
+The app is imported once in the master, which preloads the read-only data before forking, so that workers share it
+copy-on-write; each worker then creates its own ChartManager and background threads after the fork.
+"""
+
+bind = f'0.0.0.0:{os.environ.get("PORT", 5000)}'
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+
+def when_ready(server):
+    from src import settings
+    from src.app import app
+    if server.cfg.workers > 1 and not settings.JOB_STORE_PATH:
+        server.log.warning('JOB_STORE_PATH is unset, so each worker keeps its own background jobs in memory; '
+                           'polling a job from any other worker will not find it.')
+    app.preload()
+
+
+def post_fork(server, worker):
+    from src.app import app
+    app.init_worker()
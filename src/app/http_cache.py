@@ -0,0 +1,63 @@
+import hashlib
+import json
+
+from src import settings
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
+from src.models.chartdata import CHART_FIELDS
+from src.utils.metrics import metrics
+
+"""
+HTTP caching for the deterministic chart routes, shared by the Flask and ASGI apps.
+
+A /radix or /relocate response depends only on its payload and fields selector, the code version and the ephemeris
+files. Its ETag is a hash of all four, so it can be computed, and matched against If-None-Match, before any geocoding
+or calculation; a match is answered with 304 and no body. The ETag changes with VERSION_NUMBER or the ephemeris
+fingerprint, which is what invalidates cached responses on a deploy that changes results.
+
+Both routes take their payload as a POST body, or as the payload parameter of a GET, JSON-encoded as the body would
+be. Shared and browser caches only store GET responses, so only those carry Cache-Control; a POST response still
+carries its ETag, for clients that revalidate by hand. A GET whose payload is serialized with sorted keys and no
+whitespace, as get_canonical_payload() does, has the same URL as every equal request, and so shares its cache entries.
+"""
+
+CACHEABLE_ROUTES = ('radix', 'relocate')
+
+
+def get_canonical_payload(payload: dict) -> str:
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'))
+
+
+def parse_query_payload(value: str) -> dict:
+    """The payload of a GET request, from its payload parameter."""
+
+    if not value:
+        raise ValueError('A GET request needs the JSON payload a POST would send as its payload parameter')
+    payload = json.loads(value)
+    if not isinstance(payload, dict):
+        raise ValueError('The payload parameter must be a JSON object')
+    return payload
+
+
+def get_etag(route: str, payload: dict, fields: tuple = None) -> str:
+    # The fields selector only chooses groups; the response is the same whatever their order, or if all are listed
+    canonical = json.dumps([route, payload, sorted(fields or CHART_FIELDS)], sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha1(f'{settings.VERSION_NUMBER}\n{get_ephemeris_fingerprint()}\n{canonical}'.encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def is_not_modified(route: str, if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches the ETag (weakly, as RFC 7232 specifies for If-None-Match)."""
+
+    matched = False
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        matched = '*' in tags or etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+    if if_none_match is not None:
+        metrics.increment('conditional_requests', (('route', route), ('result', 'hit' if matched else 'miss')))
+    return matched
+
+
+def get_cache_headers(etag: str, method: str) -> dict:
+    if method == 'GET':
+        return {'ETag': etag, 'Cache-Control': settings.HTTP_CACHE_CONTROL}
+    return {'ETag': etag}
@@ -0,0 +1,457 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from logging import getLogger
+from typing import Iterator, List
+
+import pendulum
+
+from src import settings
+from src.app import compute
+from src.utils.metrics import metrics
+
+logger = getLogger(__name__)
+
+"""
+Background jobs for return lists too long to compute within a request.
+
+A submitted job is split into chunks of returns, run by a small pool of worker threads. After each chunk the job goes
+to the back of the queue, so long jobs take turns rather than holding a worker until they finish. Each chunk's
+results are stored as soon as they're calculated, so clients can poll or stream partial results, cancel a job
+between chunks, and a job interrupted by a restart resumes after its last stored return when jobs are kept in SQLite.
+Finished jobs and their results expire after settings.JOB_RESULT_TTL_SECONDS.
+
+Each worker process has its own queue. A job belongs to the process that claimed it, for a lease of
+settings.JOB_LEASE_SECONDS renewed with every chunk; jobs with no owner or a lapsed lease, such as those of a process
+that exited, are adopted by whichever process next finds its workers idle. Only SQLite is shared between processes,
+so a server running more than one worker process needs settings.JOB_STORE_PATH set.
+"""
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+UNFINISHED_STATUSES = (QUEUED, RUNNING)
+
+
+# =================================================================================================================== #
+# =================================================   Stores   ====================================================== #
+# =================================================================================================================== #
+
+class MemoryJobStore:
+    """Jobs and results kept in this process; they don't survive a restart, and other worker processes can't see
+    them. Only for servers running a single worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._results = {}
+
+    def create(self, job: dict) -> None:
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+            self._results[job['id']] = []
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **changes) -> None:
+        with self._lock:
+            self._jobs[job_id].update(changes)
+
+    def claim(self, job_id: str, owner: str, now: float, lease_expires: float, status: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not _is_claimable(job, owner, now):
+                return False
+            job.update(owner=owner, lease_expires=lease_expires, status=status)
+            return True
+
+    def add_results(self, job_id: str, owner: str, first_index: int, results: list, **changes) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['owner'] != owner or job['status'] != RUNNING or job['completed'] != first_index:
+                return False
+            self._results[job_id].extend(results)
+            job.update(changes)
+            return True
+
+    def get_results(self, job_id: str, offset: int, limit: int) -> list:
+        with self._lock:
+            return self._results.get(job_id, [])[offset:offset + limit]
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+    def get_ids(self, statuses: tuple) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job['status'] in statuses]
+
+    def get_expired_ids(self, now: float) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job['expires'] and job['expires'] <= now]
+
+    def get_orphaned_ids(self, owner: str, now: float) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items()
+                    if job['owner'] != owner and _is_claimable(job, None, now)]
+
+
+class SQLiteJobStore:
+    """Jobs and results kept in a SQLite database, so that queued and running jobs survive a restart."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT, request TEXT, total INTEGER, completed INTEGER, resume_after TEXT,
+                error TEXT, created REAL, finished REAL, expires REAL, owner TEXT, lease_expires REAL)''')
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT, first_index INTEGER, count INTEGER, results TEXT, PRIMARY KEY (job_id, first_index))''')
+
+            # Databases from before jobs had owners
+            columns = {row['name'] for row in self._connection.execute('PRAGMA table_info(jobs)')}
+            for column, column_type in (('owner', 'TEXT'), ('lease_expires', 'REAL')):
+                if column not in columns:
+                    self._connection.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+
+    def create(self, job: dict) -> None:
+        row = dict(job, request=json.dumps(job['request']))
+        columns = ', '.join(row)
+        with self._lock, self._connection:
+            self._connection.execute(f'INSERT INTO jobs ({columns}) VALUES ({", ".join("?" * len(row))})',
+                                     tuple(row.values()))
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['request'] = json.loads(job['request'])
+        return job
+
+    def update(self, job_id: str, **changes) -> None:
+        with self._lock, self._connection:
+            self._update(job_id, changes)
+
+    def claim(self, job_id: str, owner: str, now: float, lease_expires: float, status: str) -> bool:
+        # One statement, so that only one of several processes claiming a job at once gets it
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'UPDATE jobs SET owner = ?, lease_expires = ?, status = ? WHERE id = ? AND status IN (?, ?) '
+                'AND (owner IS NULL OR owner = ? OR lease_expires <= ?)',
+                (owner, lease_expires, status, job_id) + UNFINISHED_STATUSES + (owner, now))
+        return cursor.rowcount == 1
+
+    def add_results(self, job_id: str, owner: str, first_index: int, results: list, **changes) -> bool:
+        with self._lock, self._connection:
+            updated = self._update(job_id, changes, owner=owner, status=RUNNING, completed=first_index)
+            if updated:
+                self._connection.execute('INSERT OR IGNORE INTO job_results VALUES (?, ?, ?, ?)',
+                                         (job_id, first_index, len(results), json.dumps(results)))
+        return updated
+
+    def get_results(self, job_id: str, offset: int, limit: int) -> list:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT first_index, results FROM job_results WHERE job_id = ? AND first_index + count > ? '
+                'AND first_index < ? ORDER BY first_index', (job_id, offset, offset + limit)).fetchall()
+
+        results = []
+        for first_index, chunk in rows:
+            chunk = json.loads(chunk)
+            start = max(0, offset - first_index)
+            results.extend(chunk[start:start + limit - len(results)])
+        return results
+
+    def delete(self, job_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM job_results WHERE job_id = ?', (job_id,))
+            self._connection.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def get_ids(self, statuses: tuple) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(f'SELECT id FROM jobs WHERE status IN ({", ".join("?" * len(statuses))})'
+                                            ' ORDER BY created', statuses).fetchall()
+        return [row[0] for row in rows]
+
+    def get_expired_ids(self, now: float) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute('SELECT id FROM jobs WHERE expires <= ?', (now,)).fetchall()
+        return [row[0] for row in rows]
+
+    def get_orphaned_ids(self, owner: str, now: float) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) AND (owner IS NULL OR (owner != ? AND lease_expires <= ?)) '
+                'ORDER BY created', UNFINISHED_STATUSES + (owner, now)).fetchall()
+        return [row[0] for row in rows]
+
+    def _update(self, job_id: str, changes: dict, **conditions) -> bool:
+        """Update a job, if its columns match any conditions given; returns whether it was updated."""
+
+        assignments = ', '.join(f'{column} = ?' for column in changes)
+        where = ''.join(f' AND {column} = ?' for column in conditions)
+        cursor = self._connection.execute(f'UPDATE jobs SET {assignments} WHERE id = ?{where}',
+                                          tuple(changes.values()) + (job_id,) + tuple(conditions.values()))
+        return cursor.rowcount == 1
+
+
+# =================================================================================================================== #
+# =================================================   Queue   ======================================================= #
+# =================================================================================================================== #
+
+class JobQueue:
+    def __init__(self, manager, store=None, worker_threads: int = settings.JOB_WORKER_THREADS,
+                 chunk_returns: int = settings.JOB_CHUNK_RETURNS,
+                 result_ttl_seconds: float = settings.JOB_RESULT_TTL_SECONDS,
+                 lease_seconds: float = settings.JOB_LEASE_SECONDS):
+        self.manager = manager
+        self.store = store or (SQLiteJobStore(settings.JOB_STORE_PATH) if settings.JOB_STORE_PATH
+                               else MemoryJobStore())
+        self.chunk_returns = chunk_returns
+        self.result_ttl_seconds = result_ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex  # Identifies this process's queue to the store
+
+        # Guards status changes, and is notified whenever a job gets new results or finishes
+        self._condition = threading.Condition()
+        self._queue = queue.Queue()
+
+        self._adopt_orphans()
+
+        for i in range(worker_threads):
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+
+    def submit_solunar(self, payload: dict, radix_geo_results: dict, return_geo_results: dict,
+                       fields: tuple = None) -> dict:
+        """Queue the returns a /solunar request asks for. Return parameters are validated up front, so that a bad
+        request fails here rather than in the job."""
+
+        return_params = compute.get_solunar_return_params(payload['return_params'], return_geo_results)
+        total = return_params['return_quantity']
+        if not 0 < total <= settings.JOB_MAX_RETURN_QUANTITY:
+            raise ValueError(f'return_quantity must be between 1 and {settings.JOB_MAX_RETURN_QUANTITY}')
+
+        self._purge_expired()
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': QUEUED,
+            'request': {
+                'payload': payload,
+                'radix_geo_results': radix_geo_results,
+                'return_geo_results': return_geo_results,
+                'fields': list(fields) if fields else None,
+            },
+            'total': total,
+            'completed': 0,
+            'resume_after': None,
+            'error': None,
+            'created': now,
+            'finished': None,
+            'expires': None,
+            'owner': self.owner,
+            'lease_expires': now + self.lease_seconds,
+        }
+        self.store.create(job)
+        self._queue.put(job['id'])
+        metrics.increment('jobs_submitted')
+        return _describe(job)
+
+    def get(self, job_id: str) -> dict:
+        """A job's status and progress, or None if there is no such job or it has expired."""
+
+        self._purge_expired()
+        job = self.store.get(job_id)
+        return _describe(job) if job is not None else None
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = settings.JOB_RESULTS_PAGE_SIZE) -> list:
+        return self.store.get_results(job_id, offset, limit)
+
+    def cancel(self, job_id: str) -> dict:
+        """Stop a job after its current chunk. Results calculated so far are kept until the job expires."""
+
+        with self._condition:
+            job = self.store.get(job_id)
+            if job is None:
+                return None
+            if job['status'] in UNFINISHED_STATUSES:
+                job.update(self._finish(job_id, CANCELLED))
+        return _describe(job)
+
+    def events(self, job_id: str, offset: int = 0) -> Iterator[bytes]:
+        """Server-Sent Events with each batch of results from offset on as it's calculated, ending with the job's
+        final status. Event ids are result offsets, so a reconnecting client can resume with Last-Event-ID. Results
+        calculated by another worker process are picked up at the next keepalive."""
+
+        while True:
+            with self._condition:
+                job = self.store.get(job_id)
+                while job is not None and job['completed'] <= offset and job['status'] in UNFINISHED_STATUSES:
+                    if not self._condition.wait(settings.JOB_STREAM_KEEPALIVE_SECONDS):
+                        break
+                    job = self.store.get(job_id)
+
+            if job is None:
+                yield _format_event('end', offset, {'status': 'expired'})
+                return
+
+            if job['completed'] > offset:
+                results = self.get_results(job_id, offset, job['completed'] - offset)
+                data = {'offset': offset, 'completed': job['completed'], 'total': job['total'], 'results': results}
+                offset += len(results)
+                yield _format_event('results', offset, data)
+            elif job['status'] in UNFINISHED_STATUSES:
+                yield b': keepalive\n\n'
+            else:
+                yield _format_event('end', offset, _describe(job))
+                return
+
+    def get_stats(self) -> dict:
+        return {
+            'queued': len(self.store.get_ids((QUEUED,))),
+            'running': len(self.store.get_ids((RUNNING,))),
+        }
+
+    def _work(self) -> None:
+        while True:
+            try:
+                job_id = self._queue.get(timeout=settings.JOB_PURGE_INTERVAL_SECONDS)
+            except queue.Empty:
+                job_id = None
+
+            # Nothing may end the thread, or every job queued behind this one would hang
+            try:
+                if job_id is None:
+                    self._purge_expired()
+                    self._adopt_orphans()
+                else:
+                    self._run_chunk(job_id)
+            except Exception:
+                logger.exception(f'Error in {threading.current_thread().name}:')
+
+    def _run_chunk(self, job_id: str) -> None:
+        with self._condition:
+            if not self._claim(job_id, RUNNING):
+                return  # Finished, or taken over by another process while it waited in this one's queue
+            job = self.store.get(job_id)
+
+        try:
+            with metrics.timer('job_chunk_seconds'):
+                results, resume_after = self._calculate_chunk(job)
+
+            with self._condition:
+                completed = job['completed'] + len(results)
+                if not self.store.add_results(job_id, self.owner, job['completed'], results, status=QUEUED,
+                                              completed=completed, resume_after=resume_after):
+                    return  # Cancelled, or taken over by another process, while this chunk was running
+                if completed >= job['total']:
+                    self._finish(job_id, COMPLETED)
+                else:
+                    self._queue.put(job_id)
+                self._condition.notify_all()
+        except Exception as ex:
+            logger.exception(f'Error while running job {job_id}:')
+            with self._condition:
+                job = self.store.get(job_id)
+                if job is not None and job['status'] in UNFINISHED_STATUSES and job['owner'] == self.owner:
+                    self._finish(job_id, FAILED, str(ex))
+
+    def _calculate_chunk(self, job: dict) -> tuple:
+        """Calculate the job's next chunk of returns; returns their JSON and the UTC time of the last of them."""
+
+        request = job['request']
+        fields = tuple(request['fields']) if request['fields'] else None
+        radix_chart = compute.get_radix_chart(self.manager, request['payload']['radix'],
+                                              request['radix_geo_results'])
+        return_params = compute.get_solunar_return_params(request['payload']['return_params'],
+                                                          request['return_geo_results'])
+        quantity = min(self.chunk_returns, job['total'] - job['completed'])
+
+        if job['resume_after'] is None:
+            return_params['return_quantity'] = quantity
+            pairs = self.manager.generate_radix_return_pairs(radix=radix_chart, **return_params)
+        else:
+            # Search again from the last return found, which is found first again and dropped. Anything within a
+            # quarter of the return period of it is that same return, give or take the solver's precision; planet
+            # returns are found to the exact second, and may come days apart around a station.
+            resume_after = pendulum.parse(job['resume_after'])
+            body, harmonic = return_params['body'], return_params['harmonic']
+            if body < len(settings.ORBITAL_PERIODS_HOURS):
+                period_seconds = settings.ORBITAL_PERIODS_HOURS[body] * 3600 / harmonic
+                earliest = resume_after.add(seconds=int(period_seconds / 4))
+            else:
+                earliest = resume_after
+
+            return_params['date'] = resume_after.in_tz(return_params['date'].tz)
+            return_params['return_quantity'] = quantity + 1
+            pairs = self.manager.generate_radix_return_pairs(radix=radix_chart, **return_params)
+            pairs = [pair for pair in pairs if pair[1].utc_datetime > earliest][:quantity]
+
+        metrics.increment('job_returns', value=len(pairs))
+        return compute.jsonify_return_pairs(pairs, fields), pairs[-1][1].utc_datetime.isoformat()
+
+    def _finish(self, job_id: str, status: str, error: str = None) -> dict:
+        now = time.time()
+        changes = {'status': status, 'error': error, 'finished': now, 'expires': now + self.result_ttl_seconds}
+        self.store.update(job_id, **changes)
+        metrics.increment('jobs_finished', (('status', status),))
+        self._condition.notify_all()
+        return changes
+
+    def _claim(self, job_id: str, status: str) -> bool:
+        now = time.time()
+        return self.store.claim(job_id, self.owner, now, now + self.lease_seconds, status)
+
+    def _adopt_orphans(self) -> None:
+        """Queue unfinished jobs that no live process owns: those of a previous run, or of another worker process
+        that exited or stopped renewing its lease."""
+
+        for job_id in self.store.get_orphaned_ids(self.owner, time.time()):
+            if self._claim(job_id, QUEUED):
+                logger.info(f'Resuming job {job_id}')
+                self._queue.put(job_id)
+
+    def _purge_expired(self) -> None:
+        for job_id in self.store.get_expired_ids(time.time()):
+            self.store.delete(job_id)
+
+
+def _is_claimable(job: dict, owner: str, now: float) -> bool:
+    return (job['status'] in UNFINISHED_STATUSES
+            and (job['owner'] is None or job['owner'] == owner or job['lease_expires'] <= now))
+
+
+def _describe(job: dict) -> dict:
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'completed': job['completed'],
+        'total': job['total'],
+        'progress': job['completed'] / job['total'],
+        'error': job['error'],
+        'created': _format_time(job['created']),
+        'finished': _format_time(job['finished']),
+        'expires': _format_time(job['expires']),
+    }
+
+
+def _format_time(timestamp: float) -> str:
+    return pendulum.from_timestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+def _format_event(event: str, event_id: int, data: dict) -> bytes:
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'.encode('utf-8')
@@ -0,0 +1,207 @@
+import argparse
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+"""
+Local load test for the chart routes: a mix of cheap /radix calls and heavy /solunar calls, reporting latency
+percentiles per route. Requests shed by admission control (429) are counted separately from errors.
+
+Either targets a running server with --url, or starts one in-process with --serve flask|asgi, in which case
+geocoding is stubbed so that results only reflect chart computation and serving overhead.
+"""
+
+STUB_LOCATIONS = {
+    'Hackensack': (-74.1169, 40.9792, 'America/New_York'),
+    'Melbourne': (144.9666, -37.8166, 'Australia/Melbourne'),
+}
+
+RADIX_PAYLOAD = {'local_datetime': '1989-03-18T22:30:15', 'location': 'Hackensack'}
+
+
+def stub_geocode(location: str) -> dict:
+    longitude, latitude, tz = STUB_LOCATIONS.get(location, STUB_LOCATIONS['Hackensack'])
+    return {'longitude': longitude, 'latitude': latitude, 'tz': tz, 'place_name': location}
+
+
+def get_solunar_payload(quantity: int, harmonic: int, planet: str) -> dict:
+    return {
+        'radix': RADIX_PAYLOAD,
+        'return_params': {
+            'return_planet': planet,
+            'return_harmonic': harmonic,
+            'return_start_date': '2019-03-24T10:00:00',
+            'return_location': 'Melbourne',
+            'return_quantity': quantity,
+        },
+    }
+
+
+# =================================================================================================================== #
+# ================================================   Servers   ====================================================== #
+# =================================================================================================================== #
+
+def serve_flask(port: int):
+    from werkzeug.serving import make_server
+    from src.app import app as app_module
+
+    app_module.geocode = stub_geocode
+    server = make_server('127.0.0.1', port, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def serve_asgi(port: int):
+    import uvicorn
+    from src.app import asgi
+
+    asgi.geocode = stub_geocode
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=port, lifespan='on', log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.1)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop
+
+
+# =================================================================================================================== #
+# ================================================   Clients   ====================================================== #
+# =================================================================================================================== #
+
+class LoadTest:
+    def __init__(self, url: str, concurrency: int, duration: float, solunar_fraction: float, solunar_payload: dict,
+                 seed: int = 0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.concurrency = concurrency
+        self.duration = duration
+        self.solunar_fraction = solunar_fraction
+        self.solunar_payload = solunar_payload
+        self.seed = seed
+
+        self._lock = threading.Lock()
+        self.latencies = {'/radix': [], '/solunar': []}
+        self.errors = {'/radix': 0, '/solunar': 0}
+        self.rejected = {'/radix': 0, '/solunar': 0}
+
+    def run(self) -> dict:
+        deadline = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self._client, args=(deadline, random.Random(self.seed + i)))
+                   for i in range(self.concurrency)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = {}
+        for route, latencies in self.latencies.items():
+            latencies.sort()
+            report[route] = {
+                'requests': len(latencies),
+                'errors': self.errors[route],
+                'rejected': self.rejected[route],
+                'per_second': len(latencies) / elapsed,
+                'p50_ms': _percentile(latencies, 0.50) * 1000,
+                'p95_ms': _percentile(latencies, 0.95) * 1000,
+                'p99_ms': _percentile(latencies, 0.99) * 1000,
+                'max_ms': (latencies[-1] if latencies else 0) * 1000,
+            }
+        return report
+
+    def _client(self, deadline: float, rng: random.Random) -> None:
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        while time.monotonic() < deadline:
+            if rng.random() < self.solunar_fraction:
+                route, payload = '/solunar', self.solunar_payload
+            else:
+                route, payload = '/radix', RADIX_PAYLOAD
+
+            started = time.perf_counter()
+            try:
+                connection.request('POST', route, body=json.dumps(payload),
+                                   headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                body = response.read()
+                status = response.status
+                retry_after = float(response.getheader('Retry-After') or 0)
+                ok = status == 200 and b'err' not in body[:12]
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=300)
+                status, ok = None, False
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                if ok:
+                    self.latencies[route].append(elapsed)
+                elif status == 429:
+                    self.rejected[route] += 1
+                else:
+                    self.errors[route] += 1
+            if status == 429:
+                time.sleep(min(retry_after, max(0.0, deadline - time.monotonic())))
+        connection.close()
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed /radix + /solunar load test.')
+    parser.add_argument('--url', help='Target a running server instead of starting one')
+    parser.add_argument('--serve', choices=['flask', 'asgi'], default='asgi',
+                        help='Server to start in-process (with geocoding stubbed) when --url is not given')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--solunar-fraction', type=float, default=0.2)
+    parser.add_argument('--solunar-quantity', type=int, default=100)
+    parser.add_argument('--solunar-harmonic', type=int, default=4)
+    parser.add_argument('--solunar-planet', default='Moon')
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    stop = None
+    url = args.url
+    if not url:
+        stop = serve_flask(args.port) if args.serve == 'flask' else serve_asgi(args.port)
+        url = f'http://127.0.0.1:{args.port}'
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        payload = get_solunar_payload(args.solunar_quantity, args.solunar_harmonic, args.solunar_planet)
+        report = LoadTest(url, args.concurrency, args.duration, args.solunar_fraction, payload).run()
+    finally:
+        if stop:
+            stop()
+
+    print(f'{"route":<12}{"requests":>10}{"errors":>8}{"429s":>8}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}'
+          f'{"p99 ms":>10}{"max ms":>10}')
+    for route, stats in report.items():
+        print(f'{route:<12}{stats["requests"]:>10}{stats["errors"]:>8}{stats["rejected"]:>8}'
+              f'{stats["per_second"]:>9.1f}{stats["p50_ms"]:>10.1f}{stats["p95_ms"]:>10.1f}{stats["p99_ms"]:>10.1f}'
+              f'{stats["max_ms"]:>10.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ solunar_param_schema = {
     'return_start_date': fields.Date(),
     'return_location': fields.String(),
     'return_quantity': fields.Integer(),
+    'return_precision': fields.String(),
 }
 
 return_chart_query_schema = {
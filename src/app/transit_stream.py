@@ -0,0 +1,236 @@
+import copy
+import json
+import threading
+import time
+from logging import getLogger
+from typing import Callable, Iterator
+
+import pendulum
+
+from src import settings
+from src.models.chartdata import ChartData
+from src.utils.metrics import metrics
+
+logger = getLogger(__name__)
+
+"""
+Live transit charts pushed to subscribers as Server-Sent Events.
+
+Each location has one TransitStream, which calculates the transit chart once per tick and shares the serialized
+event between all of its subscribers, so the cost of a location doesn't grow with its audience. Between full
+recalculations ("resyncs") planet positions are extrapolated linearly from the speeds Swiss Ephemeris returns with
+them. Every resync measures how far the extrapolation had drifted, and the resync interval is halved or doubled to
+keep that drift within the error budget.
+"""
+
+
+class TransitStream:
+    def __init__(self, manager, geo_longitude: float, geo_latitude: float, tz: str, fields: tuple = None,
+                 error_budget: float = settings.TRANSIT_STREAM_ERROR_BUDGET,
+                 min_resync_seconds: float = settings.TRANSIT_STREAM_MIN_RESYNC_SECONDS,
+                 max_resync_seconds: float = settings.TRANSIT_STREAM_MAX_RESYNC_SECONDS,
+                 clock: Callable[[], pendulum.DateTime] = None):
+        self.manager = manager
+        self.geo_longitude = geo_longitude
+        self.geo_latitude = geo_latitude
+        self.tz = tz
+        self.fields = fields
+        self.error_budget = error_budget
+        self.min_resync_seconds = min_resync_seconds
+        self.max_resync_seconds = max_resync_seconds
+        self.clock = clock or (lambda: pendulum.now('UTC'))
+
+        self.resync_seconds = min_resync_seconds
+        self.last_error = None
+        self.subscribers = 0
+        self.idle_since = time.monotonic()
+
+        self._base = None  # Chart from the last resync, whose positions and speeds are extrapolated
+        self._next_resync = None
+        self._update_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._event = None
+        self._sequence = 0
+        self._stopped = False
+
+    def update(self) -> None:
+        """Calculate the chart for the current time and publish it to every subscriber."""
+
+        with self._update_lock:
+            now = self.clock()
+            resync = self._base is None or now >= self._next_resync
+            if resync:
+                chart = self._resync(now)
+            else:
+                chart = self._extrapolate(now)
+            metrics.increment('transit_stream_updates', (('kind', 'resync' if resync else 'extrapolated'),))
+
+            with self._condition:
+                self._sequence += 1
+                payload = {'sequence': self._sequence, 'resync': resync, 'chart': chart.jsonify_chart(self.fields)}
+                self._event = f'id: {self._sequence}\nevent: transits\ndata: {json.dumps(payload)}\n\n'.encode('utf-8')
+                self._condition.notify_all()
+
+    def events(self) -> Iterator[bytes]:
+        """Yield the latest event, then each new one as it's published. Subscribers that fall behind skip straight
+        to the latest event rather than queueing old ones."""
+
+        seen = 0
+        while True:
+            with self._condition:
+                while self._sequence == seen and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                seen = self._sequence
+                event = self._event
+            yield event
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _resync(self, now: pendulum.DateTime) -> ChartData:
+        chart = self.manager.create_chartdata(now.in_tz(self.tz), self.geo_longitude, self.geo_latitude)
+        chart.planets_ecliptic = self.manager._populate_ecliptic_values(chart.julian_day,
+                                                                        settings.SIDEREALMODE_WITH_SPEED)
+
+        if self._base is not None:
+            predicted = self._extrapolate(now).planets_ecliptic
+            self.last_error = max(_angular_distance(predicted[name][0], position[0])
+                                  for name, position in chart.planets_ecliptic.items())
+            metrics.observe('transit_extrapolation_error_degrees', self.last_error)
+
+            if self.last_error > self.error_budget:
+                self.resync_seconds = max(self.min_resync_seconds, self.resync_seconds / 2)
+            elif self.last_error < self.error_budget / 4:
+                self.resync_seconds = min(self.max_resync_seconds, self.resync_seconds * 2)
+
+        self._base = chart
+        self._next_resync = now.add(seconds=self.resync_seconds)
+        return chart
+
+    def _extrapolate(self, now: pendulum.DateTime) -> ChartData:
+        """Advance the last resynced chart to now. Only the local sidereal time is recalculated; mundane positions,
+        right ascension, angles and cusps follow lazily from the result without any planetary ephemeris calls."""
+
+        base = self._base
+        elapsed_days = (now - base.utc_datetime).total_seconds() / 86400
+
+        chart = ChartData(now.in_tz(self.tz), now, base.julian_day + elapsed_days, manager=self.manager)
+        chart.sidereal_framework = copy.copy(base.sidereal_framework)
+        chart.sidereal_framework.LST = self.manager._calculate_LST(now, self.geo_longitude)
+        chart.sidereal_framework.ramc = chart.sidereal_framework.LST * 15
+
+        # Longitude, latitude and distance advanced by their speeds; the speeds themselves are kept
+        chart.planets_ecliptic = {
+            name: [(position[0] + position[3] * elapsed_days) % 360,
+                   position[1] + position[4] * elapsed_days,
+                   position[2] + position[5] * elapsed_days,
+                   position[3], position[4], position[5]]
+            for name, position in base.planets_ecliptic.items()
+        }
+        return chart
+
+
+class TransitStreamHub:
+    """Owns one TransitStream per location and field selection, and a single thread that ticks all of them."""
+
+    def __init__(self, manager, tick_seconds: float = settings.TRANSIT_STREAM_TICK_SECONDS,
+                 idle_seconds: float = settings.TRANSIT_STREAM_IDLE_SECONDS, **stream_options):
+        self.manager = manager
+        self.tick_seconds = tick_seconds
+        self.idle_seconds = idle_seconds
+        self.stream_options = stream_options
+
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._ticker = None
+
+    def subscribe(self, geo_longitude: float, geo_latitude: float, tz: str,
+                  fields: tuple = None) -> 'Subscription':
+        """Server-Sent Events for a location, starting with its current chart."""
+
+        key = (round(geo_longitude, 4), round(geo_latitude, 4), tz, fields)
+        with self._lock:
+            stream = self._streams.get(key)
+            created = stream is None
+            if created:
+                stream = TransitStream(self.manager, geo_longitude, geo_latitude, tz, fields, **self.stream_options)
+                self._streams[key] = stream
+            stream.subscribers += 1
+            if self._ticker is None:
+                self._ticker = threading.Thread(target=self._tick, name='transit-stream', daemon=True)
+                self._ticker.start()
+
+        subscription = Subscription(self, stream)
+        if created:
+            try:
+                stream.update()
+            except Exception:
+                subscription.close()
+                raise
+        return subscription
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'streams': len(self._streams),
+                'subscribers': sum(stream.subscribers for stream in self._streams.values()),
+            }
+
+    def _detach(self, stream: TransitStream) -> None:
+        with self._lock:
+            stream.subscribers -= 1
+            if not stream.subscribers:
+                stream.idle_since = time.monotonic()
+
+    def _tick(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick_seconds
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+            with self._lock:
+                now = time.monotonic()
+                for key, stream in list(self._streams.items()):
+                    if not stream.subscribers and now - stream.idle_since > self.idle_seconds:
+                        del self._streams[key]
+                        stream.stop()
+                if not self._streams:
+                    self._ticker = None
+                    return
+                streams = list(self._streams.values())
+
+            for stream in streams:
+                try:
+                    stream.update()
+                except Exception:
+                    logger.exception(f'Error while updating transit stream for {stream.tz}:')
+
+
+class Subscription:
+    """One subscriber's iterator over a stream's events. The server closes it when the client disconnects."""
+
+    def __init__(self, hub: TransitStreamHub, stream: TransitStream):
+        self._hub = hub
+        self._stream = stream
+        self._events = stream.events()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._events)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._hub._detach(self._stream)
+
+
+def _angular_distance(a: float, b: float) -> float:
+    difference = abs(a - b) % 360
+    return min(difference, 360 - difference)
@@ -0,0 +1,255 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from logging import getLogger
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools import vectormath
+
+logger = getLogger(__name__)
+
+"""
+Calculates charts in bulk from a CSV of birth records whose coordinates and timezones are already resolved:
+
+    python -m src.dll_tools.bulk_charts records.csv output/ --format csv
+
+The input needs local_datetime, tz, longitude and latitude columns, and may have an id column. Records are read as a
+stream, calculated in chunks by a pool of worker processes (each with its own ChartManager) and written in input order
+as each chunk finishes, so memory stays bounded by the chunks in flight whatever the size of the input. Output is one
+columnar .npz file per chunk or a single CSV, with each chart's input row number so that skipped records (unparseable
+dates or unknown timezones, which are logged) can be told apart. After every chunk a checkpoint records how far the
+output got; running the same command again resumes from there.
+"""
+
+CHECKPOINT_FILE = 'checkpoint.json'
+CSV_FILE = 'charts.csv'
+FORMATS = ('npz', 'csv')
+
+_worker_manager = None
+
+
+class BulkChartProcessor:
+    def __init__(self, input_path: str, output_directory: str, output_format: str = 'npz',
+                 chunk_records: int = settings.BULK_CHUNK_RECORDS,
+                 worker_processes: int = settings.BULK_WORKER_PROCESSES):
+        if output_format not in FORMATS:
+            raise ValueError(f'Output format must be one of {", ".join(FORMATS)}')
+        self.input_path = input_path
+        self.output_directory = output_directory
+        self.output_format = output_format
+        self.chunk_records = chunk_records
+        self.worker_processes = worker_processes
+
+        self.checkpoint_path = os.path.join(output_directory, CHECKPOINT_FILE)
+        self.records = 0  # Input records read past, whether written or skipped
+        self.charts = 0
+        self.skipped = 0
+        self.parts = 0
+        self.csv_bytes = 0
+
+    def run(self) -> None:
+        os.makedirs(self.output_directory, exist_ok=True)
+        self._load_checkpoint()
+        started = time.perf_counter()
+        resumed_from = self.records
+
+        with open(self.input_path, newline='') as input_file:
+            reader = csv.DictReader(input_file)
+            missing = {'local_datetime', 'tz', 'longitude', 'latitude'} - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f'Input is missing columns: {", ".join(sorted(missing))}')
+            rows = islice(reader, self.records, None)
+
+            pool = ProcessPoolExecutor(max_workers=self.worker_processes,
+                                       mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+            pending = deque()
+            first_row = self.records
+            try:
+                while True:
+                    # Bounded read-ahead: two chunks per worker in flight, written strictly in input order
+                    while len(pending) < 2 * self.worker_processes:
+                        chunk = [_parse_row(row) for row in islice(rows, self.chunk_records)]
+                        if not chunk:
+                            break
+                        pending.append(pool.submit(_calculate_chunk, first_row, chunk))
+                        first_row += len(chunk)
+                    if not pending:
+                        break
+
+                    columns, chunk_size, skipped = pending.popleft().result()
+                    self._write(columns)
+                    self.records += chunk_size
+                    self.charts += chunk_size - len(skipped)
+                    self.skipped += len(skipped)
+                    for row_number, error in skipped:
+                        logger.warning(f'Skipped record {row_number}: {error}')
+                    self._save_checkpoint()
+                    self._report_progress(started, resumed_from)
+            finally:
+                for future in pending:
+                    future.cancel()
+                pool.shutdown(wait=True)
+
+        sys.stderr.write('\n')
+        logger.info(f'Wrote {self.charts} charts to {self.output_directory} ({self.skipped} records skipped) in '
+                    f'{time.perf_counter() - started:.1f}s')
+
+    # =============================================================================================================== #
+    # =======================================   Internal functions   ================================================ #
+    # =============================================================================================================== #
+
+    def _write(self, columns: dict) -> None:
+        if self.output_format == 'npz':
+            # Written under a temporary name, so that a part file only exists once it is complete
+            path = os.path.join(self.output_directory, f'part-{self.parts:05d}.npz')
+            temporary_path = f'{path}.tmp.npz'
+            np.savez(temporary_path, planets=np.array(columns.pop('planets')), **columns)
+            os.replace(temporary_path, path)
+        else:
+            path = os.path.join(self.output_directory, CSV_FILE)
+            with open(path, 'a', newline='') as f:
+                # Drop anything written after the last checkpoint by an interrupted run
+                f.truncate(self.csv_bytes)
+                writer = csv.writer(f)
+                if self.csv_bytes == 0:
+                    writer.writerow(_get_csv_header(columns['planets']))
+                writer.writerows(_get_csv_rows(columns))
+                self.csv_bytes = f.tell()
+        self.parts += 1
+
+    def _load_checkpoint(self) -> None:
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['input'] != os.path.abspath(self.input_path) or checkpoint['format'] != self.output_format:
+            raise ValueError(f'{self.output_directory} holds output for another input file or format')
+
+        self.records = checkpoint['records']
+        self.charts = checkpoint['charts']
+        self.skipped = checkpoint['skipped']
+        self.parts = checkpoint['parts']
+        self.csv_bytes = checkpoint['csv_bytes']
+        logger.info(f'Resuming after record {self.records} ({self.charts} charts written).')
+
+    def _save_checkpoint(self) -> None:
+        temporary_path = f'{self.checkpoint_path}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(self.input_path),
+                'format': self.output_format,
+                'records': self.records,
+                'charts': self.charts,
+                'skipped': self.skipped,
+                'parts': self.parts,
+                'csv_bytes': self.csv_bytes,
+            }, f)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _report_progress(self, started: float, resumed_from: int) -> None:
+        elapsed = time.perf_counter() - started
+        rate = (self.records - resumed_from) / elapsed if elapsed else 0
+        sys.stderr.write(f'\r{self.records} records, {self.charts} charts, {self.skipped} skipped, '
+                         f'{rate:.0f} records/s, {elapsed:.0f}s elapsed')
+        sys.stderr.flush()
+
+
+# =================================================================================================================== #
+# =============================================   Worker processes   ================================================ #
+# =================================================================================================================== #
+
+def _init_worker() -> None:
+    global _worker_manager
+    from src.dll_tools.chartmanager import ChartManager
+    _worker_manager = ChartManager()
+
+
+def _parse_row(row: dict) -> tuple:
+    return row.get('id', ''), row['local_datetime'], row['tz'], row['longitude'], row['latitude']
+
+
+def _calculate_chunk(first_row: int, chunk: list) -> tuple:
+    """Calculate the charts for a chunk of parsed rows; returns their columns, the chunk size, and the row number and
+    error of each skipped record."""
+
+    row_numbers, ids, timestamps, geo_longitudes, geo_latitudes = [], [], [], [], []
+    skipped = []
+    for row_number, (record_id, local_datetime, tz, longitude, latitude) in enumerate(chunk, first_row):
+        try:
+            local_dt = pendulum.parse(local_datetime, tz=tz)
+            geo_longitudes.append(float(longitude))
+            geo_latitudes.append(float(latitude))
+        except Exception as ex:
+            skipped.append((row_number, str(ex)))
+            continue
+        row_numbers.append(row_number)
+        ids.append(record_id)
+        # Whole seconds, as in create_chartdata()
+        timestamps.append(int(local_dt.timestamp()))
+
+    julian_days = vectormath.julian_days_from_timestamps(timestamps)
+    columns = _worker_manager.chart_columns(julian_days, geo_longitudes, geo_latitudes)
+    columns['row'] = np.array(row_numbers, dtype=np.int64)
+    columns['id'] = np.array(ids, dtype=str)
+    return columns, len(chunk), skipped
+
+
+# =================================================================================================================== #
+# ===============================================   CSV output   ==================================================== #
+# =================================================================================================================== #
+
+_SCALAR_COLUMNS = ('row', 'id', 'julian_day', 'geo_longitude', 'geo_latitude', 'lst', 'ramc', 'svp', 'obliquity')
+_PLANET_COLUMNS = ('ecliptic_longitude', 'ecliptic_latitude', 'ecliptic_speed', 'house', 'mundane',
+                   'right_ascension')
+_ANGLES = ('Asc', 'MC', 'Eq Asc')
+
+
+def _get_csv_header(planets: list) -> list:
+    return (list(_SCALAR_COLUMNS)
+            + [f'{planet} {column}' for column in _PLANET_COLUMNS for planet in planets]
+            + [f'Cusp {number}' for number in range(1, 13)]
+            + list(_ANGLES))
+
+
+def _get_csv_rows(columns: dict):
+    arrays = ([columns[column][:, None] for column in _SCALAR_COLUMNS]
+              + [columns[column] for column in _PLANET_COLUMNS]
+              + [columns['cusps'], columns['angles']])
+    for i in range(len(columns['row'])):
+        yield [value for array in arrays for value in array[i].tolist()]
+
+
+# =================================================================================================================== #
+# ===============================================   Command line   ================================================== #
+# =================================================================================================================== #
+
+def main():
+    import logging
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        datefmt='%m-%d %H:%M')
+
+    parser = argparse.ArgumentParser(description='Calculate charts for a CSV of geocoded birth records.')
+    parser.add_argument('input', help='CSV with local_datetime, tz, longitude, latitude and optionally id columns')
+    parser.add_argument('output', help='Directory for the output and checkpoint; resumes if it has a checkpoint')
+    parser.add_argument('--format', choices=FORMATS, default='npz',
+                        help='One columnar .npz file per chunk, or a single CSV')
+    parser.add_argument('--chunk-records', type=int, default=settings.BULK_CHUNK_RECORDS)
+    parser.add_argument('--workers', type=int, default=settings.BULK_WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    BulkChartProcessor(args.input, args.output, args.format, args.chunk_records, args.workers).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,53 @@
 import copy
+import numpy as np
 import pendulum
 from logging import getLogger
-from typing import Tuple, List, Union
-from ctypes import c_double, create_string_buffer
-from math import sin, cos, tan, asin, atan, degrees, radians, fabs, ceil
+from typing import Callable, Dict, Iterator, Tuple, List, Union
+from ctypes import c_double, c_int, c_int32, byref, create_string_buffer
+from math import sin, cos, tan, asin, atan, degrees, radians, fabs, ceil, floor, gcd
+from functools import reduce
 
 from src.models.chartdata import ChartData
 from src.models.sidereal_framework import SiderealFramework
 from src.dll_tools.swissephlib import SwissephLib
+from src.dll_tools.crossing_index import CrossingIndex
+from src.dll_tools.sample_store import SampleStore
+from src.dll_tools.station_index import StationIndex, RETROGRADE
+from src.dll_tools.ingress_index import IngressIndex
+from src.dll_tools import vectormath
 from src.dll_tools.tests.functionality_tests import run_tests
+from src.utils.metrics import metrics
+from src.utils.singleflight import SingleFlight
 
 from src import settings
 
 logger = getLogger(__name__)
 
+_SEARCH_SOLVER_LABELS = (('solver', 'search'),)
+_INDEXED_SOLVER_LABELS = (('solver', 'indexed'),)
+_BATCH_SOLVER_LABELS = (('solver', 'batch'),)
+_MULTI_HARMONIC_SOLVER_LABELS = (('solver', 'multi_harmonic'),)
+_STATION_SOLVER_LABELS = (('solver', 'station'),)
+_PHASE_SOLVER_LABELS = (('solver', 'phase'),)
+_ANGULARITY_SOLVER_LABELS = (('solver', 'angularity'),)
+_INGRESS_SOLVER_LABELS = (('solver', 'ingress'),)
+
 
 class ChartManager:
     """
     Singleton that manages chart data sets. Initialized with an instance of a SwissephLib library wrapper class.
     """
 
-    def __init__(self):
+    def __init__(self, crossing_indexes: Dict[int, CrossingIndex] = None,
+                 sample_stores: Dict[int, SampleStore] = None,
+                 station_indexes: Dict[int, StationIndex] = None,
+                 ingress_indexes: Dict[int, IngressIndex] = None):
         self.lib = SwissephLib()
+        self.crossing_indexes = CrossingIndex.load_all() if crossing_indexes is None else crossing_indexes
+        self.sample_stores = SampleStore.load_all() if sample_stores is None else sample_stores
+        self.station_indexes = StationIndex.load_all() if station_indexes is None else station_indexes
+        self.ingress_indexes = IngressIndex.load_all() if ingress_indexes is None else ingress_indexes
+        self.return_time_flights = SingleFlight('return_times')
         run_tests(self)
 
     def __del__(self):
@@ -33,41 +59,41 @@ class ChartManager:
 
     def create_chartdata(self, local_datetime: pendulum.datetime, geo_longitude: float,
                          geo_latitude: float, place_name: str = None) -> ChartData:
-        """Create a ChartData instance representing an astrological chart."""
-
-        utc_datetime = local_datetime.in_tz("UTC")
-        julian_day = self._calculate_julian_day(utc_datetime)
-        chart = ChartData(local_datetime, utc_datetime, julian_day)
-        chart.sidereal_framework = self._initialize_sidereal_framework(utc_datetime, geo_longitude, geo_latitude)
-        chart.planets_ecliptic = self._populate_ecliptic_values(julian_day)
-        chart.planets_mundane = self._populate_mundane_values(chart)
-        chart.planets_right_ascension = self._populate_right_ascension_values(chart)
-        chart.angles_longitude, chart.cusps_longitude = self._populate_ecliptical_angles_and_cusps(chart)
-        chart.place_name = place_name
+        """Create a ChartData instance representing an astrological chart. Planetary positions, angles and cusps
+        are calculated lazily, when first read."""
+
+        with metrics.phase('create_chartdata'):
+            utc_datetime = local_datetime.in_tz("UTC")
+            julian_day = self._calculate_julian_day(utc_datetime)
+            # Positions, angles and cusps are calculated by the chart on first access
+            chart = ChartData(local_datetime, utc_datetime, julian_day, manager=self)
+            chart.sidereal_framework = self._initialize_sidereal_framework(utc_datetime, geo_longitude,
+                                                                           geo_latitude)
+            chart.place_name = place_name
 
         return chart
 
     def relocate(self, radix: ChartData, geo_longitude: float, geo_latitude: float, timezone: str) -> None:
-        """Recalculate prime vertical longitude, right ascension, and ecliptical angles and cusps against a new
-         sidereal framework. Done on the radix chart in place."""
+        """Move the radix chart's sidereal framework to a new location, so that prime vertical longitude, right
+         ascension, and ecliptical angles and cusps are recalculated against it. Done on the radix chart in place."""
 
+        # The framework may be shared with a chart this one was precessed into; don't move that one too
+        radix.sidereal_framework = copy.copy(radix.sidereal_framework)
         radix.sidereal_framework.geo_longitude = geo_longitude
         radix.sidereal_framework.geo_latitude = geo_latitude
+        radix.sidereal_framework.LST = self._calculate_LST(radix.utc_datetime, geo_longitude)
+        radix.sidereal_framework.ramc = radix.sidereal_framework.LST * 15
         radix.local_datetime = radix.local_datetime.in_tz(timezone)
-        radix.planets_mundane = self._populate_mundane_values(radix)
-        radix.planets_right_ascension = self._populate_right_ascension_values(radix)
-        radix.angles_longitude, radix.cusps_longitude = self._populate_ecliptical_angles_and_cusps(radix)
+        radix.reset_framework_fields()
 
     def precess(self, radix: ChartData, transit_chart: ChartData) -> None:
-        """Recalculate prime vertical longitude, right ascension, and ecliptical angles and cusps against a transiting
-        chart's sidereal framework. Done on the radix chart in place."""
+        """Put the radix chart into a transiting chart's sidereal framework, so that prime vertical longitude, right
+        ascension, and ecliptical angles and cusps are recalculated against it. Done on the radix chart in place."""
 
         radix.sidereal_framework = transit_chart.sidereal_framework
         radix.local_datetime = radix.local_datetime.in_tz(transit_chart.local_datetime.tz)
         radix.tz = transit_chart.local_datetime.tz
-        radix.planets_mundane = self._populate_mundane_values(radix)
-        radix.planets_right_ascension = self._populate_right_ascension_values(radix)
-        radix.angles_longitude, radix.cusps_longitude = self._populate_ecliptical_angles_and_cusps(radix)
+        radix.reset_framework_fields()
 
     def get_transit_sensitive_charts(self, radix: ChartData, local_dt: pendulum.datetime, geo_longitude: float,
                                      geo_latitude: float) -> dict:
@@ -113,22 +139,168 @@ class ChartManager:
         # Create chart based on progressed date
         chart = self.create_chartdata(progressed_dt, geo_longitude, geo_latitude)
 
-        # Precess chart into actual date
+        # Precess chart into actual date; the houses are those of the actual date too, not of the progressed one
         chart.local_datetime = local_dt
         chart.utc_datetime = local_dt.in_tz('UTC')
-        chart.sidereal_framework = self._initialize_sidereal_framework(local_dt.in_tz('UTC'), geo_longitude,
+        chart.houses_julian_day = self._calculate_julian_day(chart.utc_datetime)
+        chart.sidereal_framework = self._initialize_sidereal_framework(chart.utc_datetime, geo_longitude,
                                                                        geo_latitude)
-        chart.planets_mundane = self._populate_mundane_values(chart)
-        chart.planets_right_ascension = self._populate_right_ascension_values(chart)
+        chart.reset_framework_fields()
         return chart
 
+    def progression_timeline(self, radix: ChartData, start: pendulum.datetime, end: pendulum.datetime,
+                             step: pendulum.Duration, rate: float = settings.Q2, geo_longitude: float = None,
+                             geo_latitude: float = None) -> dict:
+        """Calculate progressed positions for every step from start to end, as arrays with one row per step.
+        The rate is settings.Q2 for secondary or settings.TERTIARY_RATE for tertiary progressions; the location
+        defaults to the radix location."""
+
+        if geo_longitude is None:
+            geo_longitude = radix.sidereal_framework.geo_longitude
+        if geo_latitude is None:
+            geo_latitude = radix.sidereal_framework.geo_latitude
+
+        utc_datetimes = []
+        index = 0
+        real_dt = start.in_tz('UTC')
+        while real_dt <= end:
+            utc_datetimes.append(real_dt)
+            index += 1
+            real_dt = start.in_tz('UTC') + (step * index)
+
+        julian_days = vectormath.julian_days_from_timestamps([dt.timestamp() for dt in utc_datetimes])
+        progressed_julian_days = radix.julian_day + ((julian_days - radix.julian_day) * rate)
+
+        # The only per-step ephemeris work: planets at the progressed date, framework at the real date
+        planets = self._sample_planets(progressed_julian_days)
+        svp = np.array([self._calculate_svp(float(jd)) for jd in julian_days])
+        obliquity = np.array([self._calculate_obliquity(float(jd)) for jd in julian_days])
+
+        lst = vectormath.local_sidereal_time(julian_days, geo_longitude)
+        ramc = lst * 15
+        longitude, latitude = planets[:, :, 0], planets[:, :, 1]
+        house, mundane = vectormath.prime_vertical_longitude(longitude, latitude, ramc[:, None], obliquity[:, None],
+                                                             svp[:, None], geo_latitude)
+        right_ascension = vectormath.right_ascension(latitude, longitude, svp[:, None], obliquity[:, None])
+
+        return {
+            'planets': list(settings.INT_TO_STRING_PLANET_MAP),
+            'utc_datetime': utc_datetimes,
+            'julian_day': julian_days,
+            'progressed_julian_day': progressed_julian_days,
+            'lst': lst,
+            'ramc': ramc,
+            'svp': svp,
+            'obliquity': obliquity,
+            'ecliptic_longitude': longitude,
+            'ecliptic_latitude': latitude,
+            'ecliptic_speed': planets[:, :, 3],
+            'house': house,
+            'mundane': mundane,
+            'right_ascension': right_ascension,
+        }
+
+    def relocation_grid(self, radix: ChartData, geo_longitudes, geo_latitudes) -> dict:
+        """Calculate the radix planets' mundane positions at many locations at once, as arrays.
+
+        geo_longitudes and geo_latitudes broadcast against each other: pass a row of longitudes and a column of
+        latitudes for a grid, or two lists of equal length for individual places. The planets' ecliptic positions,
+        SVP and obliquity depend only on the radix moment, so they are calculated once and shared by every point."""
+
+        geo_longitudes, geo_latitudes = np.broadcast_arrays(np.asarray(geo_longitudes, dtype=np.float64),
+                                                            np.asarray(geo_latitudes, dtype=np.float64))
+        framework = radix.sidereal_framework
+        planets = np.array([radix.planets_ecliptic[name][:2] for name in settings.INT_TO_STRING_PLANET_MAP])
+
+        lst = vectormath.local_sidereal_time(np.full(geo_longitudes.shape, radix.julian_day), geo_longitudes)
+        ramc = lst * 15
+        house, mundane = vectormath.prime_vertical_longitude(planets[:, 0], planets[:, 1], ramc[..., None],
+                                                             framework.obliquity, framework.svp,
+                                                             geo_latitudes[..., None])
+        return {
+            'planets': list(settings.INT_TO_STRING_PLANET_MAP),
+            'geo_longitude': geo_longitudes,
+            'geo_latitude': geo_latitudes,
+            'lst': lst,
+            'ramc': ramc,
+            'house': house,
+            'mundane': mundane,
+        }
+
+    def get_angle_lines(self, radix: ChartData, geo_latitudes=None) -> dict:
+        """Find where on Earth each radix planet is on an angle: the longitudes of its MC and IC lines, and of its
+        Asc and Dsc lines at each of geo_latitudes (by default every degree from -89 to 89)."""
+
+        if geo_latitudes is None:
+            geo_latitudes = np.arange(-89, 90, dtype=np.float64)
+        framework = radix.sidereal_framework
+        greenwich_ramc = vectormath.local_sidereal_time(radix.julian_day, 0) * 15
+
+        lines = {'geo_latitude': np.asarray(geo_latitudes, dtype=np.float64)}
+        for name in settings.INT_TO_STRING_PLANET_MAP:
+            longitude, latitude = radix.planets_ecliptic[name][:2]
+            right_ascension = vectormath.right_ascension(latitude, longitude, framework.svp, framework.obliquity)
+            declination = vectormath.declination(latitude, longitude, framework.svp, framework.obliquity)
+            lines[name] = vectormath.angle_line_longitudes(right_ascension, declination, greenwich_ramc,
+                                                           geo_latitudes)
+        return lines
+
+    def chart_columns(self, julian_days, geo_longitudes, geo_latitudes) -> dict:
+        """Calculate many charts at once, as arrays with one row per chart: the same values create_chartdata() would
+        give each one, plus daily speeds. julian_days are in UT; the locations broadcast against them."""
+
+        julian_days = np.asarray(julian_days, dtype=np.float64)
+        geo_longitudes, geo_latitudes = (np.broadcast_to(np.asarray(values, dtype=np.float64), julian_days.shape)
+                                         for values in (geo_longitudes, geo_latitudes))
+
+        planets = self._sample_planets(julian_days)
+        svp = np.array([self._calculate_svp(float(jd)) for jd in julian_days])
+        obliquity = np.array([self._calculate_obliquity(float(jd)) for jd in julian_days])
+
+        cusps = np.empty((len(julian_days), 12))
+        angles = np.empty((len(julian_days), 3))
+        cusp_array = (c_double * 13)()
+        house_array = (c_double * 10)()
+        for i, julian_day in enumerate(julian_days):
+            self.lib.calculate_houses(float(julian_day), settings.SIDEREALMODE, float(geo_latitudes[i]),
+                                      float(geo_longitudes[i]), settings.CAMPANUS, cusp_array, house_array)
+            cusps[i] = cusp_array[1:13]
+            angles[i] = house_array[0], house_array[1], house_array[4]
+
+        lst = vectormath.local_sidereal_time(julian_days, geo_longitudes)
+        ramc = lst * 15
+        longitude, latitude = planets[:, :, 0], planets[:, :, 1]
+        house, mundane = vectormath.prime_vertical_longitude(longitude, latitude, ramc[:, None], obliquity[:, None],
+                                                             svp[:, None], geo_latitudes[:, None])
+        right_ascension = vectormath.right_ascension(latitude, longitude, svp[:, None], obliquity[:, None])
+
+        return {
+            'planets': list(settings.INT_TO_STRING_PLANET_MAP),
+            'julian_day': julian_days,
+            'geo_longitude': np.ascontiguousarray(geo_longitudes),
+            'geo_latitude': np.ascontiguousarray(geo_latitudes),
+            'lst': lst,
+            'ramc': ramc,
+            'svp': svp,
+            'obliquity': obliquity,
+            'ecliptic_longitude': np.ascontiguousarray(longitude),
+            'ecliptic_latitude': np.ascontiguousarray(latitude),
+            'ecliptic_speed': np.ascontiguousarray(planets[:, :, 3]),
+            'house': house,
+            'mundane': mundane,
+            'right_ascension': right_ascension,
+            'cusps': cusps,
+            'angles': angles,
+        }
+
     def generate_radix_return_pairs(self, radix: ChartData, geo_longitude: float,
                                     geo_latitude: float, date: pendulum.datetime,
                                     body: int, harmonic: int,
-                                    return_quantity: int, place_name: str = None) -> List[Tuple[ChartData, ChartData]]:
+                                    return_quantity: int, place_name: str = None,
+                                    precision: str = 'seconds') -> List[Tuple[ChartData, ChartData]]:
 
         return_list = self._generate_return_list(radix, geo_longitude, geo_latitude, date, body, harmonic,
-                                                 return_quantity)
+                                                 return_quantity, precision)
         pairs = []
         for solunar_return in return_list:
             radix_copy = copy.deepcopy(radix)
@@ -137,6 +309,234 @@ class ChartManager:
             pairs.append((radix_copy, solunar_return))
         return pairs
 
+    def get_batch_return_times(self, body: int, radix_positions: List[float], start_dt: pendulum.datetime,
+                               end_dt: pendulum.datetime, harmonic: int) -> List[List[pendulum.datetime]]:
+        """Find every harmonic return of a body to each of many radix longitudes between two dates, to the second.
+
+        The body is sampled once on a grid shared by all of the radix longitudes; a vectorized _is_past test over
+        that grid brackets each return, and only the brackets are refined. Returns one list of return times per
+        radix longitude, in the timezone of start_dt."""
+
+        if body >= len(settings.BATCH_RETURN_SAMPLE_DAYS):
+            raise ValueError('Batched return times are only supported for the Sun and Moon')
+
+        start_timestamp, end_timestamp = start_dt.int_timestamp, end_dt.int_timestamp
+        timestamps, longitudes, unwrapped = self._sample_return_body(body, harmonic, start_timestamp, end_timestamp,
+                                                                     _BATCH_SOLVER_LABELS)
+
+        radix_positions = np.asarray(radix_positions, dtype=np.float64)
+        return_times = [[] for _ in radix_positions]
+        chunk_size = max(1, settings.BATCH_RETURN_MAX_CELLS // len(timestamps))
+
+        for chunk_start in range(0, len(radix_positions), chunk_size):
+            natal = radix_positions[chunk_start:chunk_start + chunk_size]
+            past = vectormath.is_past(longitudes[:, None], natal[None, :], harmonic)
+            sample_indexes, radix_indexes = np.nonzero(~past[:-1] & past[1:])
+
+            # Interpolate within each bracket on the continuous longitude, then settle on the exact second
+            coordinate_range = 360 / harmonic
+            remaining = np.mod(coordinate_range - vectormath.harmonic_distance(
+                longitudes[sample_indexes], natal[radix_indexes], harmonic), coordinate_range)
+            estimates = vectormath.inverse_cubic_interpolation(unwrapped, timestamps, sample_indexes,
+                                                               unwrapped[sample_indexes] + remaining)
+
+            for radix_index, estimate in zip(radix_indexes, estimates):
+                timestamp = self._refine_harmonic_crossing_timestamp(harmonic, body, float(natal[radix_index]),
+                                                                     int(round(estimate)),
+                                                                     settings.BATCH_RETURN_REFINE_SECONDS,
+                                                                     _BATCH_SOLVER_LABELS)
+                if start_timestamp <= timestamp <= end_timestamp:
+                    return_times[chunk_start + radix_index].append(pendulum.from_timestamp(timestamp, tz=start_dt.tz))
+
+        metrics.increment('returns', _BATCH_SOLVER_LABELS, sum(len(times) for times in return_times))
+        return return_times
+
+    def get_multi_harmonic_return_times(self, body: int, radix_position: float, dt: pendulum.datetime,
+                                        harmonics: List[int],
+                                        return_quantity: int) -> Dict[int, List[pendulum.datetime]]:
+        """Calculate return_quantity returns for each of several harmonics at once, keyed by harmonic; each list
+        starts with the return nearest to dt, like _get_return_time_list.
+
+        Every harmonic's returns are also returns of the least common multiple of the harmonics, so the body is
+        sampled once for that harmonic's crossings, each requested harmonic takes its subset, and a crossing shared
+        by several harmonics is refined to the second only once. Bodies that turn retrograde can cross a position
+        several times in a row, so each of their harmonics is searched separately by the station solver."""
+
+        harmonics = sorted(set(harmonics))
+        for harmonic in harmonics:
+            if type(harmonic) != int or harmonic < 1:
+                raise ValueError('Cannot calculate harmonic returns with a non-integer harmonic')
+
+        if body >= len(settings.ORBITAL_PERIODS_HOURS):
+            return_times = {harmonic: self._get_station_return_time_list(body, radix_position, dt, harmonic,
+                                                                         return_quantity)
+                            for harmonic in harmonics}
+            metrics.increment('returns', _STATION_SOLVER_LABELS, sum(len(times) for times in return_times.values()))
+            return return_times
+
+        finest = reduce(lambda a, b: a * b // gcd(a, b), harmonics)
+        coordinate_range = 360 / finest
+
+        # Long enough for the coarsest harmonic's nearest return on either side, then return_quantity after it
+        period_seconds = settings.ORBITAL_PERIODS_HOURS[body] * 3600 / harmonics[0]
+        start_timestamp = dt.int_timestamp - int(period_seconds)
+        end_timestamp = dt.int_timestamp + int(period_seconds * (return_quantity + 1))
+        first_longitude, last_longitude, estimate, window_seconds = self._get_crossing_estimator(
+            body, start_timestamp, end_timestamp, _MULTI_HARMONIC_SOLVER_LABELS)
+
+        # Every crossing of the finest harmonic, numbered so that crossing n is a harmonic-h return when
+        # n is a multiple of finest / h
+        first = ceil((first_longitude - radix_position) / coordinate_range)
+        last = floor((last_longitude - radix_position) / coordinate_range)
+        crossing_numbers = np.arange(first, last + 1)
+        estimates = estimate(radix_position + (crossing_numbers * coordinate_range))
+
+        refined = {}
+        return_times = {}
+        for harmonic in harmonics:
+            selected = np.nonzero(crossing_numbers % (finest // harmonic) == 0)[0]
+            nearest = int(np.argmin(np.abs(estimates[selected] - dt.int_timestamp)))
+            selected = selected[nearest:nearest + return_quantity]
+            if len(selected) < return_quantity:
+                raise RuntimeError(f'Failed to find {return_quantity} harmonic {harmonic} returns after {dt}')
+
+            return_times[harmonic] = []
+            for crossing in selected:
+                if crossing not in refined:
+                    refined[crossing] = self._refine_harmonic_crossing_timestamp(
+                        finest, body, radix_position, int(round(estimates[crossing])), window_seconds,
+                        _MULTI_HARMONIC_SOLVER_LABELS)
+                return_times[harmonic].append(pendulum.from_timestamp(refined[crossing], tz=dt.tz))
+
+        metrics.increment('returns', _MULTI_HARMONIC_SOLVER_LABELS, len(refined))
+        return return_times
+
+    def get_phase_events(self, start_dt: pendulum.datetime, end_dt: pendulum.datetime,
+                         harmonic: int = 4) -> List[Tuple[pendulum.datetime, float]]:
+        """Find every time between two dates at which the Moon's elongation from the Sun (Moon - Sun) reaches a
+        multiple of 360 / harmonic: new and full moons for harmonic 2, and the quarters as well for 4. Returns each
+        time, as the first second past the exact event and in the timezone of start_dt, with the elongation reached.
+
+        The Moon always outpaces the Sun, so the elongation only grows: the Sun and Moon are sampled once across
+        the range, every event is bracketed by two samples and estimated by interpolation, and a few Newton steps
+        on all of the estimates at once settle nearly every event to the second. A vectorized _is_past test
+        confirms each one, and any that fails it is refined by bisection."""
+
+        if type(harmonic) != int or harmonic < 1:
+            raise ValueError('Cannot calculate phase events with a non-integer harmonic')
+        coordinate_range = 360 / harmonic
+        start_timestamp, end_timestamp = start_dt.int_timestamp, end_dt.int_timestamp
+
+        timestamps = np.append(np.arange(start_timestamp, end_timestamp, settings.PHASE_EVENT_SAMPLE_DAYS * 86400),
+                               end_timestamp)
+        if len(timestamps) < 4:
+            timestamps = np.linspace(start_timestamp, end_timestamp, 4)
+        unwrapped = vectormath.unwrap_longitudes(self._sample_elongations(timestamps)[0])
+
+        # Every multiple of the harmonic range passed, as unwrapped elongations, each bracketed by two samples
+        crossing_numbers = np.arange(ceil(unwrapped[0] / coordinate_range), floor(unwrapped[-1] / coordinate_range) + 1)
+        targets = crossing_numbers * coordinate_range
+        sample_indexes = np.clip(np.searchsorted(unwrapped, targets) - 1, 0, len(unwrapped) - 2)
+        estimates = vectormath.inverse_cubic_interpolation(unwrapped, timestamps, sample_indexes, targets)
+
+        for _ in range(settings.PHASE_EVENT_NEWTON_STEPS):
+            elongations, speeds = self._sample_elongations(estimates)
+            distances = np.mod(elongations - targets + 180, 360) - 180
+            estimates = estimates - (distances / speeds * 86400)
+
+        # The first second past each event: past the target then, and not a second before
+        event_timestamps = np.ceil(estimates).astype(np.int64)
+        confirmations = self._sample_elongations(np.concatenate((event_timestamps - 1, event_timestamps)))[0]
+        past = vectormath.is_past(confirmations.reshape(2, -1), 0, harmonic)
+        for i in np.nonzero(past[0] | ~past[1])[0]:
+            event_timestamps[i] = self._refine_crossing_timestamp(
+                lambda timestamp: self._is_past(self._get_elongation(timestamp), 0, harmonic),
+                int(event_timestamps[i]), settings.PHASE_EVENT_REFINE_SECONDS)
+
+        events = []
+        for timestamp, target in zip(event_timestamps.tolist(), targets.tolist()):
+            if start_timestamp <= timestamp <= end_timestamp:
+                events.append((pendulum.from_timestamp(timestamp, tz=start_dt.tz), target % 360))
+        return events
+
+    def get_angularity_timeline(self, start_dt: pendulum.datetime, end_dt: pendulum.datetime, geo_longitude: float,
+                                geo_latitude: float,
+                                bodies: List[int] = None) -> List[Tuple[pendulum.datetime, str, str]]:
+        """Find every time between two dates at which a planet reaches an angle at a location, in the prime vertical
+        longitude sense of planets_mundane: rising on the Asc at 0, anticulminating on the IC at 90, setting on the
+        Dsc at 180 and culminating on the MC at 270. Returns (time, planet, angle) in time order, with times to the
+        nearest second in the timezone of start_dt.
+
+        Ecliptic positions barely move in a few hours, so planets, SVP and obliquity are calculated every
+        settings.ANGULARITY_EPHEMERIS_HOURS and interpolated, and only RAMC is calculated at every sample; one
+        vectorized pass over the samples brackets each crossing, and a few secant steps against exact positions
+        refine them all at once. A circumpolar planet never reaches the Asc or Dsc, and reaches the MC at both of
+        its culminations."""
+
+        bodies = list(range(len(settings.INT_TO_STRING_PLANET_MAP))) if bodies is None else list(bodies)
+        start_jd, end_jd = vectormath.julian_days_from_timestamps([start_dt.int_timestamp, end_dt.int_timestamp])
+
+        events = []
+        chunk_start = float(start_jd)
+        while chunk_start < end_jd:
+            chunk_end = min(chunk_start + settings.ANGULARITY_CHUNK_DAYS, float(end_jd))
+            events += self._find_angularity_events(bodies, chunk_start, chunk_end, geo_longitude, geo_latitude)
+            chunk_start = chunk_end
+
+        return [(pendulum.from_timestamp(timestamp, tz=start_dt.tz), settings.INT_TO_STRING_PLANET_MAP[body],
+                 settings.PRIME_VERTICAL_ANGLES[angle]) for timestamp, body, angle in sorted(events)]
+
+    def get_ingresses(self, start_dt: pendulum.datetime, end_dt: pendulum.datetime,
+                      bodies: List[int] = None) -> List[Tuple[pendulum.datetime, str, str, bool]]:
+        """Find every sign ingress between two dates, including a planet's re-entry into the previous sign while
+        retrograde. Returns (time, planet, sign entered, whether retrograde) in time order, each time the first
+        second in the new sign, in the timezone of start_dt. Read from the ingress indexes where they cover the
+        dates; otherwise found with the station solver."""
+
+        bodies = range(len(settings.INT_TO_STRING_PLANET_MAP)) if bodies is None else bodies
+        start_jd, end_jd = vectormath.julian_days_from_timestamps([start_dt.int_timestamp, end_dt.int_timestamp])
+
+        ingresses = []
+        for body in bodies:
+            for julian_day, sign_number, direction in self._get_boundary_crossings(body, 12, start_jd, end_jd):
+                # Moving backwards across a sign boundary enters the sign before it
+                entered = sign_number if direction != RETROGRADE else (sign_number - 1) % 12
+                ingresses.append((julian_day, body, self.get_sign(entered * 30), direction == RETROGRADE))
+
+        return [(self._get_first_second_past(julian_day, start_dt.tz), settings.INT_TO_STRING_PLANET_MAP[body],
+                 sign, retrograde) for julian_day, body, sign, retrograde in sorted(ingresses)]
+
+    def get_degree_crossings(self, body: int, longitude: float, start_dt: pendulum.datetime,
+                             end_dt: pendulum.datetime) -> List[Tuple[pendulum.datetime, bool]]:
+        """Find every time between two dates at which a body reaches a longitude, whichever way it is moving.
+        Returns (time, whether retrograde) in time order, each time the first second past the longitude, in the
+        timezone of start_dt.
+
+        Where the body's ingress index covers the dates, the index gives every stretch the body spends within the
+        resolution cell holding the longitude; only stretches that pass it, once split at stations, are refined.
+        Otherwise the crossings are found with the station solver."""
+
+        longitude = longitude % 360
+        start_jd, end_jd = vectormath.julian_days_from_timestamps([start_dt.int_timestamp, end_dt.int_timestamp])
+        index = self.ingress_indexes.get(body)
+        if index is not None and index.covers(start_jd, end_jd):
+            crossings = self._get_indexed_degree_crossings(index, longitude, start_jd, end_jd)
+        else:
+            crossings = [(julian_day, direction) for julian_day, _, direction
+                         in self._iterate_station_crossings(body, longitude, 1, start_jd, end_jd)]
+
+        return [(self._get_first_second_past(julian_day, start_dt.tz), direction == RETROGRADE)
+                for julian_day, direction in crossings]
+
+    @staticmethod
+    def get_lunar_phase(elongation: float) -> str:
+        """Determine the lunar phase from the Moon's elongation from the Sun (Moon - Sun, unsigned)."""
+
+        phases = ["New", "Crescent", "First Quarter", "Gibbous",
+                  "Full", "Disseminating", "Last Quarter", "Balsamic"]
+        key = int(elongation / 45)
+        return phases[key]
+
     @staticmethod
     def get_sign(longitude: float) -> str:
         """Determine astrological sign from unsigned longitude."""
@@ -165,22 +565,63 @@ class ChartManager:
     # ============================   Functions to populate coordinate data sets   =================================== #
     # =============================================================================================================== #
 
-    def _populate_ecliptic_values(self, julian_day: float) -> dict:
-        """Calculate ecliptical longitude for planets."""
+    def _populate_ecliptic_values(self, julian_day: float, flags: c_int32 = settings.SIDEREALMODE) -> dict:
+        """Calculate ecliptical longitude for planets. Speeds are only filled in when the flags ask for them."""
 
         errorstring = create_string_buffer(126)
         returnarray = [(c_double * 6)() for _ in range(10)]
 
         ecliptic_dict = dict()
         for body_number, body_name in enumerate(settings.INT_TO_STRING_PLANET_MAP):
-            self.lib.calculate_planets_UT(julian_day, body_number, settings.SIDEREALMODE,
-                                          returnarray[body_number], errorstring)
+            self.lib.calculate_planets_UT(julian_day, body_number, flags, returnarray[body_number], errorstring)
             ecliptic_dict[body_name] = returnarray[body_number]
             if errorstring.value:
                 logger.warning("Error calculating ecliptic values: " + str(errorstring.value))
 
         return ecliptic_dict
 
+    def _sample_planets(self, julian_days: np.ndarray, bodies: List[int] = None,
+                        flags: c_int32 = settings.SIDEREALMODE_WITH_SPEED) -> np.ndarray:
+        """Calculate full Swiss Ephemeris output for bodies at many Julian Days; shape (days, bodies, 6)."""
+
+        bodies = range(len(settings.INT_TO_STRING_PLANET_MAP)) if bodies is None else bodies
+        samples = np.empty((len(julian_days), len(bodies), 6))
+        errorstring = create_string_buffer(126)
+        returnarray = (c_double * 6)()
+
+        for i, julian_day in enumerate(julian_days):
+            for j, body_number in enumerate(bodies):
+                self.lib.calculate_planets_UT(float(julian_day), body_number, flags, returnarray, errorstring)
+                samples[i, j] = returnarray
+            if errorstring.value:
+                logger.warning("Error calculating ecliptic values: " + str(errorstring.value))
+
+        return samples
+
+    def _sample_elongations(self, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Calculate the Moon's elongation from the Sun, and its speed in degrees per day, at many timestamps."""
+
+        metrics.increment('ephemeris_probes', _PHASE_SOLVER_LABELS, 2 * len(timestamps))
+        samples = self._sample_planets(vectormath.julian_days_from_timestamps(timestamps), [0, 1])
+        return np.mod(samples[:, 1, 0] - samples[:, 0, 0], 360), samples[:, 1, 3] - samples[:, 0, 3]
+
+    def _sample_planet_pairs(self, julian_days: np.ndarray, bodies: np.ndarray,
+                             flags: c_int32 = settings.SIDEREALMODE) -> np.ndarray:
+        """Calculate full Swiss Ephemeris output for one body at each Julian Day, pairing julian_days[i] with
+        bodies[i]; shape (days, 6)."""
+
+        samples = np.empty((len(julian_days), 6))
+        errorstring = create_string_buffer(126)
+        returnarray = (c_double * 6)()
+
+        for i, (julian_day, body_number) in enumerate(zip(julian_days, bodies)):
+            self.lib.calculate_planets_UT(float(julian_day), int(body_number), flags, returnarray, errorstring)
+            samples[i] = returnarray
+            if errorstring.value:
+                logger.warning("Error calculating ecliptic values: " + str(errorstring.value))
+
+        return samples
+
     def _populate_mundane_values(self, chart: ChartData) -> dict:
         """Calculate prime vertical longitude for planets."""
 
@@ -214,7 +655,7 @@ class ChartManager:
     def _populate_ecliptical_angles_and_cusps(self, chart: ChartData) -> Tuple[dict, dict]:
         """Calculate house cusps and ecliptical longitudes of angles in the Campanus system."""
 
-        julian_day_utc = chart.julian_day
+        julian_day_utc = chart.houses_julian_day
         geo_longitude = chart.sidereal_framework.geo_longitude
         geo_latitude = chart.sidereal_framework.geo_latitude
 
@@ -314,6 +755,7 @@ class ChartManager:
 
         # Ensure there is a valid value in range
         while True:
+            metrics.increment('ephemeris_probes', _SEARCH_SOLVER_LABELS)
             end_pos = self._get_planet_longitude(body, end_dt)
             if not self._is_past(end_pos, natal_longitude, harmonic):
                 # Need to move forward in time
@@ -333,6 +775,7 @@ class ChartManager:
             test_dt = start_dt
             midpoint = ((ceiling - floor) // 2) + floor
             test_dt = test_dt.add(**{precision: midpoint})  # e.g. .add(hours=some_int)
+            metrics.increment('ephemeris_probes', _SEARCH_SOLVER_LABELS)
             test_pos = self._get_planet_longitude(body, test_dt)
             if self._is_past(test_pos, natal_longitude, harmonic):
                 ceiling = midpoint - 1
@@ -341,9 +784,9 @@ class ChartManager:
 
         return test_dt
 
-    def _get_return_time_list(self, body: int, radix_position: float, dt: pendulum.datetime, harmonic: int,
-                              return_quantity: float) -> List[pendulum.datetime]:
-        """Calculate a list of harmonic return times to second precision."""
+    def _search_return_time_list(self, body: int, radix_position: float, dt: pendulum.datetime, harmonic: int,
+                                 return_quantity: float, precision: str = 'seconds') -> List[pendulum.datetime]:
+        """Calculate a list of harmonic return times to a precision by searching forward from dt."""
 
         return_time_list_hour_precision = []
         initial_return_hour = self._get_nearest_return(body, radix_position, dt, harmonic)
@@ -356,7 +799,7 @@ class ChartManager:
 
         while len(return_time_list_hour_precision) < return_quantity:
             next_return = self._find_harmonic_in_date_range(harmonic, body, radix_position, period_begin, period_end,
-                                                            precision='seconds')
+                                                            precision=precision)
 
             if next_return:
                 return_time_list_hour_precision.append(next_return)
@@ -366,21 +809,318 @@ class ChartManager:
             period_begin = next_return.add(hours=delta - buffer)
             period_end = next_return.add(hours=delta + buffer)
 
+        if precision == 'hours':
+            return return_time_list_hour_precision
+
         return_time_list_second_precision = list()
 
         for hour in return_time_list_hour_precision:
             period_begin = hour.subtract(hours=6)
             period_end = hour.add(hours=6)
             match = self._find_harmonic_in_date_range(harmonic, body, radix_position, period_begin, period_end,
-                                                      precision='seconds')
+                                                      precision=precision)
             return_time_list_second_precision.append(match)
 
         return return_time_list_second_precision
 
+    def _sample_return_body(self, body: int, harmonic: int, start_timestamp: int, end_timestamp: int,
+                            labels: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sample a body's longitude between two timestamps, closely enough that no step passes more than one
+        harmonic position. Returns the sample timestamps, longitudes and unwrapped (continuous) longitudes."""
+
+        if type(harmonic) != int:
+            raise ValueError('Cannot calculate harmonic returns with a non-integer harmonic')
+        if body >= len(settings.BATCH_RETURN_SAMPLE_DAYS):
+            raise ValueError(f'Sampled returns are only supported for '
+                             f'{", ".join(settings.INT_TO_STRING_PLANET_MAP[:len(settings.BATCH_RETURN_SAMPLE_DAYS)])}')
+
+        # Keep each step well inside half a harmonic range
+        step = min(settings.BATCH_RETURN_SAMPLE_DAYS[body], settings.ORBITAL_PERIODS_HOURS[body] / 24 / (4 * harmonic))
+
+        store = self.sample_stores.get(body)
+        stored = store.get_samples(*vectormath.julian_days_from_timestamps([start_timestamp, end_timestamp]),
+                                   step) if store is not None else None
+        if stored is not None:
+            julian_days, unwrapped = stored
+            metrics.increment('sample_store_reads', labels, len(julian_days))
+            timestamps = (julian_days - vectormath.UNIX_EPOCH_JULIAN_DAY) * 86400
+            return timestamps, np.mod(unwrapped, 360), unwrapped
+
+        timestamps = np.append(np.arange(start_timestamp, end_timestamp, step * 86400), end_timestamp)
+        if len(timestamps) < 4:
+            timestamps = np.linspace(start_timestamp, end_timestamp, 4)
+        julian_days = vectormath.julian_days_from_timestamps(timestamps)
+
+        metrics.increment('ephemeris_probes', labels, len(julian_days))
+        longitudes = self._sample_planets(julian_days, [body], settings.SIDEREALMODE)[:, 0, 0]
+        return timestamps, longitudes, vectormath.unwrap_longitudes(longitudes)
+
+    def _get_crossing_estimator(self, body: int, start_timestamp: int, end_timestamp: int,
+                                labels: tuple) -> Tuple[float, float, Callable, int]:
+        """Estimate when a body reaches unwrapped longitudes between two timestamps, from its crossing index if that
+        covers them, or else from samples. Returns the unwrapped longitudes at the start and end, a function from
+        unwrapped longitudes to estimated timestamps, and the refinement window those estimates need."""
+
+        start_jd, end_jd = vectormath.julian_days_from_timestamps([start_timestamp, end_timestamp])
+        index = self.crossing_indexes.get(body)
+        if index is not None and index.covers(start_jd) and index.covers(end_jd):
+            def estimate(longitudes: np.ndarray) -> np.ndarray:
+                julian_days = np.array([index.get_julian_day(longitude) for longitude in longitudes])
+                return (julian_days - vectormath.UNIX_EPOCH_JULIAN_DAY) * 86400
+            return (index.get_longitude(start_jd), index.get_longitude(end_jd), estimate,
+                    settings.CROSSING_INDEX_REFINE_SECONDS)
+
+        # Direct motion makes unwrapped longitude monotonic, so any sample spacing brackets every crossing
+        timestamps, _, unwrapped = self._sample_return_body(body, 1, start_timestamp, end_timestamp, labels)
+
+        def estimate(longitudes: np.ndarray) -> np.ndarray:
+            sample_indexes = np.clip(np.searchsorted(unwrapped, longitudes) - 1, 0, len(unwrapped) - 2)
+            return vectormath.inverse_cubic_interpolation(unwrapped, timestamps, sample_indexes, longitudes)
+        return unwrapped[0], unwrapped[-1], estimate, settings.BATCH_RETURN_REFINE_SECONDS
+
+    def _get_return_time_list(self, body: int, radix_position: float, dt: pendulum.datetime, harmonic: int,
+                              return_quantity: float, precision: str = 'seconds') -> List[pendulum.datetime]:
+        """Calculate a list of harmonic return times to a precision from settings.RETURN_PRECISIONS. Concurrent calls
+        with the same arguments share one calculation."""
+
+        if precision not in settings.RETURN_PRECISIONS:
+            raise ValueError(f'Return precision must be one of {", ".join(settings.RETURN_PRECISIONS)}')
+
+        key = (body, harmonic, radix_position, dt.isoformat(), dt.tz.name, return_quantity, precision)
+        return self.return_time_flights.do(key, self._calculate_return_time_list, body, radix_position, dt, harmonic,
+                                           return_quantity, precision, copy_result=list)
+
+    def _calculate_return_time_list(self, body: int, radix_position: float, dt: pendulum.datetime, harmonic: int,
+                                    return_quantity: float, precision: str) -> List[pendulum.datetime]:
+        if body >= len(settings.ORBITAL_PERIODS_HOURS):
+            # Bodies that turn retrograde; exact to the second whatever the precision, at no extra cost
+            return_time_list = self._get_station_return_time_list(body, radix_position, dt, harmonic,
+                                                                  return_quantity)
+            metrics.increment('returns', _STATION_SOLVER_LABELS, len(return_time_list))
+            return return_time_list
+
+        index = self.crossing_indexes.get(body)
+        if index is not None:
+            resolution_seconds = settings.RETURN_PRECISIONS[precision]
+            return_time_list = self._get_indexed_return_time_list(index, body, radix_position, dt, harmonic,
+                                                                  return_quantity, resolution_seconds)
+            if return_time_list is not None:
+                metrics.increment('returns', _INDEXED_SOLVER_LABELS, len(return_time_list))
+                return return_time_list
+
+        return_time_list = self._search_return_time_list(body, radix_position, dt, harmonic, return_quantity,
+                                                         precision)
+        metrics.increment('returns', _SEARCH_SOLVER_LABELS, len(return_time_list))
+        return return_time_list
+
+    def _get_indexed_return_time_list(self, index: CrossingIndex, body: int, radix_position: float,
+                                      dt: pendulum.datetime, harmonic: int, return_quantity: float,
+                                      resolution_seconds: int = 1) -> Union[List[pendulum.datetime], None]:
+        """Calculate a list of harmonic return times by bracketing each one with a crossing index, to within
+        resolution_seconds after each exact return. Returns None if the returns fall outside of the span of the
+        index."""
+
+        julian_day = self._calculate_julian_day(dt.in_tz('UTC'))
+        if not index.covers(julian_day):
+            return None
+
+        # Unwrapped longitudes of the harmonic positions on either side of dt, and every one after
+        coordinate_range = 360 / harmonic
+        offset = radix_position % coordinate_range
+        current_longitude = index.get_longitude(julian_day)
+        previous_target = offset + (floor((current_longitude - offset) / coordinate_range) * coordinate_range)
+        targets = [previous_target + (n * coordinate_range) for n in range(int(return_quantity) + 1)]
+        if not (index.covers_longitude(targets[0]) and index.covers_longitude(targets[-1])):
+            return None
+
+        previous_jd, next_jd = index.get_julian_day(targets[0]), index.get_julian_day(targets[1])
+        if fabs(julian_day - previous_jd) > fabs(next_jd - julian_day):
+            targets = targets[1:]
+
+        return_time_list = []
+        for target in targets[:int(return_quantity)]:
+            estimate = self._calculate_datetime_from_julian_day(index.get_julian_day(target))
+            return_time = self._refine_harmonic_crossing(harmonic, body, radix_position, estimate,
+                                                         resolution_seconds=resolution_seconds)
+            return_time_list.append(return_time.in_tz(dt.tz))
+
+        return return_time_list
+
+    def _refine_harmonic_crossing(self, harmonic: int, body: int, natal_longitude: float,
+                                  estimate: pendulum.datetime,
+                                  window_seconds: int = settings.CROSSING_INDEX_REFINE_SECONDS,
+                                  labels: tuple = _INDEXED_SOLVER_LABELS,
+                                  resolution_seconds: int = 1) -> pendulum.datetime:
+        """Find the first second at which a body is past a harmonic of a natal longitude, near an estimated time. With
+        a coarser resolution, the search stops at a time that is past, but less than resolution_seconds after it."""
+
+        estimate_timestamp = estimate.int_timestamp
+        timestamp = self._refine_harmonic_crossing_timestamp(harmonic, body, natal_longitude, estimate_timestamp,
+                                                             window_seconds, labels, resolution_seconds)
+        return estimate.add(seconds=timestamp - estimate_timestamp)
+
+    def _refine_harmonic_crossing_timestamp(self, harmonic: int, body: int, natal_longitude: float,
+                                            estimate: int, window_seconds: int, labels: tuple,
+                                            resolution_seconds: int = 1) -> int:
+        """_refine_harmonic_crossing on POSIX timestamps, for callers that don't otherwise need datetimes."""
+
+        def is_past(timestamp: int) -> bool:
+            metrics.increment('ephemeris_probes', labels)
+            julian_day = (timestamp / 86400) + vectormath.UNIX_EPOCH_JULIAN_DAY
+            position = self._get_planet_longitude(body, julian_day)
+            return self._is_past(position, natal_longitude, harmonic)
+
+        return self._refine_crossing_timestamp(is_past, estimate, window_seconds, resolution_seconds)
+
+    @staticmethod
+    def _refine_crossing_timestamp(is_past: Callable[[int], bool], estimate: int, window_seconds: int,
+                                   resolution_seconds: int = 1) -> int:
+        """Find the first timestamp at which is_past(timestamp) holds, near an estimated one, by widening a window
+        around the estimate until it brackets the crossing and then bisecting it."""
+
+        # Widen the window until it brackets the crossing
+        floor_seconds, ceiling_seconds = -window_seconds, window_seconds
+        while is_past(estimate + floor_seconds):
+            floor_seconds, ceiling_seconds = floor_seconds - (2 * window_seconds), floor_seconds
+            window_seconds *= 2
+        while not is_past(estimate + ceiling_seconds):
+            floor_seconds, ceiling_seconds = ceiling_seconds, ceiling_seconds + (2 * window_seconds)
+            window_seconds *= 2
+
+        while ceiling_seconds - floor_seconds > resolution_seconds:
+            midpoint = (floor_seconds + ceiling_seconds) // 2
+            if is_past(estimate + midpoint):
+                ceiling_seconds = midpoint
+            else:
+                floor_seconds = midpoint
+
+        return estimate + ceiling_seconds
+
+    def _get_station_return_time_list(self, body: int, radix_position: float, dt: pendulum.datetime,
+                                      harmonic: int, return_quantity: float) -> List[pendulum.datetime]:
+        """Calculate a list of harmonic return times for a body that turns retrograde, starting with the return
+        nearest to dt. Every crossing of a harmonic position counts, whichever way the body is moving, and each
+        return time is the first second past it."""
+
+        if type(harmonic) != int or harmonic < 1:
+            raise ValueError('Cannot calculate harmonic returns with a non-integer harmonic')
+        julian_day = self._calculate_julian_day(dt.in_tz('UTC'))
+
+        crossings = []
+        scan_start = julian_day
+        while len(crossings) < return_quantity:
+            if scan_start - julian_day > settings.STATION_RETURN_MAX_SCAN_DAYS:
+                raise RuntimeError(f'Failed to find {return_quantity} harmonic {harmonic} returns after {dt}')
+            scan_end = scan_start + settings.STATION_RETURN_SCAN_DAYS
+            crossings.extend(self._find_station_crossings(body, radix_position, harmonic, scan_start, scan_end))
+            scan_start = scan_end
+
+        # Only a return closer than the first one after dt could start the list instead
+        previous = self._find_station_crossings(body, radix_position, harmonic,
+                                                julian_day - (crossings[0] - julian_day), julian_day)
+        if previous:
+            crossings.insert(0, previous[-1])
+
+        timestamps = [ceil((crossing - vectormath.UNIX_EPOCH_JULIAN_DAY) * 86400)
+                      for crossing in crossings[:int(return_quantity)]]
+        return [pendulum.from_timestamp(timestamp, tz=dt.tz) for timestamp in timestamps]
+
+    def _find_station_crossings(self, body: int, radix_position: float, harmonic: int, start_jd: float,
+                                end_jd: float) -> List[float]:
+        """Julian days, in order, at which a body crosses any harmonic position of a radix longitude between two
+        Julian days."""
+
+        return [julian_day for julian_day, _, _ in self._iterate_station_crossings(body, radix_position, harmonic,
+                                                                                   start_jd, end_jd)]
+
+    def _iterate_station_crossings(self, body: int, radix_position: float, harmonic: int, start_jd: float,
+                                   end_jd: float) -> Iterator[Tuple[float, int, int]]:
+        """Yield, in order, the Julian day, harmonic position number (0 for the radix position itself, up to
+        harmonic - 1) and direction of each crossing of a harmonic position between two Julian days. The span is
+        split at the body's stations into stretches of one-way motion, which are sampled no more than
+        settings.STATION_RETURN_PIECE_DAYS[body] apart; each crossing is bracketed by two samples."""
+
+        index = self._get_station_index(body, start_jd, end_jd)
+        boundaries = [start_jd] + index.get_stations(start_jd, end_jd).tolist() + [end_jd]
+        coordinate_range = 360 / harmonic
+        offset = radix_position % coordinate_range
+
+        for segment_start, segment_end in zip(boundaries[:-1], boundaries[1:]):
+            direction = index.get_direction(segment_start)
+            pieces = max(1, ceil((segment_end - segment_start) / settings.STATION_RETURN_PIECE_DAYS[body]))
+            julian_days = np.linspace(segment_start, segment_end, pieces + 1)
+            metrics.increment('ephemeris_probes', _STATION_SOLVER_LABELS, len(julian_days))
+            longitudes = self._sample_planets(julian_days, [body], settings.SIDEREALMODE)[:, 0, 0]
+
+            for i in range(pieces):
+                # Distance travelled in the direction of motion; a tiny backwards step next to a station is noise
+                distance = (direction * (longitudes[i + 1] - longitudes[i])) % 360
+                if distance > 180:
+                    continue
+
+                # Harmonic positions in (start, end] of the stretch, in the order they are reached
+                start_longitude = longitudes[i]
+                end_longitude = start_longitude + (direction * distance)
+                if direction > 0:
+                    numbers = range(floor((start_longitude - offset) / coordinate_range) + 1,
+                                    floor((end_longitude - offset) / coordinate_range) + 1)
+                else:
+                    numbers = range(ceil((start_longitude - offset) / coordinate_range) - 1,
+                                    ceil((end_longitude - offset) / coordinate_range) - 1, -1)
+
+                for number in numbers:
+                    target = offset + (number * coordinate_range)
+                    estimate = julian_days[i] + ((julian_days[i + 1] - julian_days[i])
+                                                 * fabs(target - start_longitude) / distance)
+                    julian_day = self._refine_station_crossing(body, target % 360, direction, float(julian_days[i]),
+                                                               float(julian_days[i + 1]), float(estimate))
+                    yield julian_day, number % harmonic, direction
+
+    def _refine_station_crossing(self, body: int, target: float, direction: int, floor_jd: float, ceiling_jd: float,
+                                 estimate: float, labels: tuple = _STATION_SOLVER_LABELS) -> float:
+        """Newton's method on longitude and speed for the Julian day a body reaches a longitude, within a bracket in
+        which it moves one way. Steps that would leave the bracket, as near a station, bisect it instead."""
+
+        julian_day = estimate
+        for _ in range(60):
+            metrics.increment('ephemeris_probes', labels)
+            longitude, speed = self._get_planet_longitude_and_speed(body, julian_day)
+            difference = ((longitude - target + 180) % 360) - 180
+            if direction * difference < 0:
+                floor_jd = julian_day
+            else:
+                ceiling_jd = julian_day
+
+            # Only a Newton step may end the search, since a bisection step that small can still fall short
+            next_julian_day = julian_day - (difference / speed) if speed else None
+            tolerance = settings.STATION_RETURN_TOLERANCE_DAYS
+            if next_julian_day is not None and fabs(next_julian_day - julian_day) < tolerance:
+                return next_julian_day
+            if ceiling_jd - floor_jd < tolerance:
+                return ceiling_jd
+            if next_julian_day is None or not floor_jd < next_julian_day < ceiling_jd:
+                next_julian_day = (floor_jd + ceiling_jd) / 2
+            julian_day = next_julian_day
+        return julian_day
+
+    def _get_station_index(self, body: int, start_jd: float, end_jd: float) -> StationIndex:
+        if body < len(settings.ORBITAL_PERIODS_HOURS):
+            return StationIndex.direct(body)
+
+        index = self.station_indexes.get(body)
+        if index is not None and index.covers(start_jd, end_jd):
+            return index
+
+        # Enough for the span alone; a saved index avoids this sampling
+        logger.debug(f'Building {settings.INT_TO_STRING_PLANET_MAP[body]} stations for {start_jd} to {end_jd}')
+        metrics.increment('ephemeris_probes', _STATION_SOLVER_LABELS,
+                          int((end_jd - start_jd) / settings.STATION_INDEX_SAMPLE_DAYS) + 2)
+        return StationIndex.build(self, body, start_jd, end_jd)
+
     def _generate_return_list(self, radix: ChartData, geo_longitude: float, geo_latitude: float,
                               date: pendulum.datetime, body: int, harmonic: int,
-                              return_quantity: int) -> List[ChartData]:
-        """Generate a list of harmonic return datetimes."""
+                              return_quantity: int, precision: str = 'seconds') -> List[ChartData]:
+        """Generate a list of harmonic return datetimes, to a precision from settings.RETURN_PRECISIONS."""
 
         body_name = settings.INT_TO_STRING_PLANET_MAP[body]
         radix_position = radix.planets_ecliptic[body_name][0]
@@ -389,7 +1129,9 @@ class ChartManager:
         self.relocate(radix, geo_longitude, geo_latitude, date.tz)
         geo_longitude = radix.sidereal_framework.geo_longitude
         geo_latitude = radix.sidereal_framework.geo_latitude
-        return_time_list = self._get_return_time_list(body, radix_position, date, harmonic, return_quantity)
+        with metrics.phase('return_search'):
+            return_time_list = self._get_return_time_list(body, radix_position, date, harmonic, return_quantity,
+                                                          precision)
 
         return_chart_list = []
         for chart_time in return_time_list:
@@ -400,6 +1142,173 @@ class ChartManager:
             chart.local_datetime = chart.local_datetime.in_tz(date.tz)
         return return_chart_list
 
+    # =============================================================================================================== #
+    # ==============================   Functions for ingresses and degree crossings   =============================== #
+    # =============================================================================================================== #
+
+    def _get_boundary_crossings(self, body: int, boundary_count: int, start_jd: float,
+                                end_jd: float) -> List[Tuple[float, int, int]]:
+        """(Julian day, boundary number, direction) of each crossing of one of boundary_count evenly spaced
+        boundaries from 0 degrees, in order: from the ingress index where it covers the span and has those
+        boundaries, or else from the station solver."""
+
+        index = self.ingress_indexes.get(body)
+        step = (360 / boundary_count) / index.resolution if index is not None else 0
+        if index is not None and step == round(step) and index.covers(start_jd, end_jd):
+            entries = index.get_range(start_jd, end_jd)
+            julian_days = index.julian_days[entries]
+            boundaries = index.boundaries[entries]
+            selected = ((julian_days >= start_jd) & (julian_days <= end_jd) & (boundaries % int(step) == 0))
+            metrics.increment('index_reads', _INGRESS_SOLVER_LABELS, int(np.count_nonzero(selected)))
+            return list(zip(julian_days[selected].tolist(), (boundaries[selected] // int(step)).tolist(),
+                            index.directions[entries][selected].tolist()))
+
+        return [crossing for crossing in self._iterate_station_crossings(body, 0, boundary_count, start_jd, end_jd)
+                if start_jd <= crossing[0] <= end_jd]
+
+    def _get_indexed_degree_crossings(self, index: IngressIndex, longitude: float, start_jd: float,
+                                      end_jd: float) -> List[Tuple[float, int]]:
+        """(Julian day, direction) of each crossing of a longitude between two Julian days, in order, from the
+        stretches between ingress index entries that the body spends in the cell holding the longitude."""
+
+        body = index.body
+        boundary_count = int(round(360 / index.resolution))
+        cell = int(longitude // index.resolution) % boundary_count
+        # Longitudes within the cell, measured from its lower boundary
+        position = longitude - (cell * index.resolution)
+
+        entries = index.get_range(start_jd, end_jd)
+        julian_days = index.julian_days[entries]
+        boundaries = index.boundaries[entries]
+        directions = index.directions[entries]
+
+        if position == 0:
+            # The longitude is a boundary, so the index holds its crossings already
+            selected = (boundaries == cell) & (julian_days >= start_jd) & (julian_days <= end_jd)
+            return list(zip(julian_days[selected].tolist(), directions[selected].tolist()))
+
+        # Every stretch in the cell starts with a crossing into it, from below or above
+        entered_from_below = (boundaries[:-1] == cell) & (directions[:-1] != RETROGRADE)
+        entered_from_above = (boundaries[:-1] == (cell + 1) % boundary_count) & (directions[:-1] == RETROGRADE)
+
+        crossings = []
+        for i in np.nonzero(entered_from_below | entered_from_above)[0]:
+            # The stretch in the cell, split at stations into one-way pieces with known ends
+            visit_start, visit_end = float(julian_days[i]), float(julian_days[i + 1])
+            stations = self._get_station_index(body, visit_start, visit_end).get_stations(visit_start, visit_end)
+            piece_jds = [visit_start] + stations.tolist() + [visit_end]
+            piece_positions = [0.0 if entered_from_below[i] else index.resolution]
+            for station in piece_jds[1:-1]:
+                metrics.increment('ephemeris_probes', _INGRESS_SOLVER_LABELS)
+                offset = self._get_planet_longitude(body, station) - (cell * index.resolution)
+                piece_positions.append(((offset + 180) % 360) - 180)
+            piece_positions.append(0.0 if boundaries[i + 1] == cell else index.resolution)
+
+            for j in range(len(piece_jds) - 1):
+                low, high = sorted((piece_positions[j], piece_positions[j + 1]))
+                if not low < position < high:
+                    continue
+                direction = 1 if piece_positions[j + 1] > piece_positions[j] else -1
+                estimate = piece_jds[j] + ((piece_jds[j + 1] - piece_jds[j]) * (position - piece_positions[j])
+                                           / (piece_positions[j + 1] - piece_positions[j]))
+                crossings.append((self._refine_station_crossing(body, longitude, direction, piece_jds[j],
+                                                                piece_jds[j + 1], estimate,
+                                                                _INGRESS_SOLVER_LABELS), direction))
+
+        return [crossing for crossing in crossings if start_jd <= crossing[0] <= end_jd]
+
+    def _get_first_second_past(self, julian_day: float, tz) -> pendulum.datetime:
+        return pendulum.from_timestamp(ceil((julian_day - vectormath.UNIX_EPOCH_JULIAN_DAY) * 86400), tz=tz)
+
+    # =============================================================================================================== #
+    # =================================   Functions for angularity timelines   ====================================== #
+    # =============================================================================================================== #
+
+    def _find_angularity_events(self, bodies: List[int], start_jd: float, end_jd: float, geo_longitude: float,
+                                geo_latitude: float) -> List[Tuple[int, int, int]]:
+        """Find the angularity events between two Julian days, as unordered (timestamp, body, angle) tuples."""
+
+        ephemeris_days = np.append(np.arange(start_jd, end_jd, settings.ANGULARITY_EPHEMERIS_HOURS / 24), end_jd)
+        metrics.increment('ephemeris_probes', _ANGULARITY_SOLVER_LABELS, len(ephemeris_days) * (len(bodies) + 2))
+        planets = self._sample_planets(ephemeris_days, bodies, settings.SIDEREALMODE)
+        # Continuous through 360 degrees whichever way the planets move, so that interpolation is safe
+        planet_longitudes = np.degrees(np.unwrap(np.radians(planets[:, :, 0]), axis=0))
+        svp = np.array([self._calculate_svp(float(jd)) for jd in ephemeris_days])
+        obliquity = np.array([self._calculate_obliquity(float(jd)) for jd in ephemeris_days])
+
+        def get_distances(julian_days: np.ndarray, longitudes: np.ndarray, latitudes: np.ndarray,
+                          angles: np.ndarray) -> np.ndarray:
+            # Signed degrees from each angle to the planet's PVL, which decreases as the planet moves through the day
+            ramc = vectormath.local_sidereal_time(julian_days, geo_longitude) * 15
+            _, mundane = vectormath.prime_vertical_longitude(
+                longitudes, latitudes, ramc, np.interp(julian_days, ephemeris_days, obliquity),
+                np.interp(julian_days, ephemeris_days, svp), geo_latitude)
+            return np.mod(mundane - angles + 180, 360) - 180
+
+        # Every RAMC sample, with planets interpolated from the ephemeris samples
+        julian_days = np.append(np.arange(start_jd, end_jd, settings.ANGULARITY_SAMPLE_MINUTES / 1440), end_jd)
+        longitudes = np.stack([np.interp(julian_days, ephemeris_days, planet_longitudes[:, j])
+                               for j in range(len(bodies))], axis=1)
+        latitudes = np.stack([np.interp(julian_days, ephemeris_days, planets[:, j, 1])
+                              for j in range(len(bodies))], axis=1)
+
+        sample_indexes, body_indexes, angles, before_distances, after_distances = [], [], [], [], []
+        for angle in settings.PRIME_VERTICAL_ANGLES:
+            distances = get_distances(julian_days[:, None], longitudes, latitudes, angle)
+            before, after = distances[:-1], distances[1:]
+            # A sign change is a crossing unless it's the jump from +180 to -180 on the far side of the circle
+            crossed = ((before > 0) & (after <= 0)) | ((before < 0) & (after >= 0))
+            samples, columns = np.nonzero(crossed & (np.abs(after - before) < 180))
+            sample_indexes.append(samples)
+            body_indexes.append(columns)
+            angles.append(np.full(len(samples), angle))
+            before_distances.append(before[samples, columns])
+            after_distances.append(after[samples, columns])
+
+        sample_indexes, body_indexes, angles = (np.concatenate(values) for values in
+                                                (sample_indexes, body_indexes, angles))
+        if not len(sample_indexes):
+            return []
+        before, after = np.concatenate(before_distances), np.concatenate(after_distances)
+
+        # Safeguarded secant steps from the linear estimate, against exact positions of the bodies crossing: each
+        # step keeps the crossing bracketed, and falls back to bisection if the secant would leave the bracket
+        floor_jds, ceiling_jds = julian_days[sample_indexes], julian_days[sample_indexes + 1]
+        floor_signs = np.sign(before)
+        estimates = floor_jds + ((ceiling_jds - floor_jds) * before / (before - after))
+        previous_jds, previous_distances = floor_jds.copy(), before.copy()
+        distances = np.full(len(estimates), np.inf)
+        body_numbers = np.asarray(bodies)[body_indexes]
+        active = np.arange(len(estimates))
+        for _ in range(settings.ANGULARITY_REFINE_STEPS):
+            if not len(active):
+                break
+            metrics.increment('ephemeris_probes', _ANGULARITY_SOLVER_LABELS, len(active))
+            estimate_jds = estimates[active]
+            exact = self._sample_planet_pairs(estimate_jds, body_numbers[active])
+            estimate_distances = get_distances(estimate_jds, exact[:, 0], exact[:, 1], angles[active])
+            distances[active] = estimate_distances
+
+            on_floor_side = np.sign(estimate_distances) == floor_signs[active]
+            floor_jds[active] = np.where(on_floor_side, estimate_jds, floor_jds[active])
+            ceiling_jds[active] = np.where(on_floor_side, ceiling_jds[active], estimate_jds)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                next_jds = estimate_jds - (estimate_distances * (estimate_jds - previous_jds[active])
+                                           / (estimate_distances - previous_distances[active]))
+            inside = (next_jds > floor_jds[active]) & (next_jds < ceiling_jds[active])
+            next_jds = np.where(inside, next_jds, (floor_jds[active] + ceiling_jds[active]) / 2)
+
+            previous_jds[active], previous_distances[active] = estimate_jds, estimate_distances
+            estimates[active] = next_jds
+            moved_seconds = np.abs(next_jds - estimate_jds) * 86400
+            active = active[(moved_seconds >= settings.ANGULARITY_REFINE_SECONDS) & (estimate_distances != 0)]
+
+        # A bracket that closed in on a jump in PVL, rather than on the angle, is a discontinuity and not a crossing
+        settled = np.abs(distances) < settings.ANGULARITY_TOLERANCE_DEGREES
+        timestamps = np.round((estimates - vectormath.UNIX_EPOCH_JULIAN_DAY) * 86400).astype(np.int64)
+        return [(int(timestamp), int(body), int(angle)) for timestamp, body, angle, keep
+                in zip(timestamps, body_numbers, angles, settled) if keep]
+
     # =============================================================================================================== #
     # =======================================   Internal calculations   ============================================= #
     # =============================================================================================================== #
@@ -411,6 +1320,14 @@ class ChartManager:
         time_julian_day = self.lib.get_julian_day(dt_utc.year, dt_utc.month, dt_utc.day, decimal_hour_utc, 1)
         return time_julian_day
 
+    def _calculate_datetime_from_julian_day(self, julian_day: float) -> pendulum.datetime:
+        """Calculate the UTC datetime, to the nearest second, for a given Julian Day."""
+
+        year, month, day, decimal_hour = c_int(), c_int(), c_int(), c_double()
+        self.lib.reverse_julian_day(julian_day, 1, byref(year), byref(month), byref(day), byref(decimal_hour))
+        return pendulum.datetime(year.value, month.value, day.value, tz='UTC').add(
+            seconds=int(round(decimal_hour.value * 3600)))
+
     def _calculate_LST(self, dt: pendulum.datetime, decimal_longitude: float) -> float:
         """Calculate local sidereal time for date in UTC, time, location of event."""
 
@@ -474,6 +1391,27 @@ class ChartManager:
             logger.warning("Error calculating planet longitude: " + str(errorstring.value))
         return ret_array[0]
 
+    def _get_elongation(self, timestamp: int) -> float:
+        """Get the Moon's elongation from the Sun (Moon - Sun) at a POSIX timestamp."""
+
+        metrics.increment('ephemeris_probes', _PHASE_SOLVER_LABELS, 2)
+        julian_day = (timestamp / 86400) + vectormath.UNIX_EPOCH_JULIAN_DAY
+        return (self._get_planet_longitude(1, julian_day) - self._get_planet_longitude(0, julian_day)) % 360
+
+    def _get_planet_longitude_and_speed(self, body_number: int, julian_day: float) -> Tuple[float, float]:
+        """Get a body's longitude and its speed in longitude, in degrees per day, at a Julian Day."""
+
+        ret_array = (c_double * 6)()
+        errorstring = create_string_buffer(126)
+        self.lib.calculate_planets_UT(julian_day, body_number, settings.SIDEREALMODE_WITH_SPEED, ret_array,
+                                      errorstring)
+        if errorstring.value:
+            logger.warning("Error calculating planet longitude: " + str(errorstring.value))
+        return ret_array[0], ret_array[3]
+
+    def _get_planet_speed(self, body_number: int, julian_day: float) -> float:
+        return self._get_planet_longitude_and_speed(body_number, julian_day)[1]
+
     def _initialize_sidereal_framework(self, utc_datetime: pendulum.datetime,
                                        geo_longitude: float, geo_latitude: float) -> SiderealFramework:
         """Initialize an instance of the SiderealFramework class to use in calculations inside a ChartData instance."""
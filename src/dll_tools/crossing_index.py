@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import random
+import time
+from logging import getLogger
+from math import ceil, floor
+from typing import Dict
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
+
+logger = getLogger(__name__)
+
+"""
+Inverse ephemeris for bodies that never turn retrograde (the Sun and Moon).
+
+Stores the Julian days at which a body's sidereal longitude crosses each multiple of a resolution in degrees.
+Longitudes are unwrapped, so crossing number i is at (first_boundary + i) * resolution degrees; date -> longitude
+is a binary search and longitude -> date a direct lookup into a single memory-mapped array.
+"""
+
+
+class CrossingIndex:
+    def __init__(self, body: int, resolution: float, first_boundary: int, julian_days: np.ndarray,
+                 fingerprint: str = None):
+        self.body = body
+        self.resolution = resolution
+        self.first_boundary = first_boundary
+        self.julian_days = julian_days
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, manager, body: int, start_jd: float, end_jd: float,
+              resolution: float = settings.CROSSING_INDEX_RESOLUTION) -> 'CrossingIndex':
+        """Sample a body across a date range and interpolate the Julian day of each boundary crossing."""
+
+        sample_days = settings.CROSSING_INDEX_SAMPLE_DAYS[body]
+        sample_jds = np.arange(start_jd, end_jd + sample_days, sample_days)
+        longitudes = np.array([manager._get_planet_longitude(body, float(jd)) for jd in sample_jds])
+
+        # Both bodies only ever move forward, so each step is the forward distance travelled
+        steps = np.mod(np.diff(longitudes), 360)
+        unwrapped = np.concatenate(([longitudes[0]], longitudes[0] + np.cumsum(steps)))
+
+        first_boundary = int(ceil(unwrapped[0] / resolution))
+        last_boundary = int(floor(unwrapped[-1] / resolution))
+        boundaries = np.arange(first_boundary, last_boundary + 1) * resolution
+        julian_days = np.interp(boundaries, unwrapped, sample_jds)
+
+        return cls(body, resolution, first_boundary, julian_days, get_ephemeris_fingerprint())
+
+    @classmethod
+    def load(cls, path: str) -> 'CrossingIndex':
+        """Load an index saved by save(), memory-mapping its crossings."""
+
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        julian_days = np.load(path + '.npy', mmap_mode='r')
+        return cls(meta['body'], meta['resolution'], meta['first_boundary'], julian_days, meta['fingerprint'])
+
+    @classmethod
+    def load_all(cls, directory: str = None) -> Dict[int, 'CrossingIndex']:
+        """Load the finest valid index for each body found in a directory."""
+
+        directory = directory or get_index_directory()
+        indexes = dict()
+        if not os.path.isdir(directory):
+            return indexes
+
+        fingerprint = get_ephemeris_fingerprint()
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.json'):
+                continue
+            index = cls.load(os.path.join(directory, file_name[:-len('.json')]))
+            if index.fingerprint != fingerprint:
+                logger.warning(f'Ignoring crossing index {file_name}; it was built against other ephemeris files.')
+                continue
+            current = indexes.get(index.body)
+            if current is None or index.resolution < current.resolution:
+                indexes[index.body] = index
+
+        for index in indexes.values():
+            logger.info(f'Loaded {settings.INT_TO_STRING_PLANET_MAP[index.body]} crossing index '
+                        f'({len(index.julian_days)} crossings at {index.resolution:g} degrees).')
+        return indexes
+
+    def save(self, directory: str = None) -> str:
+        directory = directory or get_index_directory()
+        os.makedirs(directory, exist_ok=True)
+        body_name = settings.INT_TO_STRING_PLANET_MAP[self.body]
+        path = os.path.join(directory, f'{body_name}_{self.resolution:g}')
+
+        np.save(path + '.npy', np.asarray(self.julian_days, dtype=np.float64))
+        with open(path + '.json', 'w') as f:
+            json.dump({
+                'body': self.body,
+                'resolution': self.resolution,
+                'first_boundary': self.first_boundary,
+                'start_jd': float(self.julian_days[0]),
+                'end_jd': float(self.julian_days[-1]),
+                'fingerprint': self.fingerprint,
+            }, f, indent=2)
+        return path
+
+    def covers(self, julian_day: float) -> bool:
+        return self.julian_days[0] <= julian_day <= self.julian_days[-1]
+
+    def covers_longitude(self, longitude: float) -> bool:
+        return self.first_boundary <= longitude / self.resolution <= self.first_boundary + len(self.julian_days) - 1
+
+    def get_longitude(self, julian_day: float) -> float:
+        """Approximate unwrapped longitude at a Julian day."""
+
+        i = int(np.searchsorted(self.julian_days, julian_day))
+        i = min(max(i, 1), len(self.julian_days) - 1)
+        lo, hi = self.julian_days[i - 1], self.julian_days[i]
+        return (self.first_boundary + i - 1 + (julian_day - lo) / (hi - lo)) * self.resolution
+
+    def get_julian_day(self, longitude: float) -> float:
+        """Approximate Julian day at which the body reaches an unwrapped longitude."""
+
+        position = (longitude / self.resolution) - self.first_boundary
+        i = min(max(int(floor(position)), 0), len(self.julian_days) - 2)
+        lo, hi = self.julian_days[i], self.julian_days[i + 1]
+        return float(lo + (position - i) * (hi - lo))
+
+
+VALIDATION_TOLERANCE_SECONDS = 3  # The bisection solver can stop up to a couple of seconds before the crossing
+
+
+def get_index_directory() -> str:
+    return os.path.join(os.path.dirname(__file__), settings.CROSSING_INDEX_PATH)
+
+
+# =================================================================================================================== #
+# ===============================================   Command line   ================================================== #
+# =================================================================================================================== #
+
+def build(manager, bodies: list, start: pendulum.datetime, end: pendulum.datetime, resolution: float) -> None:
+    start_jd = manager._calculate_julian_day(start)
+    end_jd = manager._calculate_julian_day(end)
+    for body in bodies:
+        started = time.perf_counter()
+        index = CrossingIndex.build(manager, body, start_jd, end_jd, resolution)
+        path = index.save()
+        logger.info(f'Built {path} with {len(index.julian_days)} crossings '
+                    f'in {time.perf_counter() - started:.1f}s')
+
+
+def validate(manager, bodies: list, samples: int, seed: int = 0) -> int:
+    """
+    Check indexed return times against the ephemeris and against the bisection solver. Returns the number of indexed
+    times that are not the first second past their harmonic; disagreements with the bisection solver are reported
+    but not counted, since that solver can land a few seconds early or step over a return entirely.
+    """
+
+    rng = random.Random(seed)
+    failures = 0
+    for body in bodies:
+        body_name = settings.INT_TO_STRING_PLANET_MAP[body]
+        index = manager.crossing_indexes.get(body)
+        if index is None:
+            logger.error(f'No crossing index loaded for {body_name}')
+            failures += 1
+            continue
+
+        checked = agreed = skipped = 0
+        for _ in range(samples):
+            jd = rng.uniform(float(index.julian_days[0]) + 400, float(index.julian_days[-1]) - 800)
+            dt = manager._calculate_datetime_from_julian_day(jd)
+            radix_position = rng.uniform(0, 360)
+            harmonic = rng.choice([1, 4, 36])
+
+            indexed = manager._get_indexed_return_time_list(index, body, radix_position, dt, harmonic, 3)
+            for return_time in indexed:
+                past = manager._is_past(manager._get_planet_longitude(body, return_time), radix_position, harmonic)
+                before = manager._is_past(manager._get_planet_longitude(body, return_time.subtract(seconds=1)),
+                                          radix_position, harmonic)
+                if not past or before:
+                    failures += 1
+                    logger.error(f'{body_name} return to {radix_position} (harmonic {harmonic}) near {dt}: '
+                                 f'{return_time} is not the first second past the harmonic')
+
+            try:
+                searched = manager._search_return_time_list(body, radix_position, dt, harmonic, 3)
+            except RuntimeError as ex:
+                # e.g. the search window goes negative for lunar harmonics above ~27
+                skipped += 1
+                logger.debug(f'Search solver failed; skipping comparison: {ex}')
+                continue
+
+            for indexed_time, searched_time in zip(indexed, searched):
+                checked += 1
+                if abs((indexed_time - searched_time).in_seconds()) <= VALIDATION_TOLERANCE_SECONDS:
+                    agreed += 1
+                else:
+                    logger.info(f'{body_name} return to {radix_position} (harmonic {harmonic}) near {dt}: '
+                                f'indexed {indexed_time}, searched {searched_time}')
+
+        logger.info(f'Validated {body_name}: {agreed}/{checked} return times agree with the bisection solver '
+                    f'within {VALIDATION_TOLERANCE_SECONDS}s; {skipped} samples skipped where it failed')
+    return failures
+
+
+def main():
+    from src.dll_tools.chartmanager import ChartManager
+
+    parser = argparse.ArgumentParser(description='Build or validate Sun and Moon crossing indexes.')
+    parser.add_argument('command', choices=['build', 'validate'])
+    parser.add_argument('--bodies', nargs='+', default=['Sun', 'Moon'], choices=['Sun', 'Moon'])
+    parser.add_argument('--start', default=settings.CROSSING_INDEX_START)
+    parser.add_argument('--end', default=settings.CROSSING_INDEX_END)
+    parser.add_argument('--resolution', type=float, default=settings.CROSSING_INDEX_RESOLUTION)
+    parser.add_argument('--samples', type=int, default=100)
+    args = parser.parse_args()
+
+    manager = ChartManager()
+    bodies = [settings.STRING_TO_INT_PLANET_MAP[name] for name in args.bodies]
+    if args.command == 'build':
+        build(manager, bodies, pendulum.parse(args.start), pendulum.parse(args.end), args.resolution)
+    else:
+        exit(1 if validate(manager, bodies, args.samples) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+from logging import getLogger
+from typing import Dict
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
+
+logger = getLogger(__name__)
+
+"""
+Calendar of the Julian days at which a body crosses each multiple of a resolution in degrees (whole degrees by
+default), for all ten bodies, whichever way they are moving.
+
+Unlike a crossing index, entries are not one per degree: a planet crosses a degree again on each retrograde re-entry,
+so every entry records which boundary was crossed and in which direction, in time order. Sign ingresses are the
+entries on multiples of 30 degrees. Between two consecutive entries the body stays within one resolution cell, which
+brackets any crossing of a longitude inside that cell for local refinement. Each crossing is exact, as refined by
+ChartManager's station solver. Indexes are built by the command line below and memory-mapped.
+"""
+
+
+class IngressIndex:
+    def __init__(self, body: int, resolution: float, julian_days: np.ndarray, boundaries: np.ndarray,
+                 directions: np.ndarray, fingerprint: str = None):
+        self.body = body
+        self.resolution = resolution
+        self.julian_days = julian_days
+        self.boundaries = boundaries  # Boundary numbers; boundary n is at n * resolution degrees
+        self.directions = directions
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, manager, body: int, start_jd: float, end_jd: float,
+              resolution: float = settings.INGRESS_INDEX_RESOLUTION) -> 'IngressIndex':
+        """Find every boundary crossing across a date range, a year at a time."""
+
+        boundary_count = int(round(360 / resolution))
+        julian_days, boundaries, directions = [], [], []
+        chunk_start = start_jd
+        while chunk_start < end_jd:
+            chunk_end = min(chunk_start + settings.STATION_RETURN_SCAN_DAYS, end_jd)
+            crossings = list(manager._iterate_station_crossings(body, 0, boundary_count, chunk_start, chunk_end))
+            julian_days.append(np.array([crossing[0] for crossing in crossings], dtype=np.float64))
+            boundaries.append(np.array([crossing[1] for crossing in crossings], dtype=np.int16))
+            directions.append(np.array([crossing[2] for crossing in crossings], dtype=np.int8))
+            chunk_start = chunk_end
+
+        return cls(body, resolution, np.concatenate(julian_days), np.concatenate(boundaries),
+                   np.concatenate(directions), get_ephemeris_fingerprint())
+
+    @classmethod
+    def load(cls, path: str) -> 'IngressIndex':
+        """Load an index saved by save(), memory-mapping its crossings."""
+
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        return cls(meta['body'], meta['resolution'], np.load(path + '.npy', mmap_mode='r'),
+                   np.load(path + '_boundaries.npy', mmap_mode='r'), np.load(path + '_directions.npy', mmap_mode='r'),
+                   meta['fingerprint'])
+
+    @classmethod
+    def load_all(cls, directory: str = None) -> Dict[int, 'IngressIndex']:
+        directory = directory or get_index_directory()
+        indexes = dict()
+        if not os.path.isdir(directory):
+            return indexes
+
+        fingerprint = get_ephemeris_fingerprint()
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.json'):
+                continue
+            index = cls.load(os.path.join(directory, file_name[:-len('.json')]))
+            if index.fingerprint != fingerprint:
+                logger.warning(f'Ignoring ingress index {file_name}; it was built against other ephemeris files.')
+                continue
+            indexes[index.body] = index
+            logger.info(f'Loaded {settings.INT_TO_STRING_PLANET_MAP[index.body]} ingress index '
+                        f'({len(index.julian_days)} crossings at {index.resolution:g} degrees).')
+        return indexes
+
+    def save(self, directory: str = None) -> str:
+        directory = directory or get_index_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, settings.INT_TO_STRING_PLANET_MAP[self.body])
+
+        np.save(path + '.npy', np.asarray(self.julian_days, dtype=np.float64))
+        np.save(path + '_boundaries.npy', np.asarray(self.boundaries, dtype=np.int16))
+        np.save(path + '_directions.npy', np.asarray(self.directions, dtype=np.int8))
+        with open(path + '.json', 'w') as f:
+            json.dump({
+                'body': self.body,
+                'resolution': self.resolution,
+                'start_jd': float(self.julian_days[0]),
+                'end_jd': float(self.julian_days[-1]),
+                'fingerprint': self.fingerprint,
+            }, f, indent=2)
+        return path
+
+    def covers(self, start_jd: float, end_jd: float) -> bool:
+        """Whether the body's cell is known throughout a span: it must start and end between two crossings."""
+
+        return len(self.julian_days) > 1 and self.julian_days[0] <= start_jd and end_jd <= self.julian_days[-1]
+
+    def get_range(self, start_jd: float, end_jd: float) -> slice:
+        """The entries from the last crossing at or before start_jd to the first at or after end_jd."""
+
+        first = max(int(np.searchsorted(self.julian_days, start_jd, side='right')) - 1, 0)
+        last = min(int(np.searchsorted(self.julian_days, end_jd, side='left')), len(self.julian_days) - 1)
+        return slice(first, last + 1)
+
+
+def get_index_directory() -> str:
+    return os.path.join(os.path.dirname(__file__), settings.INGRESS_INDEX_PATH)
+
+
+# =================================================================================================================== #
+# ===============================================   Command line   ================================================== #
+# =================================================================================================================== #
+
+def build(manager, bodies: list, start: pendulum.datetime, end: pendulum.datetime, resolution: float) -> None:
+    start_jd = manager._calculate_julian_day(start)
+    end_jd = manager._calculate_julian_day(end)
+    for body in bodies:
+        started = time.perf_counter()
+        index = IngressIndex.build(manager, body, start_jd, end_jd, resolution)
+        path = index.save()
+        logger.info(f'Built {path} with {len(index.julian_days)} crossings in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    from src.dll_tools.chartmanager import ChartManager
+
+    parser = argparse.ArgumentParser(description='Build ingress and degree crossing indexes.')
+    parser.add_argument('--bodies', nargs='+', default=settings.INT_TO_STRING_PLANET_MAP,
+                        choices=settings.INT_TO_STRING_PLANET_MAP)
+    parser.add_argument('--start', default=settings.INGRESS_INDEX_START)
+    parser.add_argument('--end', default=settings.INGRESS_INDEX_END)
+    parser.add_argument('--resolution', type=float, default=settings.INGRESS_INDEX_RESOLUTION,
+                        help='Degrees between boundaries; must divide 30, so that every sign ingress is one')
+    args = parser.parse_args()
+    if (30 / args.resolution) % 1:
+        parser.error('The resolution must divide 30 degrees')
+
+    manager = ChartManager()
+    bodies = [settings.STRING_TO_INT_PLANET_MAP[name] for name in args.bodies]
+    build(manager, bodies, pendulum.parse(args.start), pendulum.parse(args.end), args.resolution)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import os
+import struct
+import time
+from logging import getLogger
+from math import ceil, floor
+from typing import Dict, Tuple, Union
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
+
+logger = getLogger(__name__)
+
+"""
+Precomputed sidereal longitudes of the Sun and Moon on a fixed Julian day grid, shared by every process on a host.
+
+Each body's samples live in one file: a fixed-size header, then unwrapped longitudes as little-endian doubles. Files
+are built once by the command line below, written to a temporary file and renamed into place, and every ChartManager
+memory-maps them read-only; the pages come from the OS page cache, so N worker processes hold one copy between them
+and none of them computes the samples. The header records the format version, the fingerprint of the ephemeris files
+and the calculation flags, and a store that doesn't match all three is ignored rather than read.
+"""
+
+MAGIC = b'NOVASMPL'
+FORMAT_VERSION = 1
+# Magic, format version, ephemeris fingerprint, body, flags, start Julian day, step in days, sample count
+HEADER = struct.Struct('<8sI16siiddq')
+HEADER_SIZE = 64  # HEADER, padded so that the samples are aligned
+
+
+class SampleStore:
+    def __init__(self, body: int, start_jd: float, step_days: float, unwrapped: np.ndarray,
+                 fingerprint: str = None):
+        self.body = body
+        self.start_jd = start_jd
+        self.step_days = step_days
+        self.unwrapped = unwrapped
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, manager, body: int, start_jd: float, end_jd: float,
+              step_days: float = None) -> 'SampleStore':
+        step_days = step_days or settings.SAMPLE_STORE_STEP_DAYS[body]
+        julian_days = start_jd + (np.arange(int(ceil((end_jd - start_jd) / step_days)) + 1) * step_days)
+        longitudes = manager._sample_planets(julian_days, [body], settings.SIDEREALMODE)[:, 0, 0]
+
+        # Both bodies only ever move forward, so each step is the forward distance travelled
+        steps = np.mod(np.diff(longitudes), 360)
+        unwrapped = np.concatenate(([longitudes[0]], longitudes[0] + np.cumsum(steps)))
+        return cls(body, start_jd, step_days, unwrapped, get_ephemeris_fingerprint())
+
+    @classmethod
+    def load(cls, path: str) -> Union['SampleStore', None]:
+        """Memory-map a store saved by save(); returns None if it was written for other ephemeris files, flags or
+        format version."""
+
+        with open(path, 'rb') as f:
+            magic, version, fingerprint, body, flags, start_jd, step_days, count = HEADER.unpack(f.read(HEADER.size))
+
+        fingerprint = fingerprint.decode('ascii')
+        if magic != MAGIC or version != FORMAT_VERSION:
+            logger.warning(f'Ignoring sample store {path}; it is not a version {FORMAT_VERSION} sample store.')
+            return None
+        if fingerprint != get_ephemeris_fingerprint() or flags != settings.SIDEREALMODE.value:
+            logger.warning(f'Ignoring sample store {path}; it was built against other ephemeris files or flags.')
+            return None
+
+        unwrapped = np.memmap(path, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(count,))
+        return cls(body, start_jd, step_days, unwrapped, fingerprint)
+
+    @classmethod
+    def load_all(cls, directory: str = None) -> Dict[int, 'SampleStore']:
+        directory = directory or get_store_directory()
+        stores = dict()
+        if not os.path.isdir(directory):
+            return stores
+
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.samples'):
+                continue
+            store = cls.load(os.path.join(directory, file_name))
+            if store is not None:
+                stores[store.body] = store
+                logger.info(f'Loaded {settings.INT_TO_STRING_PLANET_MAP[store.body]} sample store '
+                            f'({len(store.unwrapped)} samples every {store.step_days:g} days).')
+        return stores
+
+    def save(self, directory: str = None) -> str:
+        directory = directory or get_store_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{settings.INT_TO_STRING_PLANET_MAP[self.body]}.samples')
+
+        # Renamed into place, so that processes starting meanwhile see either the old store or the whole new one
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temporary_path, 'wb') as f:
+                header = HEADER.pack(MAGIC, FORMAT_VERSION, self.fingerprint.encode('ascii'), self.body,
+                                     settings.SIDEREALMODE.value, self.start_jd, self.step_days, len(self.unwrapped))
+                f.write(header.ljust(HEADER_SIZE, b'\0'))
+                f.write(np.asarray(self.unwrapped, dtype='<f8').tobytes())
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return path
+
+    def get_samples(self, start_jd: float, end_jd: float,
+                    max_step_days: float) -> Union[Tuple[np.ndarray, np.ndarray], None]:
+        """Julian days and unwrapped longitudes of at least four samples spanning start_jd to end_jd, at most
+        max_step_days apart. The longitudes are a view into the store. Returns None if the store doesn't cover the
+        span or isn't fine enough."""
+
+        stride = int(max_step_days / self.step_days)
+        if stride < 1:
+            return None
+
+        first = int(floor((start_jd - self.start_jd) / self.step_days))
+        steps = max(3, int(ceil(((end_jd - self.start_jd) / self.step_days - first) / stride)))
+        last = first + (steps * stride)
+        if first < 0 or last >= len(self.unwrapped):
+            return None
+
+        julian_days = self.start_jd + (np.arange(first, last + 1, stride) * self.step_days)
+        return julian_days, self.unwrapped[first:last + 1:stride]
+
+
+def get_store_directory() -> str:
+    return os.path.join(os.path.dirname(__file__), settings.SAMPLE_STORE_PATH)
+
+
+# =================================================================================================================== #
+# ===============================================   Command line   ================================================== #
+# =================================================================================================================== #
+
+def build(manager, bodies: list, start: pendulum.datetime, end: pendulum.datetime) -> None:
+    start_jd = manager._calculate_julian_day(start)
+    end_jd = manager._calculate_julian_day(end)
+    for body in bodies:
+        started = time.perf_counter()
+        store = SampleStore.build(manager, body, start_jd, end_jd)
+        path = store.save()
+        logger.info(f'Built {path} with {len(store.unwrapped)} samples in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    from src.dll_tools.chartmanager import ChartManager
+
+    parser = argparse.ArgumentParser(description='Build the shared Sun and Moon sample stores.')
+    parser.add_argument('--bodies', nargs='+', default=['Sun', 'Moon'], choices=['Sun', 'Moon'])
+    parser.add_argument('--start', default=settings.SAMPLE_STORE_START)
+    parser.add_argument('--end', default=settings.SAMPLE_STORE_END)
+    args = parser.parse_args()
+
+    manager = ChartManager()
+    bodies = [settings.STRING_TO_INT_PLANET_MAP[name] for name in args.bodies]
+    build(manager, bodies, pendulum.parse(args.start), pendulum.parse(args.end))
+
+
+if __name__ == '__main__':
+    main()
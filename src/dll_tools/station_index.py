@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import time
+from logging import getLogger
+from typing import Dict
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools.swissephlib import get_ephemeris_fingerprint
+
+logger = getLogger(__name__)
+
+"""
+Stations of the bodies that turn retrograde (Mercury to Pluto): the Julian days at which their longitude speed
+changes sign.
+
+Between two consecutive stations a body's longitude only moves one way, so each harmonic position it crosses there is
+crossed exactly once and can be bracketed and refined monotonically, however many times the body crosses it around a
+station. Stations alternate between retrograde and direct, so the index only stores their Julian days and the
+direction of motion at the start of its span. Indexes are built by the command line below and memory-mapped, like
+crossing indexes; ChartManager builds one for just the span it needs when no saved index covers it.
+"""
+
+DIRECT = 1
+RETROGRADE = -1
+
+
+class StationIndex:
+    def __init__(self, body: int, start_jd: float, end_jd: float, initial_direction: int, julian_days: np.ndarray,
+                 fingerprint: str = None):
+        self.body = body
+        self.start_jd = start_jd
+        self.end_jd = end_jd
+        self.initial_direction = initial_direction
+        self.julian_days = julian_days
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, manager, body: int, start_jd: float, end_jd: float,
+              sample_days: float = settings.STATION_INDEX_SAMPLE_DAYS) -> 'StationIndex':
+        """Sample a body's speed across a date range and refine each change of sign by bisection."""
+
+        sample_jds = np.append(np.arange(start_jd, end_jd, sample_days), end_jd)
+        speeds = manager._sample_planets(sample_jds, [body])[:, 0, 3]
+        directions = np.where(speeds < 0, RETROGRADE, DIRECT)
+
+        stations = []
+        for i in np.nonzero(directions[:-1] != directions[1:])[0]:
+            floor_jd, ceiling_jd = float(sample_jds[i]), float(sample_jds[i + 1])
+            while ceiling_jd - floor_jd > settings.STATION_INDEX_RESOLUTION_DAYS:
+                midpoint = (floor_jd + ceiling_jd) / 2
+                if (manager._get_planet_speed(body, midpoint) < 0) == (directions[i] == RETROGRADE):
+                    floor_jd = midpoint
+                else:
+                    ceiling_jd = midpoint
+            stations.append((floor_jd + ceiling_jd) / 2)
+
+        return cls(body, start_jd, end_jd, int(directions[0]), np.array(stations, dtype=np.float64),
+                   get_ephemeris_fingerprint())
+
+    @classmethod
+    def direct(cls, body: int) -> 'StationIndex':
+        """An index without stations, covering all time, for a body that never turns retrograde (the Sun or Moon)."""
+
+        return cls(body, float('-inf'), float('inf'), DIRECT, np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def load(cls, path: str) -> 'StationIndex':
+        """Load an index saved by save(), memory-mapping its stations."""
+
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        julian_days = np.load(path + '.npy', mmap_mode='r')
+        return cls(meta['body'], meta['start_jd'], meta['end_jd'], meta['initial_direction'], julian_days,
+                   meta['fingerprint'])
+
+    @classmethod
+    def load_all(cls, directory: str = None) -> Dict[int, 'StationIndex']:
+        directory = directory or get_index_directory()
+        indexes = dict()
+        if not os.path.isdir(directory):
+            return indexes
+
+        fingerprint = get_ephemeris_fingerprint()
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith('.json'):
+                continue
+            index = cls.load(os.path.join(directory, file_name[:-len('.json')]))
+            if index.fingerprint != fingerprint:
+                logger.warning(f'Ignoring station index {file_name}; it was built against other ephemeris files.')
+                continue
+            indexes[index.body] = index
+            logger.info(f'Loaded {settings.INT_TO_STRING_PLANET_MAP[index.body]} station index '
+                        f'({len(index.julian_days)} stations).')
+        return indexes
+
+    def save(self, directory: str = None) -> str:
+        directory = directory or get_index_directory()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, settings.INT_TO_STRING_PLANET_MAP[self.body])
+
+        np.save(path + '.npy', np.asarray(self.julian_days, dtype=np.float64))
+        with open(path + '.json', 'w') as f:
+            json.dump({
+                'body': self.body,
+                'start_jd': self.start_jd,
+                'end_jd': self.end_jd,
+                'initial_direction': self.initial_direction,
+                'fingerprint': self.fingerprint,
+            }, f, indent=2)
+        return path
+
+    def covers(self, start_jd: float, end_jd: float) -> bool:
+        return self.start_jd <= start_jd and end_jd <= self.end_jd
+
+    def get_stations(self, start_jd: float, end_jd: float) -> np.ndarray:
+        """Stations strictly between two Julian days."""
+
+        return self.julian_days[np.searchsorted(self.julian_days, start_jd, side='right'):
+                                np.searchsorted(self.julian_days, end_jd, side='left')]
+
+    def get_direction(self, julian_day: float) -> int:
+        """DIRECT or RETROGRADE: the direction of motion just after a Julian day."""
+
+        stations_passed = int(np.searchsorted(self.julian_days, julian_day, side='right'))
+        return self.initial_direction * (-1 if stations_passed % 2 else 1)
+
+
+def get_index_directory() -> str:
+    return os.path.join(os.path.dirname(__file__), settings.STATION_INDEX_PATH)
+
+
+# =================================================================================================================== #
+# ===============================================   Command line   ================================================== #
+# =================================================================================================================== #
+
+def build(manager, bodies: list, start: pendulum.datetime, end: pendulum.datetime) -> None:
+    start_jd = manager._calculate_julian_day(start)
+    end_jd = manager._calculate_julian_day(end)
+    for body in bodies:
+        started = time.perf_counter()
+        index = StationIndex.build(manager, body, start_jd, end_jd)
+        path = index.save()
+        logger.info(f'Built {path} with {len(index.julian_days)} stations in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    from src.dll_tools.chartmanager import ChartManager
+
+    planets = settings.INT_TO_STRING_PLANET_MAP[2:]
+    parser = argparse.ArgumentParser(description='Build station indexes for the planets.')
+    parser.add_argument('--bodies', nargs='+', default=planets, choices=planets)
+    parser.add_argument('--start', default=settings.STATION_INDEX_START)
+    parser.add_argument('--end', default=settings.STATION_INDEX_END)
+    args = parser.parse_args()
+
+    manager = ChartManager()
+    bodies = [settings.STRING_TO_INT_PLANET_MAP[name] for name in args.bodies]
+    build(manager, bodies, pendulum.parse(args.start), pendulum.parse(args.end))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,14 @@
 import ctypes
+import hashlib
 from ctypes import c_char_p, c_int, c_int32, c_double, POINTER, CDLL
 import os
 import platform
 import struct
+import threading
 from logging import getLogger
 
 from src import settings
+from src.utils.metrics import metrics
 
 logger = getLogger(__name__)
 
@@ -13,6 +16,25 @@ logger = getLogger(__name__)
 Wraps Swiss Ephemeris library functions. Only one instance should exist at a time.
 """
 
+_ephemeris_fingerprint = None
+
+
+def get_ephemeris_fingerprint() -> str:
+    """
+    Get a short hash of the ephemeris files in use, for versioning data derived from them.
+    """
+
+    global _ephemeris_fingerprint
+    if _ephemeris_fingerprint is None:
+        ephemeris_dir = os.path.join(os.path.dirname(__file__), settings.EPHEMERIS_PATH)
+        digest = hashlib.sha1()
+        for file_name in sorted(os.listdir(ephemeris_dir)):
+            digest.update(file_name.encode('utf-8'))
+            with open(os.path.join(ephemeris_dir, file_name), 'rb') as f:
+                digest.update(f.read())
+        _ephemeris_fingerprint = digest.hexdigest()[:16]
+    return _ephemeris_fingerprint
+
 
 class SwissephLib:
     def __init__(self):
@@ -132,8 +154,41 @@ class SwissephLib:
         """)
 
         self.ephemeris_path = self._get_ephemeris_path()
+        self._thread_state = threading.local()
+        self._initialize_thread()
+
+        # Swiss Ephemeris keeps its settings in thread-local storage, so each thread needs its own initialization
+        self.calculate_planets_UT = self._initialized_per_thread(self.calculate_planets_UT)
+        self.get_ayanamsa_UT = self._initialized_per_thread(self.get_ayanamsa_UT)
+        self.calculate_houses = self._initialized_per_thread(self.calculate_houses)
+
+        # Count and time the per-chart functions; no-ops unless metrics are enabled
+        self.get_julian_day = metrics.instrument(self.get_julian_day, 'swe_julday')
+        self.reverse_julian_day = metrics.instrument(self.reverse_julian_day, 'swe_revjul')
+        self.calculate_planets_UT = metrics.instrument(self.calculate_planets_UT, 'swe_calc_ut')
+        self.get_ayanamsa_UT = metrics.instrument(self.get_ayanamsa_UT, 'swe_get_ayanamsa_ex_ut')
+        self.calculate_houses = metrics.instrument(self.calculate_houses, 'swe_houses_ex')
+
+    def _initialize_thread(self):
         self.set_ephemeris_path(self.ephemeris_path)
         self.set_sidereal_mode(0, 0, 0)
+        self._thread_state.initialized = True
+
+    def _initialized_per_thread(self, function):
+        """
+        Wrap a function that depends on the ephemeris path or sidereal mode, so that it initializes them first in
+        any thread that hasn't yet. Without this, other threads silently fall back to the Moshier ephemeris.
+        """
+
+        thread_state = self._thread_state
+
+        def initialized(*args):
+            if not getattr(thread_state, 'initialized', False):
+                self._initialize_thread()
+            return function(*args)
+
+        initialized.__doc__ = function.__doc__
+        return initialized
 
     def _get_library_name_for_platform(self):
         """
@@ -0,0 +1,308 @@
+import argparse
+import copy
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import logging
+from statistics import median
+from typing import Callable
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.dll_tools.tests import fixtures
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+"""
+Benchmarks for the chart and return-search hot paths, built on the Solar Fire fixtures used by the startup tests.
+
+Run with `python -m src.dll_tools.tests.benchmarks`. Each benchmark reports operations per second, Swiss Ephemeris
+calls per operation and peak traced allocation per operation. Results can be saved as JSON and compared against a
+previous run to catch regressions.
+"""
+
+HACKENSACK = (-74.1169, 40.9792, 'America/New_York')
+MELBOURNE = (144.9666, -37.8166, 'Australia/Melbourne')
+
+# Harmonic return lists checked against Solar Fire before timing; (body, harmonic) -> (fixture, start date, place)
+RETURN_FIXTURES = {
+    (1, 4): (fixtures.quarti_lunar_dates_from_2019_3_18_22_30_15_Hackensack,
+             pendulum.datetime(2019, 3, 24, 10, tz=HACKENSACK[2]), HACKENSACK),
+    (0, 36): (fixtures.quarti_ennead_dates_from_2019_3_18_22_30_15_Melbourne,
+              pendulum.datetime(2019, 9, 24, 10, tz=MELBOURNE[2]), MELBOURNE),
+}
+
+
+class Benchmark:
+    def __init__(self, name: str, operation: Callable, validate: Callable = None):
+        self.name = name
+        self.operation = operation
+        self.validate = validate
+
+    def run(self, min_time: float, min_iterations: int, allocation_samples: int) -> dict:
+        errors = self.validate() if self.validate else []
+
+        self.operation()  # Warm up
+
+        swe_calls_before = metrics.get_count('swe_call_seconds')
+        iterations = 0
+        started = time.perf_counter()
+        elapsed = 0
+        while elapsed < min_time or iterations < min_iterations:
+            self.operation()
+            iterations += 1
+            elapsed = time.perf_counter() - started
+        swe_calls = metrics.get_count('swe_call_seconds') - swe_calls_before
+
+        peaks = []
+        for _ in range(allocation_samples):
+            tracemalloc.start()
+            self.operation()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        return {
+            'ops_per_sec': iterations / elapsed,
+            'ms_per_op': (elapsed / iterations) * 1000,
+            'ephemeris_calls_per_op': swe_calls / iterations,
+            'peak_kib_per_op': median(peaks) / 1024 if peaks else None,
+            'iterations': iterations,
+            'fixture_errors': len(errors),
+        }
+
+
+def get_benchmarks(manager) -> list:
+    ldt = pendulum.datetime(1989, 3, 18, 22, 30, 15, tz=HACKENSACK[2])
+    radix = manager.create_chartdata(ldt, HACKENSACK[0], HACKENSACK[1])
+    return_date = pendulum.datetime(2019, 3, 24, 10, tz=MELBOURNE[2])
+    lunar_return = manager._generate_return_list(copy.deepcopy(radix), MELBOURNE[0], MELBOURNE[1],
+                                                 return_date, 1, 1, 1)[0]
+    transit_dt = pendulum.datetime(2019, 4, 2, 22, 32, tz=HACKENSACK[2])
+
+    def precess():
+        precessed = copy.deepcopy(radix)
+        manager.precess(precessed, lunar_return)
+        return precessed.jsonify_chart()
+
+    # Chart fields are calculated lazily, so every chart benchmark serializes its charts as the routes do
+    benchmarks = [
+        Benchmark('create_chartdata',
+                  lambda: manager.create_chartdata(ldt, HACKENSACK[0], HACKENSACK[1]).jsonify_chart()),
+        Benchmark('precess', precess),
+        Benchmark('get_progressions',
+                  lambda: manager.get_progressions(radix, transit_dt, HACKENSACK[0], HACKENSACK[1]).jsonify_chart()),
+        Benchmark('get_transit_sensitive_charts',
+                  lambda: {name: chart.jsonify_chart() for name, chart in manager.get_transit_sensitive_charts(
+                      radix, transit_dt, HACKENSACK[0], HACKENSACK[1]).items()}),
+        Benchmark('progression_timeline_100y_monthly',
+                  lambda: manager.progression_timeline(radix, transit_dt, transit_dt.add(years=100),
+                                                       pendulum.duration(months=1))),
+        Benchmark('relocation_grid_1deg_world',
+                  lambda: manager.relocation_grid(radix, np.arange(-180, 180.0), np.arange(-90, 91.0)[:, None])),
+    ]
+
+    for body in (0, 1):
+        for harmonic in (1, 4, 36):
+            benchmarks.append(_get_return_list_benchmark(manager, body, harmonic))
+
+    # One pass over harmonics 1, 2, 4 and 36, against a separate return list for each
+    natal_moon = radix.planets_ecliptic['Moon'][0]
+    benchmarks += [
+        Benchmark('multi_harmonic_moon_1_2_4_36',
+                  lambda: manager.get_multi_harmonic_return_times(1, natal_moon, return_date, [1, 2, 4, 36], 10)),
+        Benchmark('separate_harmonics_moon_1_2_4_36',
+                  lambda: [manager._get_return_time_list(1, natal_moon, return_date, harmonic, 10)
+                           for harmonic in (1, 2, 4, 36)]),
+    ]
+
+    # Return times alone at each precision tier; charting the returns costs the same at every tier
+    for precision in settings.RETURN_PRECISIONS:
+        benchmarks.append(Benchmark(f'return_times_moon_h4_100_{precision}',
+                                    lambda precision=precision: manager._get_return_time_list(
+                                        1, natal_moon, return_date, 4, 100, precision)))
+
+    batch_radixes = [(index * 137.508) % 360 for index in range(100)]
+    benchmarks.append(Benchmark('batch_returns_moon_h1_100_radixes_1y',
+                                lambda: manager.get_batch_return_times(1, batch_radixes, return_date,
+                                                                       return_date.add(years=1), 1)))
+
+    for harmonic in (2, 8):
+        benchmarks.append(Benchmark(f'phase_events_h{harmonic}_20y',
+                                    lambda harmonic=harmonic: manager.get_phase_events(
+                                        return_date, return_date.add(years=20), harmonic)))
+
+    benchmarks.append(Benchmark('angularity_timeline_30d',
+                                lambda: manager.get_angularity_timeline(transit_dt, transit_dt.add(days=30),
+                                                                        HACKENSACK[0], HACKENSACK[1])))
+
+    benchmarks += [
+        Benchmark('ingresses_all_bodies_10y',
+                  lambda: manager.get_ingresses(return_date, return_date.add(years=10))),
+        Benchmark('degree_crossings_mercury_10y',
+                  lambda: manager.get_degree_crossings(2, 123.4, return_date, return_date.add(years=10))),
+    ]
+
+    return benchmarks
+
+
+def _get_return_list_benchmark(manager, body: int, harmonic: int) -> Benchmark:
+    fixture, start, place = RETURN_FIXTURES.get((body, harmonic), (None, None, HACKENSACK))
+    start = start or pendulum.datetime(2019, 3, 24, 10, tz=place[2])
+    quantity = len(fixture) if fixture else 10
+
+    natal = manager.create_chartdata(pendulum.datetime(2019, 3, 18, 22, 30, 15, tz=place[2]), place[0], place[1])
+
+    def operation():
+        charts = manager._generate_return_list(natal, place[0], place[1], start, body, harmonic, quantity)
+        for chart in charts:
+            chart.jsonify_chart()
+        return charts
+
+    def validate():
+        return fixtures.compare_return_times(operation(), fixture, f'benchmark {body}/{harmonic}')
+
+    name = f'return_list_{settings.INT_TO_STRING_PLANET_MAP[body].lower()}_h{harmonic}'
+    return Benchmark(name, operation, validate if fixture else None)
+
+
+def get_route_benchmarks() -> list:
+    """Full Flask route calls, with geocoding stubbed to fixed coordinates."""
+
+    from src.app import app as app_module
+
+    def geocode(location: str) -> dict:
+        longitude, latitude, tz = MELBOURNE if location == 'Melbourne' else HACKENSACK
+        return {'longitude': longitude, 'latitude': latitude, 'tz': tz, 'place_name': location}
+
+    app_module.geocode = geocode
+    client = app_module.app.test_client()
+    radix = {'local_datetime': '1989-03-18T22:30:15', 'location': 'Hackensack'}
+
+    def post(route: str, payload: dict) -> Callable:
+        def operation():
+            response = client.post(route, json=payload)
+            if response.status_code != 200 or b'"err"' in response.data[:10]:
+                raise RuntimeError(f'{route} failed: {response.data[:200]}')
+        return operation
+
+    return [
+        Benchmark('route_radix', post('/radix', radix)),
+        Benchmark('route_relocate', post('/relocate', {
+            'location': 'Melbourne',
+            'radix': radix,
+            'solunar': {'local_datetime': '2019-03-19T07:45:00'},
+        })),
+        Benchmark('route_solunar', post('/solunar', {
+            'radix': radix,
+            'return_params': {
+                'return_planet': 'Moon',
+                'return_harmonic': 4,
+                'return_start_date': '2019-03-24T10:00:00',
+                'return_location': 'Melbourne',
+                'return_quantity': 10,
+            },
+        })),
+    ]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print a comparison of two runs; returns the names of benchmarks that slowed down beyond the threshold."""
+
+    regressions = []
+    print(f'\n{"benchmark":<34}{"baseline ops/s":>16}{"current ops/s":>16}{"change":>10}')
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            print(f'{name:<34}{"-":>16}{result["ops_per_sec"]:>16.1f}{"new":>10}')
+            continue
+        change = (result['ops_per_sec'] / previous['ops_per_sec']) - 1
+        flag = ''
+        if change < -threshold:
+            regressions.append(name)
+            flag = '  <-- regression'
+        print(f'{name:<34}{previous["ops_per_sec"]:>16.1f}{result["ops_per_sec"]:>16.1f}{change:>+10.1%}{flag}')
+    return regressions
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chart and return calculations.')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this string')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Minimum seconds to spend per benchmark')
+    parser.add_argument('--min-iterations', type=int, default=5)
+    parser.add_argument('--allocation-samples', type=int, default=3)
+    parser.add_argument('--no-routes', action='store_true', help='Skip the Flask route benchmarks')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--compare', help='Compare against results previously written with --output')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Fractional slowdown treated as a regression when comparing')
+    args = parser.parse_args()
+
+    # Ephemeris calls are counted through the metrics wrappers, which must be in place before the library loads
+    metrics.enabled = True
+    from src.dll_tools.chartmanager import ChartManager
+    logging.getLogger().setLevel(logging.WARNING)
+    manager = ChartManager()
+
+    benchmarks = get_benchmarks(manager)
+    if not args.no_routes:
+        benchmarks += get_route_benchmarks()
+
+    results = {
+        'meta': {
+            'commit': get_commit(),
+            'version': settings.VERSION_NUMBER,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': pendulum.now('UTC').to_iso8601_string(),
+            'crossing_indexes': sorted(settings.INT_TO_STRING_PLANET_MAP[body]
+                                       for body in manager.crossing_indexes),
+        },
+        'results': {},
+    }
+
+    print(f'{"benchmark":<34}{"ops/s":>12}{"ms/op":>12}{"swe calls/op":>14}{"peak KiB/op":>14}')
+    for benchmark in benchmarks:
+        if args.filter not in benchmark.name:
+            continue
+        try:
+            result = benchmark.run(args.min_time, args.min_iterations, args.allocation_samples)
+        except Exception as ex:
+            logger.error(f'{benchmark.name} failed: {ex}')
+            results['results'][benchmark.name] = {'error': str(ex)}
+            continue
+
+        results['results'][benchmark.name] = result
+        errors = f'  ({result["fixture_errors"]} fixture errors)' if result['fixture_errors'] else ''
+        print(f'{benchmark.name:<34}{result["ops_per_sec"]:>12.1f}{result["ms_per_op"]:>12.3f}'
+              f'{result["ephemeris_calls_per_op"]:>14.1f}{result["peak_kib_per_op"]:>14.1f}{errors}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        successful = {'results': {name: result for name, result in results['results'].items()
+                                  if 'error' not in result}}
+        baseline['results'] = {name: result for name, result in baseline['results'].items() if 'error' not in result}
+        if compare(successful, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
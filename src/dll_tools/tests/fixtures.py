@@ -8,13 +8,27 @@ def compare_return_times(chart_list, expected_date_list, name):
     errors = list()
 
     for index, c in enumerate(chart_list):
-        if (c.local_datetime - expected_date_list[index]).in_seconds() > 30:
+        if abs((c.local_datetime - expected_date_list[index]).in_seconds()) > 30:
             errors.append(
                 f'{name} on harmonic return; {c.local_datetime} != expected date: {expected_date_list[index]}')
 
     return errors
 
 
+def compare_events(events, expected_events, name, tolerance_seconds=30):
+    """Compare (time, ...) event tuples: each time within the tolerance, and everything after it equal."""
+
+    errors = list()
+    if len(events) != len(expected_events):
+        errors.append(f'{name}: {len(events)} events != expected {len(expected_events)}')
+
+    for event, expected in zip(events, expected_events):
+        if abs((event[0] - expected[0]).in_seconds()) > tolerance_seconds or tuple(event[1:]) != tuple(expected[1:]):
+            errors.append(f'{name} on event; {event} != expected: {expected}')
+
+    return errors
+
+
 def compare_charts(chart, fixture, name):
     errors = list()
 
@@ -316,6 +330,52 @@ slr_2019_3_19_melbourne = {
     }
 }
 
+# Checked against a chart calculated for the same moment at the new location; relocating must recalculate LST/RAMC
+radix_1989_3_18_22_30_15_Hackensack_relocated_to_Melbourne = {
+    'LST': 0.946,
+    'SVP': 5.408,
+    'Obliquity': 23.441,
+    'Ecliptic': {
+        'Sun': 333.9194,
+        'Moon': 118.3506,
+        'Mercury': 319.1095,
+        'Venus': 329.6521,
+        'Mars': 40.1498,
+        'Jupiter': 36.6408,
+        'Saturn': 258.3560,
+        'Uranus': 250.5478,
+        'Neptune': 257.6080,
+        'Pluto': 200.3281,
+    },
+    'Mundane': {
+        'Sun': 250.737,
+        'Moon': 42.479,
+        'Mercury': 238.902,
+        'Venus': 247.600,
+        'Mars': 339.954,
+        'Jupiter': 334.529,
+        'Saturn': 193.862,
+        'Uranus': 188.613,
+        'Neptune': 193.134,
+        'Pluto': 129.745,
+    },
+    'Right Ascension': {
+        'Sun': 358.634,
+        'Moon': 145.653,
+        'Mercury': 345.857,
+        'Venus': 355.287,
+        'Mars': 62.525,
+        'Jupiter': 59.232,
+        'Saturn': 283.997,
+        'Uranus': 275.609,
+        'Neptune': 283.170,
+        'Pluto': 227.150,
+    },
+    'Cusps': {'1': 60.465, '2': 101.028, '3': 142.377, '4': 170.819, '5': 191.944, '6': 212.833,
+              '7': 240.465, '8': 281.028, '9': 322.377, '10': 350.819, '11': 11.944, '12': 32.833},
+    'Angles': {'Asc': 60.465, 'MC': 350.819, 'Eq Asc': 78.471},
+}
+
 quarti_lunar_dates_from_2019_3_18_22_30_15_Hackensack = [
     pendulum.parse('2019-03-25T03:01:07-04:00'),
     pendulum.parse('2019-04-01T11:50:14-04:00'),
@@ -360,3 +420,92 @@ quarti_ennead_dates_from_2019_3_18_22_30_15_Melbourne = [
     pendulum.parse("2020-03-18T04:43:11+11:00"),
     pendulum.parse("2020-03-28T06:33:06+11:00")
 ]
+
+# Returns of bodies that turn retrograde, checked against a scan of each body's longitude every one to four hours
+quarti_mercury_dates_from_1989_3_18_22_30_15_Hackensack = [
+    pendulum.parse('2019-02-18T09:40:36+00:00'),
+    pendulum.parse('2019-05-27T22:26:05+00:00'),
+    pendulum.parse('2019-09-05T13:36:01+00:00'),
+    pendulum.parse('2019-12-18T21:34:51+00:00'),
+    pendulum.parse('2020-03-31T02:19:43+00:00'),
+    pendulum.parse('2020-05-18T23:04:31+00:00'),
+    pendulum.parse('2020-08-27T13:00:29+00:00'),
+    pendulum.parse('2020-12-10T21:02:10+00:00'),
+    pendulum.parse('2021-03-25T16:23:56+00:00'),
+    pendulum.parse('2021-05-13T08:15:11+00:00'),
+    pendulum.parse('2021-08-19T22:46:13+00:00'),
+    pendulum.parse('2021-12-03T15:24:13+00:00')
+]
+mars_dates_from_1989_3_18_22_30_15_Hackensack = [
+    pendulum.parse('2019-04-08T01:25:22+00:00'),
+    pendulum.parse('2021-03-13T00:33:22+00:00'),
+    pendulum.parse('2022-08-29T11:59:07+00:00'),
+    pendulum.parse('2024-07-28T11:28:09+00:00'),
+    pendulum.parse('2026-07-06T05:30:07+00:00'),
+    pendulum.parse('2028-06-15T04:30:37+00:00')
+]
+# Saturn crosses a quarter of its radix position three times around its 2026 station
+quarti_saturn_dates_from_1989_3_18_22_30_15_Hackensack = [
+    pendulum.parse('2019-01-17T20:45:45+00:00'),
+    pendulum.parse('2026-06-17T12:00:14+00:00'),
+    pendulum.parse('2026-09-04T13:55:04+00:00'),
+    pendulum.parse('2027-03-04T13:07:28+00:00'),
+    pendulum.parse('2033-07-24T03:03:27+00:00'),
+    pendulum.parse('2040-09-26T07:54:40+00:00')
+]
+
+# Published lunation times, to the minute (UTC), with the Moon's elongation from the Sun
+lunar_phases_2019_1 = [
+    (pendulum.parse('2019-01-06T01:28:00+00:00'), 0.0),
+    (pendulum.parse('2019-01-14T06:45:00+00:00'), 90.0),
+    (pendulum.parse('2019-01-21T05:16:00+00:00'), 180.0),
+    (pendulum.parse('2019-01-27T21:10:00+00:00'), 270.0),
+]
+
+# Sun, Moon and Mercury reaching the angles, from a scan of their prime vertical longitudes every 20 seconds
+angularity_2019_6_21_New_York = [
+    (pendulum.parse('2019-06-21T00:57:40-04:00'), 'Sun', 'IC'),
+    (pendulum.parse('2019-06-21T02:46:03-04:00'), 'Mercury', 'IC'),
+    (pendulum.parse('2019-06-21T04:12:43-04:00'), 'Moon', 'MC'),
+    (pendulum.parse('2019-06-21T05:30:09-04:00'), 'Sun', 'Asc'),
+    (pendulum.parse('2019-06-21T07:24:11-04:00'), 'Mercury', 'Asc'),
+    (pendulum.parse('2019-06-21T09:17:14-04:00'), 'Moon', 'Dsc'),
+    (pendulum.parse('2019-06-21T12:57:47-04:00'), 'Sun', 'MC'),
+    (pendulum.parse('2019-06-21T14:46:20-04:00'), 'Mercury', 'MC'),
+    (pendulum.parse('2019-06-21T16:35:55-04:00'), 'Moon', 'IC'),
+    (pendulum.parse('2019-06-21T20:25:25-04:00'), 'Sun', 'Dsc'),
+    (pendulum.parse('2019-06-21T22:07:32-04:00'), 'Mercury', 'Dsc'),
+    (pendulum.parse('2019-06-21T23:47:06-04:00'), 'Moon', 'Asc'),
+]
+# In the midnight sun, where the Sun and Mercury never set and Jupiter never rises; each only reaches the MC or IC
+angularity_2019_6_21_Murmansk = [
+    (pendulum.parse('2019-06-21T00:01:24+03:00'), 'Jupiter', 'IC'),
+    (pendulum.parse('2019-06-21T00:49:16+03:00'), 'Sun', 'MC'),
+    (pendulum.parse('2019-06-21T02:16:30+03:00'), 'Moon', 'Asc'),
+    (pendulum.parse('2019-06-21T02:37:32+03:00'), 'Mercury', 'MC'),
+    (pendulum.parse('2019-06-21T03:50:18+03:00'), 'Moon', 'MC'),
+    (pendulum.parse('2019-06-21T05:33:51+03:00'), 'Moon', 'Dsc'),
+    (pendulum.parse('2019-06-21T11:59:10+03:00'), 'Jupiter', 'IC'),
+    (pendulum.parse('2019-06-21T12:49:23+03:00'), 'Sun', 'MC'),
+    (pendulum.parse('2019-06-21T14:37:51+03:00'), 'Mercury', 'MC'),
+    (pendulum.parse('2019-06-21T16:13:51+03:00'), 'Moon', 'IC'),
+    (pendulum.parse('2019-06-21T23:56:56+03:00'), 'Jupiter', 'IC'),
+]
+
+# Sun and Mercury sign ingresses, with whether each was made retrograde, and Mercury crossing 0.5 degrees into Pisces;
+# checked against a scan of their longitudes every hour. Mercury stations retrograde early in Pisces, backs into
+# Aquarius, and re-enters Pisces once direct.
+ingresses_2019_2_to_2019_4 = [
+    (pendulum.parse('2019-02-07T16:27:42+00:00'), 'Mercury', 'Aqu', False),
+    (pendulum.parse('2019-02-14T00:16:58+00:00'), 'Sun', 'Aqu', False),
+    (pendulum.parse('2019-02-25T21:33:17+00:00'), 'Mercury', 'Pis', False),
+    (pendulum.parse('2019-03-14T05:00:28+00:00'), 'Mercury', 'Aqu', True),
+    (pendulum.parse('2019-03-15T21:26:23+00:00'), 'Sun', 'Pis', False),
+    (pendulum.parse('2019-04-12T19:46:41+00:00'), 'Mercury', 'Pis', False),
+    (pendulum.parse('2019-04-15T06:17:49+00:00'), 'Sun', 'Ari', False),
+]
+mercury_crossings_330_5_2019_2_to_2019_4 = [
+    (pendulum.parse('2019-02-26T08:28:55+00:00'), False),
+    (pendulum.parse('2019-03-13T15:56:07+00:00'), True),
+    (pendulum.parse('2019-04-13T07:15:08+00:00'), False),
+]
@@ -67,6 +67,30 @@ def run_tests(manager=None):
     test_errors += fixtures.compare_return_times(chart_list, fixtures.quarti_ennead_dates_from_2019_3_18_22_30_15_Melbourne,
                                   '2019/3/18 22:30:15 Melbourne')
 
+    # Returns of bodies that turn retrograde, with and without the station indexes
+    ldt = pendulum.datetime(1989, 3, 18, 22, 30, 15, tz='America/New_York')
+    lat = 40.9792
+    long = -74.1169
+    chart = manager.create_chartdata(ldt, long, lat)
+    return_date = pendulum.datetime(2019, 3, 24, 10, tz='America/New_York')
+    station_return_fixtures = [
+        (2, 4, fixtures.quarti_mercury_dates_from_1989_3_18_22_30_15_Hackensack),
+        (4, 1, fixtures.mars_dates_from_1989_3_18_22_30_15_Hackensack),
+        (6, 4, fixtures.quarti_saturn_dates_from_1989_3_18_22_30_15_Hackensack),
+    ]
+
+    station_indexes = manager.station_indexes
+    try:
+        for indexes in (station_indexes, {}):
+            manager.station_indexes = indexes
+            for body, harmonic, expected in station_return_fixtures:
+                chart_list = manager._generate_return_list(chart, long, lat, return_date, body, harmonic, len(expected))
+                test_errors += fixtures.compare_return_times(
+                    chart_list, expected, f'1989/3/18 22:30:15 Hackensack body {body} harmonic {harmonic}'
+                                          f'{"" if indexes else " without station indexes"}')
+    finally:
+        manager.station_indexes = station_indexes
+
 
     # 1989/3/18 22:30:15 Hackensack - precessing into an SLR on the other side of the world
     ldt = pendulum.datetime(1989, 3, 18, 22, 30, 15, tz='America/New_York')
@@ -81,6 +105,13 @@ def run_tests(manager=None):
     test_errors += fixtures.compare_charts(radix, fixtures.slr_2019_3_19_melbourne,
                             "1989-3-18 22:30:15 Hack NJ SLR 2019-3-19 Melbourne AUS")
 
+    # 1989/3/18 22:30:15 Hackensack - relocated to the other side of the world
+    ldt = pendulum.datetime(1989, 3, 18, 22, 30, 15, tz='America/New_York')
+    radix = manager.create_chartdata(ldt, -74.1169, 40.9792)
+    manager.relocate(radix, 144.9666, -37.8166, 'Australia/Melbourne')
+    test_errors += fixtures.compare_charts(radix, fixtures.radix_1989_3_18_22_30_15_Hackensack_relocated_to_Melbourne,
+                                           "1989-3-18 22:30:15 Hack NJ relocated to Melbourne AUS")
+
     # Testing that precession is being accounted for in lists of solunar returns
     ldt = pendulum.datetime(1989, 3, 18, 22, 30, 15, tz='America/New_York')
     lat = 40.9792
@@ -99,6 +130,41 @@ def run_tests(manager=None):
         test_errors += f'Failed: precessing radix into consecutive returns: {errors}'
 
 
+    # New, full and quarter moons in January 2019
+    phase_events = manager.get_phase_events(pendulum.datetime(2019, 1, 1, tz='UTC'),
+                                            pendulum.datetime(2019, 2, 1, tz='UTC'), 4)
+    test_errors += fixtures.compare_events(phase_events, fixtures.lunar_phases_2019_1, 'January 2019 lunar phases',
+                                           tolerance_seconds=60)
+
+    # Planets reaching the angles over a day, at a mid latitude and above the arctic circle
+    ldt = pendulum.datetime(2019, 6, 21, tz='America/New_York')
+    events = manager.get_angularity_timeline(ldt, ldt.add(days=1), -74.0, 40.7, [0, 1, 2])
+    test_errors += fixtures.compare_events(events, fixtures.angularity_2019_6_21_New_York,
+                                           '2019-6-21 New York angularity', tolerance_seconds=2)
+
+    ldt = pendulum.datetime(2019, 6, 21, tz='Europe/Moscow')
+    events = manager.get_angularity_timeline(ldt, ldt.add(days=1), 33.0833, 68.9666, [0, 1, 2, 5])
+    test_errors += fixtures.compare_events(events, fixtures.angularity_2019_6_21_Murmansk,
+                                           '2019-6-21 Murmansk angularity', tolerance_seconds=2)
+
+    # Sign ingresses and degree crossings, with and without the ingress indexes
+    start = pendulum.datetime(2019, 2, 1, tz='UTC')
+    end = pendulum.datetime(2019, 5, 1, tz='UTC')
+    ingress_indexes = manager.ingress_indexes
+    try:
+        for indexes in (ingress_indexes, {}):
+            manager.ingress_indexes = indexes
+            name_suffix = '' if indexes else ' without ingress indexes'
+            ingresses = manager.get_ingresses(start, end, [0, 2])
+            test_errors += fixtures.compare_events(ingresses, fixtures.ingresses_2019_2_to_2019_4,
+                                                   f'Feb-Apr 2019 ingresses{name_suffix}', tolerance_seconds=1)
+            crossings = manager.get_degree_crossings(2, 330.5, start, end)
+            test_errors += fixtures.compare_events(crossings, fixtures.mercury_crossings_330_5_2019_2_to_2019_4,
+                                                   f'Feb-Apr 2019 Mercury crossings{name_suffix}', tolerance_seconds=1)
+    finally:
+        manager.ingress_indexes = ingress_indexes
+
+
     # These still need tests
 
     ldt = pendulum.datetime(1989, 12, 20, 22, 20, 0, tz='America/New_York')
@@ -109,6 +175,13 @@ def run_tests(manager=None):
 
     sp = manager.get_progressions(radix, local_dt, long, lat)
 
+    # Progressed planets sit in the houses of the actual date
+    real_date = manager.create_chartdata(local_dt, long, lat)
+    for angle in ('MC', 'Asc'):
+        if abs(sp.angles_longitude[angle] - real_date.angles_longitude[angle]) >= 0.01:
+            test_errors.append(f"Progressions for 2019-3-31 15:00 on {angle}: {sp.angles_longitude[angle]} != "
+                               f"{real_date.angles_longitude[angle]}")
+
     ldt = pendulum.datetime(1989, 12, 20, 22, 30, tz='America/New_York')
     lat = 40.9792
     long = -74.1169
@@ -0,0 +1,74 @@
+import logging
+import os
+import tempfile
+
+from src.utils.snapshot import SnapshotManager
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    datefmt='%m-%d %H:%M')
+
+"""
+Writes cache snapshots to a temporary directory and reads them back through fresh SnapshotManagers, as a restarted
+process would:
+
+    python -m src.dll_tools.tests.snapshot_tests
+"""
+
+
+def run_tests() -> list:
+    test_errors = list()
+    geocodes = [[f'Place {i}', {'longitude': i / 10, 'latitude': -i / 10}] for i in range(2000)]
+    timezones = [['exact', i / 10, -i / 10, 'America/New_York'] for i in range(2000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'snapshot')
+
+        # Everything fits
+        written = _save(path, 10 ** 6, geocodes, timezones)
+        restored = _restore(path)
+        if restored != {'geocode': geocodes, 'timezone': timezones}:
+            test_errors.append('A snapshot within its size limit did not restore every entry')
+
+        # The least valuable entries are dropped until the file fits
+        _save(path, written // 4, geocodes, timezones)
+        restored = _restore(path)
+        kept = len(restored['geocode'])
+        if not 0 < kept < len(geocodes) or restored['geocode'] != geocodes[:kept]:
+            test_errors.append(f'A capped snapshot restored {len(restored["geocode"])} geocodes, '
+                               f'not the most valuable part of {len(geocodes)}')
+
+        # A limit smaller than the empty sections leaves the previous snapshot in place
+        _save(path, 8, geocodes, timezones)
+        if _restore(path) != restored:
+            test_errors.append('A snapshot over a limit it could never fit replaced the previous one')
+
+        os.remove(path)
+        _save(path, 8, geocodes, timezones)
+        if os.path.exists(path):
+            test_errors.append('A snapshot was written over a limit it could never fit')
+
+    if test_errors:
+        logger.warning(test_errors)
+    else:
+        logger.info("Snapshot tests passed.")
+    return test_errors
+
+
+def _save(path: str, max_bytes: int, geocodes: list, timezones: list) -> int:
+    snapshots = SnapshotManager(path, max_bytes)
+    snapshots.register('geocode', lambda: geocodes)
+    snapshots.register('timezone', lambda: timezones)
+    snapshots.save()
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _restore(path: str) -> dict:
+    snapshots = SnapshotManager(path)
+    return {name: snapshots.restore(name) for name in ('geocode', 'timezone')}
+
+
+if __name__ == '__main__':
+    run_tests()
@@ -0,0 +1,90 @@
+import logging
+import random
+
+from src.utils.tz_resolver import TimezoneResolver
+
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    datefmt='%m-%d %H:%M')
+
+"""
+Sweeps coordinates along timezone borders through a TimezoneResolver and checks every answer against TimezoneFinder
+itself. These load the timezone polygons, so unlike functionality_tests they don't run at startup:
+
+    python -m src.dll_tools.tests.tz_resolver_tests
+"""
+
+# Points that cells sampled on a 3x3 grid once resolved to a neighbouring zone
+KNOWN_BORDER_POINTS = [
+    (-100.395, 44.877),  # America/Denver, not Chicago
+    (-85.205, 32.523),  # America/New_York, not Chicago
+    (-87.605, 39.277),  # America/Indiana/Indianapolis, not Chicago
+    (7.723, 42.959),  # Europe/Paris off Corsica, not Etc/GMT-1
+]
+
+# Zones renamed or added since etc/timezones.py was made; these must resolve like any other
+NEWER_ZONE_POINTS = [
+    (30.523, 50.450, 'Europe/Kyiv'),  # Europe/Kiev in the list
+    (-51.721, 64.181, 'America/Nuuk'),  # America/Godthab in the list
+    (-106.424, 31.690, 'America/Ciudad_Juarez'),  # Split from America/Ojinaga
+]
+
+# (west, south, east, north) regions crossed by zone borders, land borders and coastlines
+BORDER_REGIONS = [
+    (-101.5, 43.5, -99.5, 45.5),  # Mountain/Central in South Dakota
+    (-88.0, 37.5, -84.5, 41.5),  # Indiana's zones
+    (-86.0, 31.0, -84.5, 33.0),  # Alabama/Georgia
+    (7.0, 41.0, 10.0, 43.5),  # Corsica and its territorial waters
+    (5.5, 45.5, 10.5, 47.5),  # France/Switzerland/Italy
+    (-115.5, 31.0, -108.5, 33.0),  # Mexico/Arizona
+    (27.0, 67.0, 31.0, 70.0),  # Finland/Russia/Norway, above the Arctic Circle
+    (146.0, -38.0, 150.5, -35.0),  # New South Wales/Victoria
+]
+
+
+def run_tests(points_per_region: int = 20000, seed: int = 0) -> list:
+    from timezonefinder import TimezoneFinder
+
+    finder = TimezoneFinder()
+    resolver = TimezoneResolver()
+    rng = random.Random(seed)
+
+    points = list(KNOWN_BORDER_POINTS)
+    for west, south, east, north in BORDER_REGIONS:
+        points += [(round(rng.uniform(west, east), 3), round(rng.uniform(south, north), 3))
+                   for _ in range(points_per_region)]
+
+    test_errors = list()
+    for lng, lat, expected in NEWER_ZONE_POINTS:
+        # The second lookup comes from the cache
+        tz = [resolver.timezone_at(lng=lng, lat=lat) for _ in range(2)]
+        if tz != [expected, expected]:
+            test_errors.append(f'Timezone at longitude {lng}, latitude {lat}: {tz} != {expected}')
+    if resolver.hits != len(NEWER_ZONE_POINTS):
+        test_errors.append(f'Newer zones were answered from the cache {resolver.hits} times, '
+                           f'not {len(NEWER_ZONE_POINTS)}')
+
+    for lng, lat in points:
+        expected = finder.timezone_at(lng=lng, lat=lat)
+        if expected is None:
+            continue
+        tz = resolver.timezone_at(lng=lng, lat=lat)
+        if tz != expected:
+            test_errors.append(f'Timezone at longitude {lng}, latitude {lat}: {tz} != {expected}')
+
+    stats = resolver.get_stats()
+    logger.info(f'Checked {len(points)} border points: {stats["hits"]} cache hits over {stats["cells"]} cells.')
+    if not stats['hits']:
+        test_errors.append('No timezone cell was ever answered from the cache')
+
+    if test_errors:
+        logger.warning(test_errors)
+    else:
+        logger.info("Timezone resolver tests passed.")
+    return test_errors
+
+
+if __name__ == '__main__':
+    run_tests()
@@ -0,0 +1,153 @@
+import numpy as np
+
+"""
+NumPy versions of ChartManager's per-chart calculations, for computing many charts, dates or locations at once.
+
+Each function mirrors its scalar counterpart in ChartManager and broadcasts over its array arguments.
+"""
+
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def julian_days_from_timestamps(timestamps) -> np.ndarray:
+    """Julian Days (UT) from POSIX timestamps."""
+
+    return (np.asarray(timestamps, dtype=np.float64) / 86400.0) + UNIX_EPOCH_JULIAN_DAY
+
+
+def local_sidereal_time(julian_days, geo_longitude) -> np.ndarray:
+    """Mirrors ChartManager._calculate_LST, taking Julian Days in UT instead of datetimes."""
+
+    julian_days = np.asarray(julian_days, dtype=np.float64)
+    julian_day_0_GMT = np.floor(julian_days - 0.5) + 0.5  # Julian Day number at midnight
+    universal_time = (julian_days - julian_day_0_GMT) * 24
+    sidereal_time_at_midnight_julian_day = (julian_day_0_GMT - 2451545.0) / 36525.0
+
+    greenwich_sidereal_time = (6.697374558
+                               + (2400.051336 * sidereal_time_at_midnight_julian_day)
+                               + (0.000024862 * np.power(sidereal_time_at_midnight_julian_day, 2))
+                               + (universal_time * 1.0027379093))
+    local_sidereal_time = (greenwich_sidereal_time + (np.asarray(geo_longitude) / 15)) % 24
+
+    return np.where(local_sidereal_time > 0, local_sidereal_time, local_sidereal_time + 24)
+
+
+def right_ascension(planet_latitude, planet_longitude, svp, obliquity) -> np.ndarray:
+    """Mirrors ChartManager._calculate_right_ascension."""
+
+    precessed_longitude = np.radians(np.asarray(planet_longitude) + (360 - (330 + np.asarray(svp))))
+    obliquity = np.radians(obliquity)
+    calcs_ay = (np.sin(precessed_longitude) * np.cos(obliquity)
+                - np.tan(np.radians(planet_latitude)) * np.sin(obliquity))
+    calcs_ax = np.cos(precessed_longitude)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calcs_o = np.degrees(np.arctan(calcs_ay / calcs_ax))
+
+    return np.where(calcs_ax < 0, calcs_o + 180, np.where(calcs_ay < 0, calcs_o + 360, calcs_o))
+
+
+def prime_vertical_longitude(planet_longitude, planet_latitude, ramc, obliquity, svp, geo_latitude):
+    """Mirrors ChartManager._calculate_prime_vertical_longitude; returns arrays of (house, longitude)."""
+
+    precessed_longitude = np.radians(np.asarray(planet_longitude) + (360 - (330 + np.asarray(svp))))
+    planet_latitude = np.radians(planet_latitude)
+    obliquity = np.radians(obliquity)
+    geo_latitude = np.radians(geo_latitude)
+
+    calc_ax = np.cos(precessed_longitude)
+    precessed_declination = np.arcsin(np.sin(planet_latitude) * np.cos(obliquity)
+                                      + np.cos(planet_latitude) * np.sin(obliquity) * np.sin(precessed_longitude))
+    calc_ay = (np.sin(precessed_longitude) * np.cos(obliquity)
+               - np.tan(planet_latitude) * np.sin(obliquity))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calc_ayx_deg = np.degrees(np.arctan(calc_ay / calc_ax))
+        precessed_right_ascension = np.where(calc_ax < 0, calc_ayx_deg + 180,
+                                             np.where(calc_ay < 0, calc_ayx_deg + 360, calc_ayx_deg))
+
+        hour_angle = np.radians(np.asarray(ramc) - precessed_right_ascension)
+        calc_cz = np.degrees(np.arctan(1 / (np.cos(geo_latitude) / np.tan(hour_angle)
+                                            + np.sin(geo_latitude) * np.tan(precessed_declination)
+                                            / np.sin(hour_angle))))
+
+    calc_cx = np.cos(geo_latitude) * np.cos(hour_angle) + np.sin(geo_latitude) * np.tan(precessed_declination)
+    campanus_longitude = np.where(calc_cx < 0, 90 - calc_cz, 270 - calc_cz)
+
+    house = (campanus_longitude / 30).astype(np.int64) + 1
+    return house, campanus_longitude
+
+
+def declination(planet_latitude, planet_longitude, svp, obliquity) -> np.ndarray:
+    """Precessed declination, as calculated inside ChartManager._calculate_prime_vertical_longitude."""
+
+    precessed_longitude = np.radians(np.asarray(planet_longitude) + (360 - (330 + np.asarray(svp))))
+    planet_latitude = np.radians(planet_latitude)
+    obliquity = np.radians(obliquity)
+
+    return np.degrees(np.arcsin(np.sin(planet_latitude) * np.cos(obliquity)
+                                + np.cos(planet_latitude) * np.sin(obliquity) * np.sin(precessed_longitude)))
+
+
+def angle_line_longitudes(right_ascension, declination, greenwich_ramc, geo_latitudes) -> dict:
+    """Geographic longitudes at which a point with the given right ascension and declination is on each angle.
+
+    MC and IC lines are meridians, so those are independent of latitude; Asc and Dsc lines have one longitude per
+    latitude, and are NaN where the point never rises or sets. Longitudes are in [-180, 180).
+    """
+
+    right_ascension = np.asarray(right_ascension, dtype=np.float64)
+    geo_latitudes = np.asarray(geo_latitudes, dtype=np.float64)
+
+    # Hour angle from the meridian at which the point crosses the horizon
+    with np.errstate(invalid='ignore'):
+        semi_arc = np.degrees(np.arccos(-np.tan(np.radians(geo_latitudes)) * np.tan(np.radians(declination))))
+
+    meridian = right_ascension - greenwich_ramc
+    return {
+        'MC': _wrap_longitude(meridian),
+        'IC': _wrap_longitude(meridian + 180),
+        'Asc': _wrap_longitude(meridian - semi_arc),
+        'Dsc': _wrap_longitude(meridian + semi_arc),
+    }
+
+
+def _wrap_longitude(longitude) -> np.ndarray:
+    return ((np.asarray(longitude) + 180) % 360) - 180
+
+
+def harmonic_distance(transit_longitude, natal_longitude, harmonic: int) -> np.ndarray:
+    """How far each transit longitude is past the nearest preceding harmonic of a natal longitude, in [0, 360/h)."""
+
+    return np.mod(np.asarray(transit_longitude) - np.asarray(natal_longitude), 360 / harmonic)
+
+
+def is_past(transit_longitude, natal_longitude, harmonic: int) -> np.ndarray:
+    """Mirrors ChartManager._is_past: past a harmonic position by more than 0 and at most half the harmonic range."""
+
+    distance = harmonic_distance(transit_longitude, natal_longitude, harmonic)
+    return (distance > 0) & (distance <= (360 / harmonic) / 2)
+
+
+def unwrap_longitudes(longitudes) -> np.ndarray:
+    """Continuous longitudes for a body sampled in order, assuming direct motion of under 360 degrees per sample."""
+
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return longitudes[0] + np.concatenate(([0.0], np.cumsum(np.mod(np.diff(longitudes), 360))))
+
+
+def inverse_cubic_interpolation(xs, ys, indexes, targets) -> np.ndarray:
+    """Estimate y where x reaches each target, for targets between xs[index] and xs[index + 1], from a cubic through
+    the four samples around each bracket. xs must be increasing and hold at least four samples."""
+
+    xs, ys = np.asarray(xs), np.asarray(ys)
+    first = np.clip(np.asarray(indexes) - 1, 0, len(xs) - 4)[:, None] + np.arange(4)
+    x, y = xs[first], ys[first]
+    targets = np.asarray(targets)[:, None]
+
+    # Lagrange form, with x as the independent variable
+    estimates = np.zeros(len(first))
+    for j in range(4):
+        others = [k for k in range(4) if k != j]
+        weight = np.prod([(targets[:, 0] - x[:, k]) / (x[:, j] - x[:, k]) for k in others], axis=0)
+        estimates += weight * y[:, j]
+    return estimates
@@ -1,30 +1,113 @@
+import copy
 from logging import getLogger
 
 logger = getLogger(__name__)
 """
 A class created by the ChartManager singleton representing chart data for a given date, time, and location.
+
+Planetary positions, angles and cusps are calculated by the manager on first access and kept until the sidereal
+framework changes, so a chart only pays for the fields that are actually read.
 """
 
+# Lazily calculated field groups, by their jsonify_chart() keys
+CHART_FIELDS = ('ecliptical', 'mundane', 'right_ascension', 'angles', 'cusps')
+
 
 class ChartData:
-    def __init__(self, local_datetime, utc_datetime, julian_day):
+    def __init__(self, local_datetime, utc_datetime, julian_day, manager=None):
         self.local_datetime = local_datetime
         self.utc_datetime = utc_datetime
         self.julian_day = julian_day
+        # Angles and cusps are cast for this moment; only a progressed chart moves it off julian_day
+        self.houses_julian_day = julian_day
         self.tz = local_datetime.tz
         self.sidereal_framework = None
-        self.cusps_longitude = None
-        self.angles_longitude = None
         self.place_name = None
+        self.manager = manager
 
         # Ecliptical longitude, celestial latitude, distance, speed in long, speed in lat, speed in dist
-        self.planets_ecliptic = None
+        self._planets_ecliptic = None
 
         # House placement, decimal longitude (out of 360º)
-        self.planets_mundane = None
+        self._planets_mundane = None
 
         # Decimal longitude (out of 360*)
-        self.planets_right_ascension = None
+        self._planets_right_ascension = None
+
+        self._angles_longitude = None
+        self._cusps_longitude = None
+
+    # ================= Lazily calculated fields ================ #
+
+    @property
+    def planets_ecliptic(self):
+        if self._planets_ecliptic is None and self.manager is not None:
+            self._planets_ecliptic = self.manager._populate_ecliptic_values(self.julian_day)
+        return self._planets_ecliptic
+
+    @planets_ecliptic.setter
+    def planets_ecliptic(self, value):
+        self._planets_ecliptic = value
+
+    @property
+    def planets_mundane(self):
+        if self._planets_mundane is None and self.manager is not None:
+            self._planets_mundane = self.manager._populate_mundane_values(self)
+        return self._planets_mundane
+
+    @planets_mundane.setter
+    def planets_mundane(self, value):
+        self._planets_mundane = value
+
+    @property
+    def planets_right_ascension(self):
+        if self._planets_right_ascension is None and self.manager is not None:
+            self._planets_right_ascension = self.manager._populate_right_ascension_values(self)
+        return self._planets_right_ascension
+
+    @planets_right_ascension.setter
+    def planets_right_ascension(self, value):
+        self._planets_right_ascension = value
+
+    @property
+    def angles_longitude(self):
+        if self._angles_longitude is None and self.manager is not None:
+            self._populate_angles_and_cusps()
+        return self._angles_longitude
+
+    @angles_longitude.setter
+    def angles_longitude(self, value):
+        self._angles_longitude = value
+
+    @property
+    def cusps_longitude(self):
+        if self._cusps_longitude is None and self.manager is not None:
+            self._populate_angles_and_cusps()
+        return self._cusps_longitude
+
+    @cusps_longitude.setter
+    def cusps_longitude(self, value):
+        self._cusps_longitude = value
+
+    def _populate_angles_and_cusps(self):
+        # One houses call yields both
+        self._angles_longitude, self._cusps_longitude = self.manager._populate_ecliptical_angles_and_cusps(self)
+
+    def reset_framework_fields(self):
+        """Drop every field that depends on the sidereal framework, to be recalculated against the current one."""
+
+        self._planets_mundane = None
+        self._planets_right_ascension = None
+        self._angles_longitude = None
+        self._cusps_longitude = None
+
+    def __deepcopy__(self, memo):
+        # Copies share the manager (and its Swiss Ephemeris handle) rather than duplicating it
+        chart = self.__class__.__new__(self.__class__)
+        memo[id(self)] = chart
+        for key, value in self.__dict__.items():
+            setattr(chart, key, value if key == 'manager' else copy.deepcopy(value, memo))
+        return chart
 
     def get_ecliptical_coords(self):
         coords = dict()
@@ -47,13 +130,22 @@ class ChartData:
     def get_cusps_longitude(self):
         return self.cusps_longitude
 
-    def jsonify_chart(self):
+    def jsonify_chart(self, fields=None):
+        """Serialize the chart. fields limits the lazily calculated groups to a subset of CHART_FIELDS, so that
+        unrequested ones are never calculated; None includes all of them."""
+
+        fields = CHART_FIELDS if fields is None else fields
         j = {}
-        j['ecliptical'] = self.get_ecliptical_coords()
-        j['mundane'] = self.get_mundane_coords()
-        j['right_ascension'] = self.get_right_ascension_coords()
-        j['angles'] = self.get_angles_longitude()
-        j['cusps'] = self.get_cusps_longitude()
+        if 'ecliptical' in fields:
+            j['ecliptical'] = self.get_ecliptical_coords()
+        if 'mundane' in fields:
+            j['mundane'] = self.get_mundane_coords()
+        if 'right_ascension' in fields:
+            j['right_ascension'] = self.get_right_ascension_coords()
+        if 'angles' in fields:
+            j['angles'] = self.get_angles_longitude()
+        if 'cusps' in fields:
+            j['cusps'] = self.get_cusps_longitude()
         j['local_datetime'] = str(self.local_datetime)
         j['tz'] = self.tz.name or ''
         j['utc_datetime'] = str(self.utc_datetime)
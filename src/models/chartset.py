@@ -0,0 +1,228 @@
+import os
+from logging import getLogger
+from typing import Iterable, List
+
+import numpy as np
+import pendulum
+
+from src import settings
+from src.models.chartdata import ChartData, CHART_FIELDS
+
+logger = getLogger(__name__)
+"""
+Many charts held as contiguous NumPy columns, one row per chart, for analytics over large numbers of charts.
+
+The columns are those of ChartManager.chart_columns(), which is also what the bulk chart processor writes: framework
+scalars of shape (N,), per-planet values of shape (N, planets), cusps (N, 12) and angles (N, 3). Any other column with
+one row per chart (such as the bulk processor's row and id) is carried along. Slicing returns a ChartSet of views
+into the same columns; indexing one chart returns a ChartRow with ChartData's accessors. A set saved to a directory
+keeps one .npy file per column and is reopened memory-mapped, so opening a million charts reads nothing until the
+columns are used.
+"""
+
+FRAMEWORK_COLUMNS = ('julian_day', 'geo_longitude', 'geo_latitude', 'lst', 'ramc', 'svp', 'obliquity')
+PLANET_COLUMNS = ('ecliptic_longitude', 'ecliptic_latitude', 'ecliptic_speed', 'house', 'mundane',
+                  'right_ascension')
+CUSPS = tuple(str(number) for number in range(1, 13))
+ANGLES = ('Asc', 'MC', 'Eq Asc')
+
+
+class ChartSet:
+    def __init__(self, columns: dict, planets: List[str] = None):
+        self.planets = list(planets or settings.INT_TO_STRING_PLANET_MAP)
+        self.columns = columns
+
+        missing = [name for name in FRAMEWORK_COLUMNS + PLANET_COLUMNS + ('cusps', 'angles') if name not in columns]
+        if missing:
+            raise ValueError(f'Chart set is missing columns: {", ".join(missing)}')
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('Chart set columns have different lengths')
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'ChartSet':
+        """Wrap the output of ChartManager.chart_columns(), or one part written by the bulk chart processor."""
+
+        columns = dict(columns)
+        planets = [str(planet) for planet in columns.pop('planets', settings.INT_TO_STRING_PLANET_MAP)]
+        return cls(columns, planets)
+
+    @classmethod
+    def from_charts(cls, charts: List[ChartData]) -> 'ChartSet':
+        """Collect existing ChartData instances into columns; this calculates any of their fields not yet read."""
+
+        planets = list(settings.INT_TO_STRING_PLANET_MAP)
+        frameworks = [chart.sidereal_framework for chart in charts]
+        columns = {
+            'julian_day': np.array([chart.julian_day for chart in charts], dtype=np.float64),
+            'geo_longitude': np.array([framework.geo_longitude for framework in frameworks], dtype=np.float64),
+            'geo_latitude': np.array([framework.geo_latitude for framework in frameworks], dtype=np.float64),
+            'lst': np.array([framework.LST for framework in frameworks], dtype=np.float64),
+            'ramc': np.array([framework.ramc for framework in frameworks], dtype=np.float64),
+            'svp': np.array([framework.svp for framework in frameworks], dtype=np.float64),
+            'obliquity': np.array([framework.obliquity for framework in frameworks], dtype=np.float64),
+            'ecliptic_longitude': np.array([[chart.planets_ecliptic[name][0] for name in planets] for chart in charts],
+                                           dtype=np.float64),
+            'ecliptic_latitude': np.array([[chart.planets_ecliptic[name][1] for name in planets] for chart in charts],
+                                          dtype=np.float64),
+            'ecliptic_speed': np.array([[chart.planets_ecliptic[name][3] for name in planets] for chart in charts],
+                                       dtype=np.float64),
+            'house': np.array([[chart.planets_mundane[name][0] for name in planets] for chart in charts],
+                              dtype=np.int64),
+            'mundane': np.array([[chart.planets_mundane[name][1] for name in planets] for chart in charts],
+                                dtype=np.float64),
+            'right_ascension': np.array([[chart.planets_right_ascension[name] for name in planets]
+                                         for chart in charts], dtype=np.float64),
+            'cusps': np.array([[chart.cusps_longitude[cusp] for cusp in CUSPS] for chart in charts],
+                              dtype=np.float64),
+            'angles': np.array([[chart.angles_longitude[angle] for angle in ANGLES] for chart in charts],
+                               dtype=np.float64),
+        }
+        return cls({name: column.reshape((len(charts),) + _get_row_shape(name, planets))
+                    for name, column in columns.items()}, planets)
+
+    @classmethod
+    def concatenate(cls, chart_sets: Iterable['ChartSet']) -> 'ChartSet':
+        """Copy several chart sets with the same planets and columns into one."""
+
+        chart_sets = list(chart_sets)
+        if not chart_sets:
+            raise ValueError('No chart sets to concatenate')
+        names = list(chart_sets[0].columns)
+        return cls({name: np.concatenate([chart_set.columns[name] for chart_set in chart_sets]) for name in names},
+                   chart_sets[0].planets)
+
+    # ================= Persistence ================ #
+
+    def save(self, path: str) -> str:
+        """Save to a directory of .npy files, one per column, which load() memory-maps; or, if path ends in .npz,
+        to a single archive, which load() reads into memory."""
+
+        if path.endswith('.npz'):
+            np.savez(path, planets=np.array(self.planets), **self.columns)
+            return path
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'planets.npy'), np.array(self.planets))
+        for name, column in self.columns.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(column))
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r') -> 'ChartSet':
+        """Open a chart set written by save(). Columns in a directory are memory-mapped with mmap_mode (None reads
+        them into memory); a directory of bulk chart processor .npz parts is concatenated in memory."""
+
+        if path.endswith('.npz'):
+            with np.load(path) as archive:
+                return cls.from_columns({name: archive[name] for name in archive.files})
+
+        file_names = sorted(os.listdir(path))
+        if 'planets.npy' not in file_names:
+            parts = [os.path.join(path, file_name) for file_name in file_names
+                     if file_name.startswith('part-') and file_name.endswith('.npz')]
+            if not parts:
+                raise ValueError(f'{path} holds neither a saved chart set nor bulk chart output')
+            return cls.concatenate(cls.load(part) for part in parts)
+
+        planets = [str(planet) for planet in np.load(os.path.join(path, 'planets.npy'))]
+        columns = {file_name[:-len('.npy')]: np.load(os.path.join(path, file_name), mmap_mode=mmap_mode)
+                   for file_name in file_names if file_name.endswith('.npy') and file_name != 'planets.npy'}
+        return cls(columns, planets)
+
+    # ================= Access ================ #
+
+    def __len__(self) -> int:
+        return len(self.columns['julian_day'])
+
+    def __getitem__(self, key):
+        """An int gives one chart's ChartRow; a slice gives a ChartSet of views, and an index array or boolean mask
+        gives a ChartSet of copies, as with NumPy indexing."""
+
+        if isinstance(key, (int, np.integer)):
+            if not -len(self) <= key < len(self):
+                raise IndexError(f'Chart index {key} out of range for {len(self)} charts')
+            return ChartRow(self, int(key) % len(self))
+        return ChartSet({name: column[key] for name, column in self.columns.items()}, self.planets)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ChartRow(self, index)
+
+    def get_planet_column(self, name: str, planet: str) -> np.ndarray:
+        """One planet's values from a per-planet column, such as get_planet_column('mundane', 'Moon')."""
+
+        return self.columns[name][:, self.planets.index(planet)]
+
+
+class ChartRow:
+    """One chart in a ChartSet, read through the same accessors as ChartData."""
+
+    def __init__(self, chart_set: ChartSet, index: int):
+        self.chart_set = chart_set
+        self.index = index
+
+    def __getitem__(self, name: str):
+        return self.chart_set.columns[name][self.index]
+
+    @property
+    def julian_day(self) -> float:
+        return float(self['julian_day'])
+
+    @property
+    def utc_datetime(self) -> pendulum.datetime:
+        return pendulum.from_timestamp(round((self.julian_day - 2440587.5) * 86400))
+
+    def get_ecliptical_coords(self) -> dict:
+        return self._get_planet_values('ecliptic_longitude')
+
+    def get_mundane_coords(self) -> dict:
+        return self._get_planet_values('mundane')
+
+    def get_right_ascension_coords(self) -> dict:
+        return self._get_planet_values('right_ascension')
+
+    def get_angles_longitude(self) -> dict:
+        return dict(zip(ANGLES, self['angles'].tolist()))
+
+    def get_cusps_longitude(self) -> dict:
+        return dict(zip(CUSPS, self['cusps'].tolist()))
+
+    def jsonify_chart(self, fields=None) -> dict:
+        """Serialize the chart as ChartData.jsonify_chart() does, less the local time and place, which a chart set
+        doesn't keep."""
+
+        fields = CHART_FIELDS if fields is None else fields
+        j = {}
+        if 'ecliptical' in fields:
+            j['ecliptical'] = self.get_ecliptical_coords()
+        if 'mundane' in fields:
+            j['mundane'] = self.get_mundane_coords()
+        if 'right_ascension' in fields:
+            j['right_ascension'] = self.get_right_ascension_coords()
+        if 'angles' in fields:
+            j['angles'] = self.get_angles_longitude()
+        if 'cusps' in fields:
+            j['cusps'] = self.get_cusps_longitude()
+        j['utc_datetime'] = str(self.utc_datetime)
+        j['julian_day'] = self.julian_day
+        j['lst'] = float(self['lst'])
+        j['ramc'] = float(self['ramc'])
+        j['obliquity'] = float(self['obliquity'])
+        j['svp'] = float(self['svp'])
+        j['longitude'] = float(self['geo_longitude'])
+        j['latitude'] = float(self['geo_latitude'])
+        return j
+
+    def _get_planet_values(self, name: str) -> dict:
+        return dict(zip(self.chart_set.planets, self[name].tolist()))
+
+
+def _get_row_shape(name: str, planets: list) -> tuple:
+    if name in PLANET_COLUMNS:
+        return len(planets),
+    if name == 'cusps':
+        return len(CUSPS),
+    if name == 'angles':
+        return len(ANGLES),
+    return ()
@@ -18,12 +18,133 @@ else:  # Development
 MAPQUEST_KEY = os.environ.get('MAPQUEST_KEY')
 MAPQUEST_ENDPOINT = os.environ.get('MAPQUEST_ENDPOINT')
 
+# Instrumentation
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_PREFIX = 'nova'
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+
+# Sent with GET /radix and /relocate responses, which carry ETags; revalidated with If-None-Match once stale
+HTTP_CACHE_CONTROL = os.environ.get('HTTP_CACHE_CONTROL', 'public, max-age=86400')
+
+# Async (ASGI) serving mode
+ASYNC_PORT = int(os.environ.get('ASYNC_PORT', 5000))
+ASYNC_WORKER_PROCESSES = int(os.environ.get('ASYNC_WORKER_PROCESSES', os.cpu_count() or 2))
+ASYNC_MAX_PENDING_COMPUTE = int(os.environ.get('ASYNC_MAX_PENDING_COMPUTE', 64))  # Queued + running pool tasks
+ASYNC_IO_THREADS = int(os.environ.get('ASYNC_IO_THREADS', 16))  # Threads for blocking geocoder calls
+ASYNC_SHUTDOWN_TIMEOUT = 30  # Seconds to wait for in-flight requests on shutdown
+
+# Live transit stream
+TRANSIT_STREAM_TICK_SECONDS = float(os.environ.get('TRANSIT_STREAM_TICK_SECONDS', 5))  # Between pushed updates
+TRANSIT_STREAM_ERROR_BUDGET = 0.01  # Degrees of extrapolation error tolerated before resyncing more often
+TRANSIT_STREAM_MIN_RESYNC_SECONDS = 60
+TRANSIT_STREAM_MAX_RESYNC_SECONDS = 6 * 3600
+TRANSIT_STREAM_IDLE_SECONDS = 30  # Keep a location's stream running this long after its last subscriber leaves
+
+# Admission control (requests are sorted into a cheap and an expensive lane by their estimated compute seconds)
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_CHEAP_COST_SECONDS = 0.05  # Requests estimated to take longer than this use the expensive lane
+ADMISSION_CHEAP_SLOTS = int(os.environ.get('ADMISSION_CHEAP_SLOTS', 4))  # Requests running at once, per lane
+ADMISSION_EXPENSIVE_SLOTS = int(os.environ.get('ADMISSION_EXPENSIVE_SLOTS', 1))
+ADMISSION_CHEAP_MAX_QUEUED_SECONDS = 1  # Estimated work waiting in a lane beyond which requests are shed with 429
+ADMISSION_EXPENSIVE_MAX_QUEUED_SECONDS = 30
+ADMISSION_CHART_SECONDS = 0.0005  # Estimated cost of one chart
+# Estimated cost of one return and its charts, Sun through Pluto; for Mercury onward, at harmonic 1
+ADMISSION_RETURN_SECONDS = [0.002, 0.002, 0.015, 0.01, 0.02, 0.09, 0.2, 0.4, 0.8, 1.5]
+ADMISSION_MIN_RETURN_SECONDS = 0.001  # Floor for a return of Mercury onward at a high harmonic
+SOLUNAR_MAX_RETURN_QUANTITY = 1000  # Longer return lists have to go through /jobs/solunar
+
+# Background jobs (long return lists calculated in chunks outside of the request)
+# SQLite database file; jobs are only kept in memory if unset, which only works with a single worker process
+JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH')
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+JOB_CHUNK_RETURNS = 50  # Returns calculated before a job goes back to the end of the queue
+JOB_MAX_RETURN_QUANTITY = 20000
+JOB_RESULT_TTL_SECONDS = int(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))  # After a job finishes
+JOB_RESULTS_PAGE_SIZE = 500  # Default limit on the results returned by one poll
+JOB_PURGE_INTERVAL_SECONDS = 60  # Between checks for expired and orphaned jobs while the workers are idle
+JOB_LEASE_SECONDS = 600  # A worker process's hold on a job, renewed each chunk; must outlast the slowest chunk
+JOB_STREAM_KEEPALIVE_SECONDS = 15
+
+# Bulk chart processing
+BULK_CHUNK_RECORDS = 2000  # Charts calculated per task and written per output part
+BULK_WORKER_PROCESSES = int(os.environ.get('BULK_WORKER_PROCESSES', os.cpu_count() or 2))
+
+# Timezone resolution
+TZ_GRID_CELL_DEGREES = 0.1  # Edge length of a cached coordinate cell
+TZ_GRID_MAX_CELLS = 100000
+TZ_EXACT_CACHE_SIZE = 10000  # Exact-coordinate lookups for cells that straddle a timezone boundary
+
+# Geocoding
+GEOCODE_CACHE_SIZE = 10000  # Locations whose coordinates, timezone and place name are kept
+
+# Cache snapshots
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')  # Written on graceful shutdown and read after restart; unset disables
+SNAPSHOT_MAX_BYTES = int(os.environ.get('SNAPSHOT_MAX_BYTES', 16 * 1024 * 1024))
+
 # DLL parameters
 SIDEREALMODE = c_int32(64 * 1024)
+SIDEREALMODE_WITH_SPEED = c_int32(64 * 1024 + 256)  # Also fills in daily speeds, which are 0 without SEFLG_SPEED
 CAMPANUS = c_int(67)
 EPHEMERIS_PATH = 'swe/ephemeris/'
 SWISSEPH_LIB_PATH = 'astronova_api/src/dll_tools/swe/dll'
 
+# Crossing index (precomputed Julian days at which bodies cross each multiple of a resolution in degrees)
+CROSSING_INDEX_PATH = 'swe/index/'
+CROSSING_INDEX_RESOLUTION = 1.0
+CROSSING_INDEX_SAMPLE_DAYS = [0.5, 0.05]  # Sampling interval while building; Sun, Moon
+CROSSING_INDEX_START = '1900-01-01'
+CROSSING_INDEX_END = '2100-01-01'
+CROSSING_INDEX_REFINE_SECONDS = 60  # Initial half-width of the window searched around an interpolated crossing
+
+# Station index (Julian days at which Mercury to Pluto turn retrograde or direct)
+STATION_INDEX_PATH = 'swe/stations/'
+STATION_INDEX_SAMPLE_DAYS = 1  # Speed sampling interval while building; shorter than any retrograde or direct phase
+STATION_INDEX_RESOLUTION_DAYS = 1e-6
+STATION_INDEX_START = '1900-01-01'
+STATION_INDEX_END = '2100-01-01'
+# Longest step between samples of a monotonic stretch, by body; each keeps the motion per step well under 180 degrees
+STATION_RETURN_PIECE_DAYS = [90, 6, 30, 90, 120, 365, 365, 365, 365, 365]
+STATION_RETURN_SCAN_DAYS = 366  # Span searched at a time for further returns
+STATION_RETURN_MAX_SCAN_DAYS = 366 * 250  # Longer than Pluto's orbit, so that every harmonic has a return
+STATION_RETURN_TOLERANCE_DAYS = 1e-7  # Newton refinement stops at steps under ~0.01 seconds
+
+# Ingress index (every crossing of each multiple of a resolution in degrees, by all ten bodies, in time order)
+INGRESS_INDEX_PATH = 'swe/ingresses/'
+INGRESS_INDEX_RESOLUTION = 1.0  # Must divide 30, so that sign ingresses are boundaries
+INGRESS_INDEX_START = '1900-01-01'
+INGRESS_INDEX_END = '2100-01-01'
+
+# Return precision tiers, with the resolution each refines returns to in seconds. Crossing-index returns are past
+# the exact return by less than the resolution; searched returns can be up to two units of the tier either side.
+RETURN_PRECISIONS = {'seconds': 1, 'minutes': 60, 'hours': 3600}
+
+# Sample store (longitudes on a fixed Julian day grid, memory-mapped by every process on the host)
+SAMPLE_STORE_PATH = 'swe/samples/'
+SAMPLE_STORE_STEP_DAYS = [0.5, 0.05]  # Sun, Moon
+SAMPLE_STORE_START = '1900-01-01'
+SAMPLE_STORE_END = '2100-01-01'
+
+# Batched return search (one body sampled once for many radix longitudes)
+BATCH_RETURN_SAMPLE_DAYS = [2, 0.25]  # Upper bound on the shared sampling interval; Sun, Moon
+BATCH_RETURN_MAX_CELLS = 4000000  # Samples x radix longitudes tested at once
+BATCH_RETURN_REFINE_SECONDS = 1  # Initial half-width of the window searched around an interpolated return
+
+# Lunar phase events (times at which the Moon's elongation from the Sun reaches a multiple of 360 / harmonic)
+PHASE_EVENT_SAMPLE_DAYS = 1  # Sun and Moon sampling interval; the elongation moves 10 to 15 degrees a day
+PHASE_EVENT_NEWTON_STEPS = 1  # Vectorized Newton steps from the interpolated estimates
+PHASE_EVENT_REFINE_SECONDS = 2  # Initial half-width of the window bisected for any event the Newton steps miss
+
+# Angularity timeline (times at which planets reach the angles at a location, in prime vertical longitude)
+PRIME_VERTICAL_ANGLES = {0: 'Asc', 90: 'IC', 180: 'Dsc', 270: 'MC'}
+ANGULARITY_SAMPLE_MINUTES = 10  # RAMC sampling interval; planets move about 2.5 degrees of PVL in 10 minutes
+ANGULARITY_EPHEMERIS_HOURS = 6  # Planets, SVP and obliquity are calculated this often and interpolated between
+ANGULARITY_CHUNK_DAYS = 30  # Days sampled at once, which bounds memory for long ranges
+ANGULARITY_REFINE_STEPS = 30  # Most vectorized secant steps refining a crossing against exact positions
+ANGULARITY_REFINE_SECONDS = 0.05  # Secant steps stop once they move a crossing by less than this
+# Refined crossings further than this from the angle are discontinuities in PVL rather than crossings. It is wide,
+# since PVL can sweep several degrees a second as a planet grazes the horizon near its north or south point.
+ANGULARITY_TOLERANCE_DEGREES = 10
+
 # Progressions
 Q2 = 0.002737909  # MikeStar lists this as 0.0027378030919862
 TERTIARY_RATE = 0.0366009950851544
@@ -0,0 +1,228 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import Callable
+
+from src import settings
+
+logger = getLogger(__name__)
+
+"""
+Lightweight counters and timers for hot paths, rendered in the Prometheus text format.
+
+When disabled, increment() and observe() return immediately and timer()/phase() hand back a shared no-op context
+manager, so instrumented code costs one attribute check per call.
+
+Worker processes hand what they recorded for a task back with drain(), and the serving process adds it to its own
+registry with merge(), so that /metrics and Server-Timing cover work done in a process pool.
+"""
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics: 'Metrics', name: str, labels: tuple, phase: str = None):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.phase = phase
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.observe(self.name, elapsed, self.labels)
+        if self.phase is not None:
+            self.metrics._record_phase(self.phase, elapsed)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled: bool = settings.METRICS_ENABLED, prefix: str = settings.METRICS_PREFIX):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = OrderedDict()  # (name, labels) -> value
+        self._timers = OrderedDict()  # (name, labels) -> [count, total seconds]
+        self._collectors = []  # Callables returning {(name, labels): value} gauges at render time
+        self._phases = contextvars.ContextVar('metrics_phases', default=None)  # Per thread, or per asyncio task
+
+    # =============================================================================================================== #
+    # =========================================   Recording functions   ============================================= #
+    # =============================================================================================================== #
+
+    def increment(self, name: str, labels: tuple = (), value: float = 1) -> None:
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, labels: tuple = ()) -> None:
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                self._timers[key] = [1, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+
+    def timer(self, name: str, labels: tuple = ()):
+        """Context manager that records the duration of its block."""
+
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def phase(self, phase: str):
+        """Context manager that times a request phase, both globally and for the Server-Timing header."""
+
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, 'phase_seconds', (('phase', phase),), phase=phase)
+
+    def instrument(self, function: Callable, name: str) -> Callable:
+        """Wrap a function to count and time its calls. Returns the function unchanged when disabled."""
+
+        if not self.enabled:
+            return function
+
+        labels = (('function', name),)
+        perf_counter = time.perf_counter
+
+        def instrumented(*args):
+            started = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self.observe('swe_call_seconds', perf_counter() - started, labels)
+
+        instrumented.__doc__ = function.__doc__
+        return instrumented
+
+    def get_count(self, name: str) -> float:
+        """Total of a counter, or number of observations of a timer, across all of its labels."""
+
+        with self._lock:
+            total = sum(value for (key, _), value in self._counters.items() if key == name)
+            total += sum(timer[0] for (key, _), timer in self._timers.items() if key == name)
+        return total
+
+    def register_collector(self, collector: Callable[[], dict]) -> None:
+        """Register a callable that reports gauges, as {(name, labels): value}, whenever metrics are rendered."""
+
+        self._collectors.append(collector)
+
+    # =============================================================================================================== #
+    # ======================================   Per-request phase timings   =========================================== #
+    # =============================================================================================================== #
+
+    def start_request(self) -> None:
+        self._phases.set(OrderedDict())
+
+    def get_server_timing(self) -> str:
+        """Render the current request's phase timings as a Server-Timing header value."""
+
+        phases = self._phases.get() or {}
+        return ', '.join(f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in phases.items())
+
+    def _record_phase(self, phase: str, seconds: float) -> None:
+        phases = self._phases.get()
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0) + seconds
+
+    # =============================================================================================================== #
+    # =======================================   Merging across processes   ========================================== #
+    # =============================================================================================================== #
+
+    def drain(self) -> dict:
+        """Take the counters and timers recorded since the last drain, and the current request's phase timings, as a
+        picklable dict for merge() in another process. Counters and timers start again from zero."""
+
+        with self._lock:
+            counters = list(self._counters.items())
+            timers = [(key, list(value)) for key, value in self._timers.items()]
+            self._counters.clear()
+            self._timers.clear()
+        return {'counters': counters, 'timers': timers, 'phases': list((self._phases.get() or {}).items())}
+
+    def merge(self, deltas: dict) -> None:
+        """Add another process's drain() to this registry, and its phase timings to the current request's."""
+
+        if not self.enabled or not deltas:
+            return
+        with self._lock:
+            for key, value in deltas['counters']:
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (count, total) in deltas['timers']:
+                timer = self._timers.setdefault(key, [0, 0])
+                timer[0] += count
+                timer[1] += total
+        for phase, seconds in deltas['phases']:
+            self._record_phase(phase, seconds)
+
+    # =============================================================================================================== #
+    # ============================================   Rendering   ==================================================== #
+    # =============================================================================================================== #
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = list(self._counters.items())
+            timers = [(key, list(value)) for key, value in self._timers.items()]
+
+        gauges = []
+        for collector in self._collectors:
+            try:
+                gauges.extend(collector().items())
+            except Exception:
+                logger.exception('Error while collecting metrics:')
+
+        lines = []
+        self._render_family(lines, counters, 'counter', lambda name: f'{name}_total')
+        self._render_family(lines, gauges, 'gauge', lambda name: name)
+
+        typed = set()
+        for (name, labels), (count, total) in sorted(timers, key=lambda sample: sample[0][0]):
+            full_name = f'{self.prefix}_{name}'
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f'# TYPE {full_name} summary')
+            lines.append(f'{full_name}_count{self._format_labels(labels)} {count}')
+            lines.append(f'{full_name}_sum{self._format_labels(labels)} {total:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_family(self, lines: list, samples: list, metric_type: str, format_name: Callable) -> None:
+        typed = set()
+        for (name, labels), value in sorted(samples, key=lambda sample: sample[0][0]):
+            full_name = f'{self.prefix}_{format_name(name)}'
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f'# TYPE {full_name} {metric_type}')
+            lines.append(f'{full_name}{self._format_labels(labels)} {value}')
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+metrics = Metrics()
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from logging import getLogger
+from typing import Awaitable, Callable, Hashable
+
+from src.utils.metrics import metrics
+
+logger = getLogger(__name__)
+
+"""
+Request coalescing: while a computation for a key is in flight, further callers with the same key wait for it and
+share its result (or its exception) instead of repeating the work.
+
+Coalescing counts are recorded as nova_singleflight_calls_total, labelled with the group and with role="leader" for
+callers that ran the computation or role="follower" for callers that shared one.
+"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, group: str):
+        self.group = group
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, function: Callable, *args, copy_result: Callable = None):
+        """Call function(*args), unless a call for key is already in flight, in which case wait for that one.
+
+        Pass copy_result for mutable results; every caller, the one that ran the computation included, then gets its
+        own copy, so that none of them can change what the others see."""
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            metrics.increment('singleflight_calls', (('group', self.group), ('role', 'leader')))
+            try:
+                call.result = function(*args)
+            except Exception as ex:
+                call.error = ex
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            metrics.increment('singleflight_calls', (('group', self.group), ('role', 'follower')))
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return copy_result(call.result) if copy_result else call.result
+
+    def get_in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self, group: str):
+        self.group = group
+        self._calls = {}
+
+    async def do(self, key: Hashable, function: Callable[..., Awaitable], *args):
+        future = self._calls.get(key)
+        if future is not None:
+            metrics.increment('singleflight_calls', (('group', self.group), ('role', 'follower')))
+            # Shielded, so a follower's client disconnecting doesn't cancel the shared computation
+            return await asyncio.shield(future)
+
+        metrics.increment('singleflight_calls', (('group', self.group), ('role', 'leader')))
+        future = asyncio.ensure_future(function(*args))
+        self._calls[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def get_in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+import zlib
+from logging import getLogger
+from typing import Callable
+
+from src import settings
+
+logger = getLogger(__name__)
+
+"""
+Snapshots of the app's in-memory caches, written on graceful shutdown and read back after a restart, so that a new
+deploy doesn't start cold.
+
+A cache registers a function returning its entries, most valuable first, and on its first lookup asks for the
+snapshot's section with restore(). Nothing is read at startup: the file is opened and checked on the first restore(),
+and each section is only decompressed when its cache asks for it. Snapshots written by another VERSION_NUMBER are
+ignored. The file is bounded by settings.SNAPSHOT_MAX_BYTES; the largest sections give up their least valuable
+entries until it fits.
+"""
+
+MAGIC = b'NOVASNAP'
+FORMAT_VERSION = 1
+
+
+class SnapshotManager:
+    def __init__(self, path: str = settings.SNAPSHOT_PATH, max_bytes: int = settings.SNAPSHOT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._providers = {}
+        self._lock = threading.Lock()
+        self._sections = None  # Section name -> compressed entries, once the file has been read
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def register(self, name: str, provider: Callable[[], list]) -> None:
+        """Include a cache in snapshots; provider returns its entries as JSON-serializable lists."""
+
+        self._providers[name] = provider
+
+    def restore(self, name: str) -> list:
+        """Entries for a cache from the last snapshot, most valuable first; empty if there is none."""
+
+        if not self.enabled:
+            return []
+        with self._lock:
+            if self._sections is None:
+                self._sections = self._read()
+            compressed = self._sections.pop(name, None)
+        return json.loads(zlib.decompress(compressed).decode('utf-8')) if compressed else []
+
+    def save(self) -> None:
+        """Write every registered cache to the snapshot file, replacing the previous snapshot."""
+
+        if not self.enabled:
+            return
+        started = time.perf_counter()
+        entries = {name: provider() for name, provider in self._providers.items()}
+        sections = {name: _compress(section) for name, section in entries.items()}
+
+        # Halve the largest section until the whole file fits
+        while sum(len(section) for section in sections.values()) > self.max_bytes:
+            shrinkable = [section_name for section_name in sections if entries[section_name]]
+            if not shrinkable:
+                logger.warning(f'Not writing cache snapshot {self.path}; even with no entries it would exceed '
+                               f'{self.max_bytes} bytes.')
+                return
+            name = max(shrinkable, key=lambda section_name: len(sections[section_name]))
+            entries[name] = entries[name][:len(entries[name]) // 2]
+            sections[name] = _compress(entries[name])
+
+        header = json.dumps({
+            'format': FORMAT_VERSION,
+            'version': settings.VERSION_NUMBER,
+            'created': time.time(),
+            'sections': {name: len(section) for name, section in sections.items()},
+        }).encode('utf-8')
+
+        # Renamed into place, so that a process starting meanwhile reads either the old snapshot or the new one
+        temporary_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(temporary_path, 'wb') as f:
+                f.write(MAGIC + b'\n' + header + b'\n')
+                for section in sections.values():
+                    f.write(section)
+            os.replace(temporary_path, self.path)
+        except OSError:
+            logger.exception(f'Error while writing cache snapshot to {self.path}:')
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return
+
+        sizes = ', '.join(f'{name} {len(section)} bytes' for name, section in sections.items())
+        logger.info(f'Wrote cache snapshot {self.path} ({sizes}) in {time.perf_counter() - started:.2f}s')
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'rb') as f:
+                if f.readline().rstrip(b'\n') != MAGIC:
+                    logger.warning(f'Ignoring cache snapshot {self.path}; it is not a snapshot file.')
+                    return {}
+                header = json.loads(f.readline().decode('utf-8'))
+                if header['format'] != FORMAT_VERSION or header['version'] != settings.VERSION_NUMBER:
+                    logger.warning(f'Ignoring cache snapshot {self.path}; it was written by version '
+                                   f'{header["version"]}.')
+                    return {}
+                return {name: f.read(length) for name, length in header['sections'].items()}
+        except (OSError, ValueError, KeyError):
+            logger.exception(f'Error while reading cache snapshot {self.path}:')
+            return {}
+
+
+def _compress(entries: list) -> bytes:
+    return zlib.compress(json.dumps(entries, separators=(',', ':')).encode('utf-8'))
+
+
+snapshots = SnapshotManager()
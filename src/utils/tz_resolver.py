@@ -0,0 +1,230 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from logging import getLogger
+from math import floor
+
+import pendulum
+
+from etc.timezones import TIMEZONES
+from src import settings
+from src.utils.metrics import metrics
+
+logger = getLogger(__name__)
+
+"""
+Resolves IANA timezone names from geographic coordinates.
+
+Results are cached on a grid of quantized coordinate cells. A cell is answered from the cache for any coordinate
+inside it only when TimezoneFinder's precomputed shortcut data proves the whole cell has a single zone: every
+shortcut hexagon overlapping the cell must hold that one zone. Any other cell falls back to exact (but still cached)
+lookups, as does every cell with finders too old to have unique-zone data. The underlying TimezoneFinder is only
+instantiated on the first cache miss.
+"""
+
+_MIXED_CELL = object()  # Sentinel for cells that may contain more than one timezone
+_CELL_PADDING = 0.01  # Fraction of a cell added around it, so that hexagons grazing its edges count as overlapping
+_HIT_LABELS = (('cache', 'timezone'), ('result', 'hit'))
+_MISS_LABELS = (('cache', 'timezone'), ('result', 'miss'))
+
+
+class TimezoneResolver:
+    def __init__(self, cell_degrees: float = settings.TZ_GRID_CELL_DEGREES,
+                 max_cells: int = settings.TZ_GRID_MAX_CELLS,
+                 exact_cache_size: int = settings.TZ_EXACT_CACHE_SIZE):
+        self.cell_degrees = cell_degrees
+        self.max_cells = max_cells
+        self.exact_cache_size = exact_cache_size
+
+        self._finder = None
+        self._shortcut_resolution = None  # H3 resolution of the finder's shortcuts; None if it has no unique zones
+        self._lock = threading.Lock()
+        self._finder_lock = threading.Lock()
+        self._cells = OrderedDict()  # (lat index, lng index) -> zone name or _MIXED_CELL
+        self._exact = OrderedDict()  # (lat, lng) -> zone name, only for mixed cells
+
+        self.hits = 0
+        self.misses = 0
+
+    def timezone_at(self, lng: float, lat: float) -> str:
+        """Get the timezone name for a coordinate."""
+
+        cell = self._get_cell(lng, lat)
+
+        with self._lock:
+            zone = self._cells.get(cell)
+            if zone is not None:
+                self._cells.move_to_end(cell)
+                if zone is not _MIXED_CELL:
+                    self.hits += 1
+                    metrics.increment('cache_lookups', _HIT_LABELS)
+                    return zone
+
+                exact = self._exact.get((lat, lng))
+                if exact is not None:
+                    self._exact.move_to_end((lat, lng))
+                    self.hits += 1
+                    metrics.increment('cache_lookups', _HIT_LABELS)
+                    return exact
+
+            self.misses += 1
+            metrics.increment('cache_lookups', _MISS_LABELS)
+
+        tz = self._lookup(lng, lat)
+        if not is_known_timezone(tz):
+            # Passed on uncached, for the caller to handle
+            logger.warning(f'Unrecognized timezone {tz} at longitude {lng}, latitude {lat}')
+            return tz
+
+        if zone is None:
+            zone = self._classify_cell(cell)
+            if zone != tz:
+                zone = _MIXED_CELL
+
+        with self._lock:
+            self._store(self._cells, cell, zone, self.max_cells)
+            if zone is _MIXED_CELL:
+                self._store(self._exact, (lat, lng), tz, self.exact_cache_size)
+
+        return tz
+
+    def preload(self) -> None:
+        """Instantiate the underlying TimezoneFinder ahead of the first lookup."""
+
+        self._get_finder()
+
+    def get_snapshot(self) -> list:
+        """Cached cells, then exact lookups, as JSON-serializable entries, most recently used first."""
+
+        with self._lock:
+            cells = [['cell', lat_index, lng_index, None if zone is _MIXED_CELL else zone]
+                     for (lat_index, lng_index), zone in reversed(self._cells.items())]
+            exact = [['exact', lat, lng, zone] for (lat, lng), zone in reversed(self._exact.items())]
+        return cells + exact
+
+    def restore(self, snapshot: list) -> None:
+        """Fill the caches from get_snapshot()'s entries; anything cached since startup is kept as more recent."""
+
+        if not snapshot:
+            return
+        cells = [((lat_index, lng_index), _MIXED_CELL if zone is None else zone)
+                 for kind, lat_index, lng_index, zone in snapshot if kind == 'cell']
+        exact = [((lat, lng), zone) for kind, lat, lng, zone in snapshot if kind == 'exact']
+        with self._lock:
+            self._cells = self._merge(self._cells, cells, self.max_cells)
+            self._exact = self._merge(self._exact, exact, self.exact_cache_size)
+        logger.info(f'Restored {len(cells)} timezone cells and {len(exact)} exact lookups from snapshot.')
+
+    def get_stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cells': len(self._cells),
+            'exact': len(self._exact),
+        }
+
+    # =============================================================================================================== #
+    # =======================================   Internal functions   ================================================ #
+    # =============================================================================================================== #
+
+    def _get_finder(self):
+        if self._finder is None:
+            with self._finder_lock:
+                if self._finder is None:
+                    # Deferred so that processes which never miss the cache never load the timezone polygons
+                    from timezonefinder import TimezoneFinder
+                    finder = TimezoneFinder()
+                    self._shortcut_resolution = _get_shortcut_resolution(finder)
+                    if self._shortcut_resolution is None:
+                        logger.info('This TimezoneFinder has no unique-zone shortcut data; '
+                                    'caching exact timezone lookups only.')
+                    self._finder = finder
+                    logger.info('Loaded timezone boundary data.')
+        return self._finder
+
+    def _get_cell(self, lng: float, lat: float) -> tuple:
+        return floor(lat / self.cell_degrees), floor(lng / self.cell_degrees)
+
+    def _lookup(self, lng: float, lat: float) -> str:
+        tz = self._get_finder().timezone_at(lng=lng, lat=lat)
+        if tz is None:
+            # Open ocean; use the nautical timezone for the meridian. Note that Etc/GMT signs are inverted.
+            offset = int(round(lng / 15))
+            tz = 'Etc/GMT' if offset == 0 else f'Etc/GMT{-offset:+d}'
+        return tz
+
+    def _classify_cell(self, cell: tuple):
+        """
+        Return the cell's timezone if every shortcut hexagon overlapping it has that as its unique zone, or
+        _MIXED_CELL. Sampling points inside the cell can't rule out a boundary passing between them.
+        """
+
+        finder = self._get_finder()
+        if self._shortcut_resolution is None:
+            return _MIXED_CELL
+
+        import h3
+
+        lat_index, lng_index = cell
+        padding = self.cell_degrees * _CELL_PADDING
+        south = max((lat_index * self.cell_degrees) - padding, -89.999)
+        north = min(((lat_index + 1) * self.cell_degrees) + padding, 89.999)
+        west = (lng_index * self.cell_degrees) - padding
+        east = ((lng_index + 1) * self.cell_degrees) + padding
+        outline = h3.LatLngPoly([(south, west), (south, east), (north, east), (north, west)])
+
+        zones = set()
+        for hexagon in h3.h3shape_to_cells_experimental(outline, self._shortcut_resolution, contain='overlap'):
+            lat, lng = h3.cell_to_latlng(hexagon)
+            zones.add(finder.unique_timezone_at(lng=lng, lat=lat))
+            if len(zones) > 1 or None in zones:
+                return _MIXED_CELL
+
+        zone = zones.pop() if zones else None
+        return zone if is_known_timezone(zone) else _MIXED_CELL
+
+    @staticmethod
+    def _store(cache: OrderedDict, key, value, max_size: int) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+    @staticmethod
+    def _merge(cache: OrderedDict, entries: list, max_size: int) -> OrderedDict:
+        """Combine restored entries, most recent first, with a live cache whose entries stay the most recent."""
+
+        merged = OrderedDict(reversed(entries[:max_size]))
+        for key, value in cache.items():
+            merged[key] = value
+            merged.move_to_end(key)
+        while len(merged) > max_size:
+            merged.popitem(last=False)
+        return merged
+
+
+@lru_cache(maxsize=None)
+def is_known_timezone(name: str) -> bool:
+    """Whether a zone name is in etc/timezones.py or is one pendulum can load, such as zones renamed since that list
+    was made (Europe/Kyiv, America/Nuuk) or added since (America/Ciudad_Juarez)."""
+
+    if name in TIMEZONES:
+        return True
+    try:
+        pendulum.timezone(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _get_shortcut_resolution(finder):
+    """The H3 resolution of a TimezoneFinder's shortcut hexagons, if it has unique zones for them."""
+
+    try:
+        import h3
+        from timezonefinder.configs import SHORTCUT_H3_RES
+    except ImportError:
+        return None
+    if not hasattr(finder, 'unique_timezone_at') or not hasattr(h3, 'h3shape_to_cells_experimental'):
+        return None
+    return SHORTCUT_H3_RES